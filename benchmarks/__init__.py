@@ -0,0 +1 @@
+"""Benchmarks for the Weishaupt modbus integration."""
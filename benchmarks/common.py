@@ -0,0 +1,135 @@
+"""Helpers shared by the benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+import contextlib
+from datetime import UTC, datetime
+import json
+import logging
+from pathlib import Path
+import platform
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from custom_components.weishaupt_modbus.const import CONF
+from simulator import WbbSimulator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SimulatorThread:
+    """Run a WBB simulator in its own thread and event loop.
+
+    Keeping the simulator out of the measured event loop makes sure that CPU time
+    spent answering requests is not accounted to the integration.
+    """
+
+    def __init__(self, simulator: WbbSimulator) -> None:
+        """Construct the thread wrapper."""
+        self.simulator = simulator
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="wbb-simulator", daemon=True
+        )
+
+    def __enter__(self) -> WbbSimulator:
+        """Start the simulator and wait until it listens."""
+        self._thread.start()
+        self.call(self.simulator.start()).result()
+        return self.simulator
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop the simulator and its thread."""
+        self.call(self.simulator.stop()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def call(self, coro: Any) -> Future:
+        """Run a coroutine in the simulator loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+
+class LoopMonitor:
+    """Measure how long the event loop was unable to run other tasks."""
+
+    def __init__(self, interval: float = 0.001) -> None:
+        """Construct the monitor, interval is the heartbeat period in seconds."""
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+        self.max_stall: float = 0.0
+
+    async def _beat(self) -> None:
+        """Track the lateness of every heartbeat."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            stall = time.perf_counter() - start - self._interval
+            self.max_stall = max(self.max_stall, stall)
+
+    def start(self) -> None:
+        """Start the heartbeat."""
+        self.max_stall = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._beat())
+
+    async def stop(self) -> None:
+        """Stop the heartbeat."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+def make_config_entry(port: int, **data: Any) -> SimpleNamespace:
+    """Return a minimal stand-in for the config entry of a local simulator.
+
+    The runtime data has no power map, the calculations that use it give None.
+    """
+    entry_data = {
+        CONF.HOST: "127.0.0.1",
+        CONF.PORT: port,
+        CONF.HK2: False,
+        CONF.HK3: False,
+        CONF.HK4: False,
+        CONF.HK5: False,
+    }
+    entry_data.update(data)
+    return SimpleNamespace(
+        data=entry_data,
+        entry_id="benchmark",
+        runtime_data=SimpleNamespace(powermap=None),
+    )
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Return the usual statistics of a list of samples."""
+    ordered = sorted(samples)
+    return {
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "max": ordered[-1],
+    }
+
+
+def write_results(path: Path, benchmark: str, results: list[dict[str, Any]]) -> None:
+    """Write benchmark results as JSON, together with machine information."""
+    document = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    _LOGGER.info("Results written to %s", path)
@@ -0,0 +1,253 @@
+"""Micro benchmarks of the code that runs for every entity in every update cycle.
+
+The inputs are the real item tables of hpconst together with the register values
+of the simulator, so the mix of formats and status lists matches the integration.
+Each benchmark reports the time per operation and the memory allocated by one
+operation, as seen by tracemalloc.
+
+Example:
+    python -m benchmarks.hot_paths --output bench_hot_paths.json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Sequence
+import copy
+from dataclasses import dataclass
+import itertools
+import logging
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+import numpy as np
+
+from custom_components.weishaupt_modbus.calculation import CalcGraph
+from custom_components.weishaupt_modbus.configentry import MyData
+from custom_components.weishaupt_modbus.const import CONF, CONST, FORMATS, TYPES
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.entities import MyEntity
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.kennfeld import PowerMap
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI, ModbusObject
+from homeassistant.core import HomeAssistant
+from simulator import load_register_map
+
+from .common import make_config_entry, summarize, write_results
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Case:
+    """One micro benchmark: a function and the argument tuples it is called with."""
+
+    name: str
+    func: Callable[..., Any]
+    args: Sequence[tuple[Any, ...]]
+
+
+def _noop(*_args: Any) -> None:
+    """Do nothing, used to measure the overhead of the benchmark loop."""
+
+
+def _evaluate_all(calc_graph: CalcGraph) -> None:
+    """Recompute all calculated items, as in a cycle where every input changed."""
+    for node in calc_graph._order:  # noqa: SLF001
+        node.last = None
+    calc_graph.evaluate()
+
+
+def time_case(case: Case, ops: int, repeat: int) -> list[float]:
+    """Return the ns per operation of every repetition."""
+    func = case.func
+    batch = list(itertools.islice(itertools.cycle(case.args), ops))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for args in batch:
+            func(*args)
+        samples.append((time.perf_counter_ns() - start) / ops)
+    return samples
+
+
+def allocations(case: Case, ops: int) -> dict[str, float]:
+    """Return the bytes allocated and retained per operation.
+
+    Allocated is the peak of traced memory during one call, so temporaries that
+    are freed before the call returns are counted as well.
+    """
+    batch = list(itertools.islice(itertools.cycle(case.args), ops))
+    allocated = 0
+    retained = 0
+    tracemalloc.start()
+    try:
+        for args in batch:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            case.func(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_bytes_per_op": allocated / ops,
+        "retained_bytes_per_op": retained / ops,
+    }
+
+
+def load_items() -> list[ModbusItem]:
+    """Return a copy of all items, with the simulator register values as state."""
+    register_map = load_register_map()
+    itemlist: list[ModbusItem] = []
+    for device in DEVICELISTS:
+        itemlist.extend(copy.deepcopy(item) for item in device)
+    for item in itemlist:
+        table = register_map.holding if item.address >= 40000 else register_map.input
+        item.state = table.get(item.address, 0)
+    return itemlist
+
+
+async def build_cases(hass: HomeAssistant, config_dir: str) -> list[Case]:
+    """Build the benchmark cases on top of a real coordinator and power map."""
+    config_entry: Any = make_config_entry(
+        502,
+        **{
+            CONF.PREFIX: CONST.DEF_PREFIX,
+            CONF.DEVICE_POSTFIX: "",
+            CONF.KENNFELD_FILE: CONST.DEF_KENNFELDFILE,
+            CONF.NAME_DEVICE_PREFIX: False,
+            CONF.NAME_TOPIC_PREFIX: False,
+        },
+    )
+    itemlist = load_items()
+    modbus_api = ModbusAPI(config_entry=config_entry)
+    coordinator = MyCoordinator(hass, modbus_api, itemlist, config_entry)
+    config_entry.runtime_data = MyData(
+        modbus_api=modbus_api,
+        webif_api=None,
+        config_dir=config_dir,
+        hass=hass,
+        coordinator=coordinator,
+        powermap=None,
+    )
+    powermap = PowerMap(config_entry, hass)
+    await powermap.initialize()
+    config_entry.runtime_data.powermap = powermap
+
+    objects = [
+        (ModbusObject(modbus_api, item), item.state)
+        for item in itemlist
+        if item.type != TYPES.SENSOR_CALC
+    ]
+    temperatures = [
+        (mbo, val)
+        for mbo, val in objects
+        if mbo._modbus_item.format == FORMATS.TEMPERATURE  # noqa: SLF001
+    ]
+    status_items = [
+        item
+        for item in itemlist
+        if item.format == FORMATS.STATUS and item.resultlist is not None
+    ]
+    status_args = [
+        (item, status.number) for item in status_items for status in item.resultlist
+    ]
+    # unknown numbers run through the whole list
+    status_args.extend((item, -1) for item in status_items)
+
+    entities = [
+        MyEntity(config_entry, item, modbus_api)
+        for item in itemlist
+        if item.type in (TYPES.SENSOR, TYPES.NUMBER_RO)
+    ]
+    await coordinator.evaluate_calculations()
+    calc_graph = coordinator._calc_graph  # noqa: SLF001
+    power_args = [
+        (float(outside), float(flow))
+        for outside in range(-300, 401, 25)
+        for flow in range(250, 601, 25)
+    ]
+
+    return [
+        Case("noop", _noop, [(mbo,) for mbo, _val in objects]),
+        Case(
+            "ModbusObject.check_valid_result",
+            lambda mbo, val: mbo.check_valid_result(val),
+            objects,
+        ),
+        Case(
+            "ModbusObject.check_temperature",
+            lambda mbo, val: mbo.check_temperature(val),
+            temperatures,
+        ),
+        Case(
+            "ApiItem.get_translation_key_from_number",
+            lambda item, val: item.get_translation_key_from_number(val),
+            status_args,
+        ),
+        Case(
+            "MyEntity.translate_val",
+            lambda entity: entity.translate_val(entity._api_item.state),  # noqa: SLF001
+            [(entity,) for entity in entities],
+        ),
+        Case(
+            "CalcGraph.evaluate",
+            _evaluate_all,
+            [(calc_graph,)],
+        ),
+        Case("PowerMap.map", powermap.map, power_args),
+        # all lookups of power_args in one call
+        Case("PowerMap.map_many", powermap.map_many, [tuple(np.array(power_args).T)]),
+    ]
+
+
+async def run(ops: int, repeat: int) -> list[dict[str, Any]]:
+    """Run all micro benchmarks."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        cases = await build_cases(hass, config_dir)
+        results = []
+        for case in cases:
+            timing = summarize(time_case(case, ops, repeat))
+            result = {
+                "name": case.name,
+                "inputs": len(case.args),
+                "ops": ops,
+                "ns_per_op": timing,
+                **allocations(case, min(ops, 10000)),
+            }
+            _LOGGER.info(
+                "%-40s %9.1f ns/op %8.1f B/op allocated",
+                case.name,
+                timing["median"],
+                result["alloc_bytes_per_op"],
+            )
+            results.append(result)
+        await hass.async_stop(force=True)
+    return results
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=Path("bench_hot_paths.json"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("custom_components").setLevel(logging.ERROR)
+    results = asyncio.run(run(args.ops, args.repeat))
+    write_results(args.output, "hot_paths", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""End-to-end benchmark of one coordinator update cycle.
+
+Runs MyCoordinator.fetch_data against a local WBB simulator for several network
+latency profiles and read strategies.
+
+Example:
+    python -m benchmarks.poll_cycle --cycles 5 --output bench_poll_cycle.json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import logging
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+from custom_components.weishaupt_modbus.const import READSTRATEGIES
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from homeassistant.core import HomeAssistant
+from simulator import WbbSimulator
+
+from .common import (
+    LoopMonitor,
+    SimulatorThread,
+    make_config_entry,
+    summarize,
+    write_results,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# round trip time in seconds of typical connections to the heat pump
+PROFILES: dict[str, float] = {
+    "lan": 0.002,
+    "wifi": 0.020,
+    "vpn": 0.080,
+}
+
+STRATEGIES: list[str] = [
+    READSTRATEGIES.SEQUENTIAL,
+    READSTRATEGIES.BLOCK,
+    READSTRATEGIES.PIPELINED,
+]
+
+
+async def run_profile(
+    hass: HomeAssistant,
+    profile: str,
+    strategy: str,
+    cycles: int,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """Measure the update cycles for one latency profile and read strategy.
+
+    The first cycle is not measured. It finds the invalid items, like the
+    entity setup does in the integration.
+    """
+    rtt = PROFILES[profile]
+    simulator = WbbSimulator(latency=rtt, jitter=rtt / 10, seed=seed)
+
+    with SimulatorThread(simulator):
+        config_entry: Any = make_config_entry(simulator.port)
+        modbus_api = ModbusAPI(config_entry=config_entry)
+        itemlist: list[ModbusItem] = []
+        for device in DEVICELISTS:
+            itemlist.extend(copy.deepcopy(item) for item in device)
+
+        coordinator = MyCoordinator(
+            hass=hass,
+            my_api=modbus_api,
+            api_items=itemlist,
+            p_config_entry=config_entry,
+        )
+        coordinator.read_strategy = strategy
+        await modbus_api.connect(startup=True)
+        await coordinator.fetch_data()
+
+        monitor = LoopMonitor()
+        wall: list[float] = []
+        busy: list[float] = []
+        stall: list[float] = []
+        requests: list[int] = []
+        wire: list[int] = []
+        for _ in range(cycles):
+            simulator.stats.reset()
+            monitor.start()
+            start_wall = time.perf_counter()
+            start_cpu = time.thread_time()
+            await coordinator.fetch_data()
+            busy.append(time.thread_time() - start_cpu)
+            wall.append(time.perf_counter() - start_wall)
+            await monitor.stop()
+            stall.append(monitor.max_stall)
+            requests.append(simulator.stats.requests)
+            wire.append(simulator.stats.bytes_in + simulator.stats.bytes_out)
+
+        modbus_api.close()
+
+    return {
+        "profile": profile,
+        "rtt_ms": rtt * 1000,
+        "strategy": strategy,
+        "cycles": cycles,
+        "cycle_ms": {key: val * 1000 for key, val in summarize(wall).items()},
+        "loop_busy_ms": summarize(busy)["median"] * 1000,
+        "max_loop_stall_ms": max(stall) * 1000,
+        "requests_per_cycle": summarize([float(val) for val in requests])["median"],
+        "bytes_per_cycle": summarize([float(val) for val in wire])["median"],
+    }
+
+
+async def run(
+    profiles: list[str], strategies: list[str], cycles: int
+) -> list[dict[str, Any]]:
+    """Run all combinations of profiles and strategies."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        results = []
+        for profile in profiles:
+            for strategy in strategies:
+                result = await run_profile(hass, profile, strategy, cycles)
+                _LOGGER.info(
+                    "%-5s %-10s cycle %8.1f ms, %4.0f requests, %6.0f bytes, loop busy %6.2f ms",
+                    profile,
+                    strategy,
+                    result["cycle_ms"]["median"],
+                    result["requests_per_cycle"],
+                    result["bytes_per_cycle"],
+                    result["loop_busy_ms"],
+                )
+                results.append(result)
+        await hass.async_stop(force=True)
+    return results
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profiles", nargs="+", choices=sorted(PROFILES), default=list(PROFILES)
+    )
+    parser.add_argument(
+        "--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES
+    )
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=Path("bench_poll_cycle.json"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("custom_components").setLevel(logging.ERROR)
+    results = asyncio.run(run(args.profiles, args.strategies, args.cycles))
+    write_results(args.output, "poll_cycle", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Performance regression gate.
+
+Collects the key numbers of the benchmarks, stores them as baseline and compares
+later runs against it. A metric regresses when it is worse than the baseline by
+more than its tolerance, all metrics are "lower is better". A metric the
+baseline doesn't have fails as well, the baseline has to be recorded again
+whenever a benchmark gets a new metric.
+
+Example:
+    python -m benchmarks.regression record
+    python -m benchmarks.regression check --tolerance hot_paths.PowerMap.map=0.5
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import fnmatch
+import json
+import logging
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from homeassistant.core import HomeAssistant
+
+from . import hot_paths, poll_cycle, startup
+
+_LOGGER = logging.getLogger(__name__)
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+# relative tolerance per metric, the first matching pattern wins
+DEFAULT_TOLERANCES: dict[str, float] = {
+    "*.requests_per_cycle": 0.0,
+    "*.bytes_per_cycle": 0.0,
+    "*.alloc_bytes_per_op": 0.1,
+    "*.peak_memory_kb": 0.2,
+    # absolute times depend on the machine, the time relative to the empty loop
+    # is what the gate relies on
+    "*.x_noop": 0.4,
+    "*.ns_per_op": 1.0,
+    "*.cycle_ms": 0.3,
+    "*.import_ms": 0.5,
+    "*": 0.3,
+}
+
+IMPORT_MODULES = [
+    "custom_components.weishaupt_modbus",
+    "custom_components.weishaupt_modbus.sensor",
+    "custom_components.weishaupt_modbus.number",
+    "custom_components.weishaupt_modbus.select",
+]
+
+
+@dataclass
+class Comparison:
+    """Result of comparing one metric with its baseline."""
+
+    name: str
+    baseline: float | None
+    current: float | None
+    tolerance: float
+
+    @property
+    def change(self) -> float | None:
+        """Return the relative change against the baseline."""
+        if self.baseline is None or self.current is None:
+            return None
+        if self.baseline == 0:
+            return 0.0 if self.current == 0 else float("inf")
+        return (self.current - self.baseline) / self.baseline
+
+    @property
+    def unrecorded(self) -> bool:
+        """Return True for a metric of this run that the baseline doesn't have."""
+        return self.baseline is None and self.current is not None
+
+    @property
+    def regressed(self) -> bool:
+        """Return True when the metric got worse than the tolerance allows.
+
+        Unrecorded metrics count as regressed, they would never be compared.
+        """
+        if self.unrecorded:
+            return True
+        change = self.change
+        return change is not None and change > self.tolerance
+
+
+def tolerance_for(name: str, tolerances: dict[str, float]) -> float:
+    """Return the tolerance of a metric, patterns are fnmatch style."""
+    for pattern, tolerance in tolerances.items():
+        if fnmatch.fnmatchcase(name, pattern):
+            return tolerance
+    return DEFAULT_TOLERANCES["*"]
+
+
+def compare(
+    baseline: dict[str, float],
+    current: dict[str, float],
+    tolerances: dict[str, float] | None = None,
+) -> list[Comparison]:
+    """Compare current metrics with the baseline.
+
+    Args:
+        baseline: metric values of the baseline
+        current: metric values of this run
+        tolerances: relative tolerance by metric name pattern, checked before the
+            default tolerances
+
+    Returns:
+        One comparison per metric of the baseline or the current run
+
+    """
+    patterns = dict(tolerances or {})
+    for pattern, tolerance in DEFAULT_TOLERANCES.items():
+        patterns.setdefault(pattern, tolerance)
+    return [
+        Comparison(
+            name=name,
+            baseline=baseline.get(name),
+            current=current.get(name),
+            tolerance=tolerance_for(name, patterns),
+        )
+        for name in sorted(baseline.keys() | current.keys())
+    ]
+
+
+def format_report(comparisons: list[Comparison], only_changes: bool = False) -> str:
+    """Format the comparisons as a table, regressions are marked."""
+
+    def fmt(val: float | None) -> str:
+        return "-" if val is None else f"{val:.6g}"
+
+    lines = [
+        f"{'':2}{'metric':<60} {'baseline':>12} {'current':>12} {'change':>9} {'limit':>7}"
+    ]
+    for comp in comparisons:
+        change = comp.change
+        if only_changes and not comp.regressed and change is not None:
+            continue
+        if comp.unrecorded:
+            status, change_str = "! ", "new"
+        elif change is None:
+            status, change_str = "? ", "missing"
+        else:
+            status = "! " if comp.regressed else "  "
+            change_str = f"{change:+.1%}"
+        lines.append(
+            f"{status}{comp.name:<60} {fmt(comp.baseline):>12} {fmt(comp.current):>12}"
+            f" {change_str:>9} {comp.tolerance:>+7.0%}"
+        )
+    return "\n".join(lines)
+
+
+def measure_import_ms(runs: int = 5) -> float:
+    """Return the median time to import the integration, in a fresh interpreter.
+
+    Home Assistant itself is imported before the clock starts, only the modules of
+    the integration are measured.
+    """
+    code = (
+        "import time, homeassistant.core, homeassistant.helpers.entity\n"
+        "start = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in IMPORT_MODULES)
+        + "print((time.perf_counter() - start) * 1000)\n"
+    )
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent.parent,
+        )
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+async def measure_poll_peak_kb(hass: HomeAssistant) -> float:
+    """Return the peak memory of building and running the coordinator once."""
+    tracemalloc.start()
+    try:
+        await poll_cycle.run_profile(hass, "lan", poll_cycle.STRATEGIES[0], 1)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+async def collect(
+    ops: int = 50000, repeat: int = 5, cycles: int = 3
+) -> dict[str, float]:
+    """Run the benchmarks and return the flat metrics."""
+    metrics: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+
+        # the repetitions of the cases are interleaved, so a slow phase of the
+        # machine affects all cases alike instead of a single one
+        cases = await hot_paths.build_cases(hass, config_dir)
+        samples: dict[str, list[float]] = {case.name: [] for case in cases}
+        for _ in range(repeat):
+            for case in cases:
+                samples[case.name].extend(hot_paths.time_case(case, ops, 1))
+        noop = min(samples["noop"])
+        for case in cases:
+            prefix = f"hot_paths.{case.name}"
+            fastest = min(samples[case.name])
+            metrics[f"{prefix}.ns_per_op"] = round(fastest, 1)
+            metrics[f"{prefix}.x_noop"] = round(fastest / noop, 2)
+            alloc = hot_paths.allocations(case, min(ops, 10000))
+            metrics[f"{prefix}.alloc_bytes_per_op"] = round(
+                alloc["alloc_bytes_per_op"], 1
+            )
+
+        for strategy in poll_cycle.STRATEGIES:
+            result = await poll_cycle.run_profile(hass, "lan", strategy, cycles)
+            prefix = f"poll_cycle.lan.{strategy}"
+            metrics[f"{prefix}.cycle_ms"] = round(result["cycle_ms"]["min"], 2)
+            metrics[f"{prefix}.requests_per_cycle"] = result["requests_per_cycle"]
+            metrics[f"{prefix}.bytes_per_cycle"] = result["bytes_per_cycle"]
+
+        metrics["poll_cycle.peak_memory_kb"] = round(
+            await measure_poll_peak_kb(hass), 1
+        )
+
+        result = await startup.measure_powermap(hass, config_dir, 20)
+        metrics["startup.powermap.build_ms"] = round(result["build_ms"]["min"], 3)
+        await hass.async_stop(force=True)
+
+    metrics["import.integration.import_ms"] = round(measure_import_ms(), 1)
+    return metrics
+
+
+def load_baseline(path: Path) -> dict[str, float]:
+    """Load the metrics of a baseline file."""
+    return json.loads(path.read_text(encoding="utf-8"))["metrics"]
+
+
+def save_baseline(path: Path, metrics: dict[str, float]) -> None:
+    """Write the metrics as new baseline."""
+    document = {
+        "python": ".".join(str(part) for part in sys.version_info[:3]),
+        "metrics": dict(sorted(metrics.items())),
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def parse_tolerances(values: list[str]) -> dict[str, float]:
+    """Parse pattern=tolerance arguments."""
+    tolerances = {}
+    for value in values:
+        pattern, _sep, tolerance = value.rpartition("=")
+        if not pattern:
+            raise argparse.ArgumentTypeError(f"Expected pattern=tolerance: {value}")
+        tolerances[pattern] = float(tolerance)
+    return tolerances
+
+
+def main() -> int:
+    """Run the gate from the command line, returns the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["record", "check"])
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument(
+        "--tolerance",
+        action="append",
+        default=[],
+        metavar="PATTERN=VALUE",
+        help="relative tolerance for metrics matching an fnmatch pattern",
+    )
+    parser.add_argument("--ops", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument(
+        "--all", action="store_true", help="show all metrics, not only regressions"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("custom_components").setLevel(logging.ERROR)
+    logging.getLogger("benchmarks").setLevel(logging.WARNING)
+    metrics = asyncio.run(collect(args.ops, args.repeat, args.cycles))
+
+    if args.mode == "record":
+        save_baseline(args.baseline, metrics)
+        _LOGGER.info(
+            "Baseline with %s metrics written to %s", len(metrics), args.baseline
+        )
+        return 0
+
+    comparisons = compare(
+        load_baseline(args.baseline), metrics, parse_tolerances(args.tolerance)
+    )
+    regressions = [comp for comp in comparisons if comp.regressed]
+    _LOGGER.info("%s", format_report(comparisons, only_changes=not args.all))
+    if unrecorded := [comp.name for comp in comparisons if comp.unrecorded]:
+        _LOGGER.error(
+            "%s metrics are not in %s, record the baseline again: %s",
+            len(unrecorded),
+            args.baseline,
+            ", ".join(unrecorded),
+        )
+    if missing := [comp.name for comp in comparisons if comp.current is None]:
+        _LOGGER.warning(
+            "%s metrics of the baseline were not measured: %s",
+            len(missing),
+            ", ".join(missing),
+        )
+    if regressions:
+        _LOGGER.error(
+            "%s of %s metrics regressed against %s",
+            len(regressions),
+            len(comparisons),
+            args.baseline,
+        )
+        return 1
+    _LOGGER.info("No regressions in %s metrics", len(comparisons))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
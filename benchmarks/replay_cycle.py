@@ -0,0 +1,161 @@
+"""Benchmark of coordinator update cycles replayed from recorded traffic.
+
+Answers the requests of MyCoordinator.fetch_data from a recording of the
+start_recording service instead of a network connection, so the result only
+depends on the recording. Without --recording a recording of the local WBB
+simulator is made first.
+
+Example:
+    python -m benchmarks.replay_cycle --recording weishaupt_modbus_traffic.jsonl
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import logging
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+from custom_components.weishaupt_modbus.const import READSTRATEGIES
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from homeassistant.core import HomeAssistant
+from simulator import ReplayClient, WbbSimulator
+
+from .common import SimulatorThread, make_config_entry, summarize, write_results
+from .poll_cycle import STRATEGIES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def make_coordinator(
+    hass: HomeAssistant, modbus_api: ModbusAPI, config_entry: Any
+) -> MyCoordinator:
+    """Return a coordinator with the items of all devices."""
+    itemlist: list[ModbusItem] = []
+    for device in DEVICELISTS:
+        itemlist.extend(copy.deepcopy(item) for item in device)
+    return MyCoordinator(
+        hass=hass,
+        my_api=modbus_api,
+        api_items=itemlist,
+        p_config_entry=config_entry,
+    )
+
+
+async def record(hass: HomeAssistant, path: Path, strategy: str, cycles: int) -> None:
+    """Record the traffic of some update cycles against the local simulator."""
+    with SimulatorThread(WbbSimulator()) as simulator:
+        config_entry: Any = make_config_entry(simulator.port)
+        modbus_api = ModbusAPI(config_entry=config_entry)
+        coordinator = make_coordinator(hass, modbus_api, config_entry)
+        coordinator.read_strategy = strategy
+        await modbus_api.connect(startup=True)
+        modbus_api.start_recording(hass, path)
+        for _ in range(cycles + 1):
+            await coordinator.fetch_data()
+        await modbus_api.stop_recording()
+        modbus_api.close()
+
+
+async def run_replay(
+    hass: HomeAssistant,
+    recording: Path,
+    strategy: str,
+    cycles: int,
+    speed: float | None = None,
+) -> dict[str, Any]:
+    """Measure update cycles answered from a recording.
+
+    The first cycle is not measured. It finds the invalid items, like the
+    entity setup does in the integration.
+    """
+    client = ReplayClient.from_file(recording, speed)
+    config_entry: Any = make_config_entry(client.header.get("port", 502))
+    modbus_api = ModbusAPI(config_entry=config_entry, client=client)  # type: ignore[arg-type]
+    coordinator = make_coordinator(hass, modbus_api, config_entry)
+    coordinator.read_strategy = strategy
+    await modbus_api.connect(startup=True)
+    await coordinator.fetch_data()
+
+    wall: list[float] = []
+    busy: list[float] = []
+    for _ in range(cycles):
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        await coordinator.fetch_data()
+        busy.append(time.thread_time() - start_cpu)
+        wall.append(time.perf_counter() - start_wall)
+    modbus_api.close()
+
+    return {
+        "recording": recording.name,
+        "strategy": strategy,
+        "speed": speed,
+        "cycles": cycles,
+        "cycle_ms": {key: val * 1000 for key, val in summarize(wall).items()},
+        "loop_busy_ms": summarize(busy)["median"] * 1000,
+        "requests": client.stats.requests,
+        "replayed": client.stats.replayed,
+        "composed": client.stats.composed,
+        "missing": client.stats.missing,
+    }
+
+
+async def run(
+    recording: Path | None, strategies: list[str], cycles: int, speed: float | None
+) -> list[dict[str, Any]]:
+    """Replay a recording with all strategies."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        if recording is None:
+            recording = Path(config_dir) / "simulator_traffic.jsonl"
+            await record(hass, recording, READSTRATEGIES.BLOCK, cycles)
+        results = []
+        for strategy in strategies:
+            result = await run_replay(hass, recording, strategy, cycles, speed)
+            _LOGGER.info(
+                "%-10s cycle %8.2f ms, loop busy %6.2f ms, %4d replayed, %4d composed, %4d missing",
+                strategy,
+                result["cycle_ms"]["median"],
+                result["loop_busy_ms"],
+                result["replayed"],
+                result["composed"],
+                result["missing"],
+            )
+            results.append(result)
+        await hass.async_stop(force=True)
+    return results
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", type=Path)
+    parser.add_argument(
+        "--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES
+    )
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        help="playback speed, 1.0 is real time, as fast as possible when omitted",
+    )
+    parser.add_argument("--output", type=Path, default=Path("bench_replay_cycle.json"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("custom_components").setLevel(logging.ERROR)
+    results = asyncio.run(run(args.recording, args.strategies, args.cycles, args.speed))
+    write_results(args.output, "replay_cycle", results)
+
+
+if __name__ == "__main__":
+    main()
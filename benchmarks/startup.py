@@ -0,0 +1,107 @@
+"""Benchmark of the work done once when a config entry is set up.
+
+Measures how long building the power map takes and how long it blocks the event
+loop, which delays every other integration that starts at the same time.
+
+Example:
+    python -m benchmarks.startup --runs 50 --output bench_startup.json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+from custom_components.weishaupt_modbus.configentry import MyData
+from custom_components.weishaupt_modbus.const import CONF, CONST
+from custom_components.weishaupt_modbus.kennfeld import PowerMap, build_power_grid
+from homeassistant.core import HomeAssistant
+
+from .common import LoopMonitor, make_config_entry, summarize, write_results
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def measure_powermap(
+    hass: HomeAssistant, config_dir: str, runs: int
+) -> dict[str, Any]:
+    """Measure the setup of the default power map.
+
+    The setup runs once as in a real start, including the plot of the map. The
+    grid is built runs times on its own to get stable numbers.
+    """
+    config_entry: Any = make_config_entry(
+        502, **{CONF.KENNFELD_FILE: CONST.DEF_KENNFELDFILE}
+    )
+    config_entry.runtime_data = MyData(
+        modbus_api=None,
+        webif_api=None,
+        config_dir=config_dir,
+        hass=hass,
+        coordinator=None,
+        powermap=None,
+    )
+    powermap = PowerMap(config_entry, hass)
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.perf_counter()
+    await powermap.initialize()
+    initialize_ms = (time.perf_counter() - start) * 1000
+    await monitor.stop()
+
+    outside = np.linspace(-30, 40, 71)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        build_power_grid(
+            powermap.known_x, powermap.known_y, powermap.known_t, 21, outside
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "name": "powermap",
+        "runs": runs,
+        "initialize_ms": initialize_ms,
+        "max_stall_ms": monitor.max_stall * 1000,
+        "build_ms": summarize(samples),
+    }
+
+
+async def run(runs: int) -> list[dict[str, Any]]:
+    """Run all startup benchmarks."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        result = await measure_powermap(hass, config_dir, runs)
+        _LOGGER.info(
+            "%-20s %8.2f ms initialize %8.2f ms loop stall %8.3f ms build",
+            result["name"],
+            result["initialize_ms"],
+            result["max_stall_ms"],
+            result["build_ms"]["median"],
+        )
+        await hass.async_stop(force=True)
+    return [result]
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--output", type=Path, default=Path("bench_startup.json"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("custom_components").setLevel(logging.ERROR)
+    results = asyncio.run(run(args.runs))
+    write_results(args.output, "startup", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,10 @@ from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 
+from .calculation import user_calc_items
 from .configentry import MyConfigEntry, MyData
 from .const import CONF, CONST, DEVICENAMES, FORMATS, TYPES
 from .coordinator import MyCoordinator
@@ -29,9 +32,12 @@ from .hpconst import (
     MODBUS_WW_ITEMS,
 )
 from .items import ModbusItem
-from .kennfeld import PowerMap
+from .kennfeld import async_acquire_powermap, release_powermap
+from .learning import async_remove_learning, async_setup_learner
 from .migrate_helpers import migrate_entities
 from .modbusobject import ModbusAPI
+from .services import async_register_services
+from .tuning import async_load_tuning, async_remove_tuning, async_save_tuning
 from .webif_object import WebifConnection
 
 _LOGGER = logging.getLogger(__name__)
@@ -43,6 +49,14 @@ PLATFORMS: list[str] = [
     #    "switch",
 ]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(CONST.DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services of the integration."""
+    async_register_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: MyConfigEntry) -> bool:
     """Set up entry."""
@@ -60,11 +74,27 @@ async def async_setup_entry(hass: HomeAssistant, entry: MyConfigEntry) -> bool:
 
     for device in DEVICELISTS:
         itemlist.extend(copy.deepcopy(item) for item in device)
+    # calculated sensors defined in the options
+    itemlist.extend(
+        user_calc_items(
+            entry.options.get(CONF.CALC_SENSORS, []),
+            {item.translation_key for item in itemlist},
+        )
+    )
 
     coordinator = MyCoordinator(
         hass=hass, my_api=mbapi, api_items=itemlist, p_config_entry=entry
     )
     # await coordinator.async_config_entry_first_refresh()
+    if (tuning := await async_load_tuning(hass, entry.entry_id)) is not None:
+        coordinator.apply_tuning(tuning)
+    # the probes share one connection attempt, an offline heat pump is only
+    # connected again by the update cycles
+    if await mbapi.connect(startup=True):
+        await coordinator.async_detect_heating_circuits()
+        # measure block size and timeout once, later only with the tune service
+        if tuning is None and (tuning := await coordinator.async_tune()) is not None:
+            await async_save_tuning(hass, entry.entry_id, tuning)
 
     entry.runtime_data = MyData(
         modbus_api=mbapi,
@@ -75,9 +105,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: MyConfigEntry) -> bool:
         powermap=None,
     )
 
-    powermap = PowerMap(entry, hass)
-    await powermap.initialize()
-    entry.runtime_data.powermap = powermap
+    # entries with the same kennfeld file share one power map
+    entry.runtime_data.powermap = await async_acquire_powermap(hass, entry)
+    # the learned power map is refined from the energy counters of this entry
+    coordinator.learner = await async_setup_learner(
+        hass, entry.entry_id, entry.runtime_data.powermap
+    )
 
     # myWebifCon = WebifConnection()
     # data = await myWebifCon.return_test_data()
@@ -173,9 +206,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # This is called when an entry/configured device is to be removed. The class
     # needs to unload itself, and remove callbacks. See the classes for further
     # details
+    await entry.runtime_data.modbus_api.stop_recording()
     entry.runtime_data.modbus_api.close()
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
+        coordinator = entry.runtime_data.coordinator
+        if coordinator.learner is not None:
+            await coordinator.learner.async_unload()
+            coordinator.learner = None
+        release_powermap(hass, entry.runtime_data.powermap)
         try:
             hass.data[entry.data[CONF.PREFIX]].pop(entry.entry_id)
         except KeyError:
@@ -184,6 +223,12 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored data of a deleted entry."""
+    await async_remove_tuning(hass, entry.entry_id)
+    await async_remove_learning(hass, entry.entry_id)
+
+
 def create_string_json() -> None:
     """Create strings.json from hpconst.py."""
     myEntity: dict[str, dict[str, dict[str, Any]]] = {}
@@ -250,6 +295,14 @@ def create_string_json() -> None:
         data = file.read()
     # create dict from json
     data_dict = json.loads(data)
+    # diagnostic sensors are not in hpconst, keep their translations
+    mySensors.update(
+        {
+            key: value
+            for key, value in data_dict["entity"]["sensor"].items()
+            if key.startswith("diag_")
+        }
+    )
     # overwrite entity dict
     data_dict["entity"] = myEntity
     # write whole json to file again
@@ -0,0 +1,416 @@
+"""Calculation expressions of calculated sensors.
+
+The "calculation" strings of the SENSOR_CALC params are parsed once into a
+restricted AST and compiled into nested Python closures. Only arithmetic on
+numbers, the variables val_0 .. val_8, a few builtin functions and the map
+method of the power maps are allowed, so unlike eval() a calculation can't reach
+anything else of the interpreter.
+
+The coordinator evaluates all calculated items once per update cycle with a
+CalcGraph, the entities only show the results.
+"""
+
+from __future__ import annotations
+
+import ast
+from collections.abc import Callable, Collection
+from graphlib import CycleError, TopologicalSorter
+import logging
+import operator
+import re
+from typing import Any
+
+from homeassistant.components.sensor import SensorStateClass
+from homeassistant.util import slugify
+
+from .const import DEVICES, FORMATS, TYPES
+from .items import ModbusItem
+
+_LOGGER = logging.getLogger(__name__)
+
+# variables a calculation can use: the own value, other items and the power
+# maps of the kennfeld file and learned from the measured energy
+VARIABLE = re.compile(r"val_[0-8]")
+POWERMAP = "power"
+LEARNED = "learned"
+POWERMAPS = frozenset({POWERMAP, LEARNED})
+# methods of the power map that can be called
+POWERMAP_METHODS = frozenset({"map"})
+
+BINARY_OPERATORS: dict[type[ast.operator], Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    # float operands, so a huge exponent overflows instead of growing an int
+    ast.Pow: lambda base, exp: float(base) ** float(exp),
+}
+UNARY_OPERATORS: dict[type[ast.unaryop], Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+FUNCTIONS: dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+}
+
+# keys of the definition of a user defined calculated sensor in the options
+CALC_NAME = "name"
+CALC_FORMULA = "formula"
+CALC_UNIT = "unit"
+CALC_PRECISION = "precision"
+# inputs of a user formula, as val_1 .. val_8
+MAX_INPUTS = 8
+
+type Evaluator = Callable[[tuple[Any, ...]], Any]
+
+
+class CalculationError(ValueError):
+    """A calculation string that is not a valid restricted expression."""
+
+
+class Calculation:
+    """Compiled calculation of a calculated sensor.
+
+    Calling it with the values of variables, in the order of the variables
+    attribute, returns the result.
+    """
+
+    __slots__ = ("_evaluate", "source", "variables")
+
+    def __init__(self, source: str) -> None:
+        """Parse and compile a calculation string.
+
+        Raises:
+            CalculationError: when the string is no valid restricted expression
+
+        """
+        self.source = source
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as err:
+            raise CalculationError(f"Syntax error in {source!r}: {err.msg}") from err
+        variables = sorted(
+            {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+            - FUNCTIONS.keys()
+        )
+        self.variables: tuple[str, ...] = tuple(variables)
+        self._evaluate = _Compiler(source, self.variables).compile(tree.body)
+
+    def __call__(self, *values: Any) -> Any:
+        """Evaluate the calculation with the values of the variables."""
+        return self._evaluate(values)
+
+    def __repr__(self) -> str:
+        """Return the source of the calculation."""
+        return f"Calculation({self.source!r})"
+
+
+class _Compiler:
+    """Compile the nodes of a restricted expression into closures."""
+
+    def __init__(self, source: str, variables: tuple[str, ...]) -> None:
+        self._source = source
+        self._index = {name: index for index, name in enumerate(variables)}
+
+    def _error(self, node: ast.AST, reason: str) -> CalculationError:
+        return CalculationError(
+            f"{reason} at column {getattr(node, 'col_offset', 0)} of {self._source!r}"
+        )
+
+    def compile(self, node: ast.expr) -> Evaluator:
+        """Return a closure that evaluates the node with a tuple of variables."""
+        match node:
+            case ast.Constant(value=value) if isinstance(value, (int, float)) and (
+                not isinstance(value, bool)
+            ):
+                return lambda _values: value
+            case ast.Name(id=name):
+                return self._variable(node, name)
+            case ast.BinOp(left=left, op=op, right=right) if (
+                type(op) in BINARY_OPERATORS
+            ):
+                binary = BINARY_OPERATORS[type(op)]
+                eval_left = self.compile(left)
+                eval_right = self.compile(right)
+                return lambda values: binary(eval_left(values), eval_right(values))
+            case ast.UnaryOp(op=op, operand=operand) if type(op) in UNARY_OPERATORS:
+                unary = UNARY_OPERATORS[type(op)]
+                eval_operand = self.compile(operand)
+                return lambda values: unary(eval_operand(values))
+            case ast.Call(func=func, args=args, keywords=[]):
+                return self._call(node, func, [self.compile(arg) for arg in args])
+        raise self._error(node, f"{type(node).__name__} is not allowed")
+
+    def _variable(self, node: ast.AST, name: str) -> Evaluator:
+        if name not in POWERMAPS and not VARIABLE.fullmatch(name):
+            raise self._error(node, f"Unknown variable {name}")
+        index = self._index[name]
+        return lambda values: values[index]
+
+    def _call(self, node: ast.AST, func: ast.expr, args: list[Evaluator]) -> Evaluator:
+        match func:
+            case ast.Name(id=name) if name in FUNCTIONS:
+                function = FUNCTIONS[name]
+                return lambda values: function(*(arg(values) for arg in args))
+            case ast.Attribute(value=ast.Name(id=name), attr=method) if (
+                name in POWERMAPS and method in POWERMAP_METHODS
+            ):
+                index = self._index[name]
+                return lambda values: getattr(values[index], method)(
+                    *(arg(values) for arg in args)
+                )
+        raise self._error(
+            node, "Only abs, min, max, round, power.map and learned.map can be called"
+        )
+
+
+def bind_inputs(formula: str, keys: Collection[str]) -> tuple[str, dict[str, str]]:
+    """Replace the item keys of a user formula by the variables val_1 .. val_8.
+
+    Args:
+        formula: expression on translation keys, e.g.
+            "heiz_energie_heute / el_energie_heute"
+        keys: translation keys that can be used
+
+    Returns:
+        The calculation and the val_N params that reference the items
+
+    Raises:
+        CalculationError: when the formula is no valid restricted expression or
+            uses unknown or too many items
+
+    """
+    try:
+        tree = ast.parse(formula, mode="eval")
+    except SyntaxError as err:
+        raise CalculationError(f"Syntax error in {formula!r}: {err.msg}") from err
+    names = sorted(
+        {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        - FUNCTIONS.keys()
+        - POWERMAPS
+    )
+    if unknown := [name for name in names if name not in keys]:
+        raise CalculationError(f"Unknown items {', '.join(unknown)} in {formula!r}")
+    if len(names) > MAX_INPUTS:
+        raise CalculationError(f"More than {MAX_INPUTS} items in {formula!r}")
+
+    variables = {name: f"val_{index}" for index, name in enumerate(names, 1)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in variables:
+            node.id = variables[node.id]
+    calculation = ast.unparse(tree)
+    # compile once to reject everything beyond arithmetic
+    Calculation(calculation)
+    return calculation, {variable: name for name, variable in variables.items()}
+
+
+def user_calc_items(
+    definitions: list[dict[str, Any]], keys: Collection[str]
+) -> list[ModbusItem]:
+    """Return the items of the user defined calculated sensors of the options.
+
+    The items have no register of their own and are never read, their formula
+    only uses other items. Definitions that became invalid are logged and left
+    out.
+
+    Args:
+        definitions: the calculated sensors of the options
+        keys: translation keys the formulas can use
+
+    """
+    items: list[ModbusItem] = []
+    for definition in definitions:
+        name = definition[CALC_NAME]
+        key = f"user_{slugify(name)}"
+        if any(item.translation_key == key for item in items):
+            _LOGGER.warning("Calculated sensor %s has the key of another one", name)
+            continue
+        try:
+            calculation, inputs = bind_inputs(definition[CALC_FORMULA], keys)
+        except CalculationError as err:
+            _LOGGER.warning("Invalid calculated sensor %s: %s", name, err)
+            continue
+        items.append(
+            ModbusItem(
+                address=0,
+                name=name,
+                mformat=FORMATS.NUMBER,
+                mtype=TYPES.SENSOR_USER,
+                device=DEVICES.ST,
+                translation_key=key,
+                params={
+                    **inputs,
+                    "calculation": calculation,
+                    "unit": definition.get(CALC_UNIT) or None,
+                    "precision": int(definition.get(CALC_PRECISION, 2)),
+                    "stateclass": SensorStateClass.MEASUREMENT,
+                },
+            )
+        )
+    return items
+
+
+def _scaled_state(item: ModbusItem) -> Callable[[], Any]:
+    """Return a function that returns the state of an item divided by its divider."""
+    divider = 1 if item.format == FORMATS.STATUS else item.params.get("divider", 1)
+    return lambda: None if item.state is None else item.state / divider
+
+
+class CalcNode:
+    """Calculated item with its compiled calculation and input sources."""
+
+    __slots__ = ("calculation", "dependencies", "inputs", "item", "key", "last")
+
+    def __init__(self, item: ModbusItem, calculation: Calculation) -> None:
+        """Construct a node, the inputs are resolved by the graph."""
+        self.item = item
+        self.key: str = item.translation_key
+        self.calculation = calculation
+        self.inputs: tuple[Callable[[], Any], ...] = ()
+        self.dependencies: set[str] = set()
+        # input values of the last evaluation, None before the first one
+        self.last: tuple[Any, ...] | None = None
+
+
+class CalcGraph:
+    """Calculated items in the order of their dependencies.
+
+    The val_1 .. val_8 params of every calculated item are edges to the items
+    they reference. evaluate() computes all items in topological order, so a
+    calculated item can use the result of another one, and only recomputes an
+    item when one of its input values changed since the last evaluation.
+    """
+
+    def __init__(
+        self,
+        modbus_items: list[ModbusItem],
+        get_item: Callable[[str], ModbusItem | None],
+        get_powermap: Callable[[], Any],
+        get_learned: Callable[[], Any] | None = None,
+    ) -> None:
+        """Build the graph.
+
+        Args:
+            modbus_items: calculated items, items without a valid calculation
+                are logged and left out
+            get_item: returns the item of a translation key
+            get_powermap: returns the current power map
+            get_learned: returns the learned power map, the current power map
+                when not given
+
+        """
+        self.values: dict[str, Any] = {}
+        powermaps = {POWERMAP: get_powermap, LEARNED: get_learned or get_powermap}
+        nodes: dict[str, CalcNode] = {}
+        for item in modbus_items:
+            source = item.params.get("calculation")
+            if source is None:
+                continue
+            try:
+                nodes[item.translation_key] = CalcNode(item, Calculation(source))
+            except CalculationError as err:
+                _LOGGER.warning("Invalid calculation of %s: %s", item.name, err)
+
+        for node in nodes.values():
+            node.inputs = tuple(
+                self._input(node, name, nodes, get_item, powermaps)
+                for name in node.calculation.variables
+            )
+        self._order = self._sort(nodes)
+
+    def _input(
+        self,
+        node: CalcNode,
+        name: str,
+        nodes: dict[str, CalcNode],
+        get_item: Callable[[str], ModbusItem | None],
+        powermaps: dict[str, Callable[[], Any]],
+    ) -> Callable[[], Any]:
+        """Return a function that returns the value of a variable of a node."""
+        item = node.item
+        if name in powermaps:
+            return powermaps[name]
+        if name == "val_0":
+            return _scaled_state(item)
+        key = item.params.get(name, "")
+        if key in nodes:
+            node.dependencies.add(key)
+            values = self.values
+            return lambda: values.get(key)
+        source = get_item(key)
+        if source is None:
+            _LOGGER.warning("%s of %s references an unknown item", name, item.name)
+            return lambda: None
+        if item.type == TYPES.SENSOR_USER:
+            # user formulas work on the displayed values, e.g. °C
+            return _scaled_state(source)
+        return lambda: source.state
+
+    @staticmethod
+    def _sort(nodes: dict[str, CalcNode]) -> list[CalcNode]:
+        """Return the nodes in topological order, nodes of cycles are dropped."""
+        while True:
+            sorter: TopologicalSorter[str] = TopologicalSorter(
+                {key: node.dependencies for key, node in nodes.items()}
+            )
+            try:
+                return [nodes[key] for key in sorter.static_order()]
+            except CycleError as err:
+                cycle = err.args[1]
+                _LOGGER.warning("Calculations %s depend on each other", cycle)
+                for key in cycle:
+                    nodes.pop(key, None)
+                for node in nodes.values():
+                    node.dependencies.difference_update(cycle)
+
+    @property
+    def keys(self) -> list[str]:
+        """Return the translation keys of the calculated items in order."""
+        return [node.key for node in self._order]
+
+    def evaluate(self) -> int:
+        """Compute the items whose inputs changed.
+
+        Returns:
+            number of recomputed items
+
+        """
+        computed = 0
+        values = self.values
+        for node in self._order:
+            inputs = tuple(value_of() for value_of in node.inputs)
+            if inputs == node.last:
+                continue
+            node.last = inputs
+            computed += 1
+            values[node.key] = self._compute(node, inputs)
+        return computed
+
+    def invalidate(self, variable: str) -> None:
+        """Recompute the items that use a variable in the next evaluation.
+
+        For inputs that change in place, e.g. the grid of the learned power map,
+        the comparison with the last input values can't tell the change.
+        """
+        for node in self._order:
+            if variable in node.calculation.variables:
+                node.last = None
+
+    @staticmethod
+    def _compute(node: CalcNode, inputs: tuple[Any, ...]) -> Any:
+        """Return the result of a node, None when an input is missing."""
+        if any(value is None for value in inputs):
+            return None
+        try:
+            result = node.calculation(*inputs)
+        except ArithmeticError:
+            return None
+        except TypeError:
+            _LOGGER.warning("No valid calculation string %s", node.calculation.source)
+            return None
+        return round(result, node.item.params.get("precision", 2))
@@ -1,16 +1,31 @@
 """Config flow."""
 
+import logging
 from typing import Any
 
 from aiofiles.os import scandir
 import voluptuous as vol
 
 from homeassistant import config_entries, exceptions
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
-
+from homeassistant.util import slugify
+
+from .calculation import (
+    CALC_FORMULA,
+    CALC_NAME,
+    CALC_PRECISION,
+    CALC_UNIT,
+    CalculationError,
+    bind_inputs,
+)
 from .const import CONF, CONST
+from .coordinator import HEATING_CIRCUITS, detect_heating_circuits
+from .hpconst import DEVICELISTS
 from .kennfeld import get_filepath
+from .modbusobject import ModbusAPI
+
+_LOGGER = logging.getLogger(__name__)
 
 
 async def build_kennfeld_list(hass: HomeAssistant):
@@ -66,6 +81,25 @@ async def validate_input(data: dict[str, Any]) -> dict[str, Any]:
     return {"title": data["host"]}
 
 
+async def probe_heating_circuits(data: dict[str, Any]) -> dict[str, bool]:
+    """Detect the installed heating circuits of the heat pump given by data."""
+    modbus_api = ModbusAPI.from_host(data[CONF.HOST], data[CONF.PORT])
+    try:
+        return await detect_heating_circuits(modbus_api)
+    finally:
+        modbus_api.close()
+
+
+def heating_circuit_schema(defaults: dict[str, bool]) -> vol.Schema:
+    """Return the schema of the heating circuit flags."""
+    return vol.Schema(
+        schema={
+            vol.Optional(schema=conf, default=defaults.get(conf, False)): bool
+            for conf in HEATING_CIRCUITS
+        }
+    )
+
+
 class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: disable=abstract-method
     """Class config flow."""
 
@@ -76,6 +110,20 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
     # changes.
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_PUSH
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Return the options flow."""
+        return OptionsFlow()
+
+    def __init__(self) -> None:
+        """Initialize the flow."""
+        self._data: dict[str, Any] = {}
+        self._title: str = ""
+        self._circuits: dict[str, bool] = {}
+
     async def async_step_user(self, user_input=None) -> config_entries.ConfigFlowResult:
         """Step for setup process."""
         # This goes through the steps to take the user through the setup process.
@@ -98,10 +146,6 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
                 vol.Optional(
                     schema=CONF.KENNFELD_FILE, default="weishaupt_wbb_kennfeld.json"
                 ): vol.In(container=await build_kennfeld_list(self.hass)),
-                vol.Optional(schema=CONF.HK2, default=False): bool,
-                vol.Optional(schema=CONF.HK3, default=False): bool,
-                vol.Optional(schema=CONF.HK4, default=False): bool,
-                vol.Optional(schema=CONF.HK5, default=False): bool,
                 vol.Optional(schema=CONF.NAME_DEVICE_PREFIX, default=False): bool,
                 vol.Optional(schema=CONF.NAME_TOPIC_PREFIX, default=False): bool,
                 vol.Optional(schema=CONF.CB_WEBIF, default=False): bool,
@@ -116,8 +160,11 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
         if user_input is not None:
             try:
                 info = await validate_input(data=user_input)
-
-                return self.async_create_entry(title=info["title"], data=user_input)
+                self._data = user_input
+                self._title = info["title"]
+                # prefill the heating circuits with the ones found on the heat pump
+                self._circuits = await probe_heating_circuits(user_input)
+                return await self.async_step_heating_circuits()
 
             except Exception:  # noqa: BLE001
                 errors["base"] = "unknown error"
@@ -128,6 +175,26 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
             step_id="user", data_schema=data_schema, errors=errors
         )
 
+    async def async_step_heating_circuits(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
+        """Step to confirm the detected heating circuits."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title=self._title, data={**self._data, **user_input}
+            )
+
+        return self.async_show_form(
+            step_id="heating_circuits",
+            data_schema=heating_circuit_schema(self._circuits),
+            description_placeholders={
+                "detected": ", ".join(
+                    conf for conf, installed in self._circuits.items() if installed
+                )
+                or "-"
+            },
+        )
+
     async def async_step_reconfigure(
         self, user_input: dict[str, Any] | None = None
     ) -> config_entries.ConfigFlowResult:
@@ -142,6 +209,14 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
                 entry=reconfigure_entry, data_updates=user_input
             )
 
+        # prefill the heating circuits with the ones found on the heat pump
+        circuits = {conf: reconfigure_entry.data[conf] for conf in HEATING_CIRCUITS}
+        try:
+            circuits |= await probe_heating_circuits(dict(reconfigure_entry.data))
+        except Exception:
+            # keep the configured circuits when the heat pump can't be reached
+            _LOGGER.warning("Detecting the heating circuits failed", exc_info=True)
+
         schema_reconfigure = vol.Schema(
             schema={
                 vol.Required(
@@ -162,18 +237,10 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
                     schema=CONF.KENNFELD_FILE,
                     default=reconfigure_entry.data[CONF.KENNFELD_FILE],
                 ): vol.In(container=await build_kennfeld_list(hass=self.hass)),
-                vol.Optional(
-                    schema=CONF.HK2, default=reconfigure_entry.data[CONF.HK2]
-                ): bool,
-                vol.Optional(
-                    schema=CONF.HK3, default=reconfigure_entry.data[CONF.HK3]
-                ): bool,
-                vol.Optional(
-                    schema=CONF.HK4, default=reconfigure_entry.data[CONF.HK4]
-                ): bool,
-                vol.Optional(
-                    schema=CONF.HK5, default=reconfigure_entry.data[CONF.HK5]
-                ): bool,
+                vol.Optional(schema=CONF.HK2, default=circuits[CONF.HK2]): bool,
+                vol.Optional(schema=CONF.HK3, default=circuits[CONF.HK3]): bool,
+                vol.Optional(schema=CONF.HK4, default=circuits[CONF.HK4]): bool,
+                vol.Optional(schema=CONF.HK5, default=circuits[CONF.HK5]): bool,
                 vol.Optional(
                     schema=CONF.NAME_DEVICE_PREFIX,
                     default=reconfigure_entry.data[CONF.NAME_DEVICE_PREFIX],
@@ -208,6 +275,101 @@ class ConfigFlow(config_entries.ConfigFlow, domain=CONST.DOMAIN):  # pylint: dis
         )
 
 
+class OptionsFlow(config_entries.OptionsFlow):
+    """Options flow to add and remove calculated sensors."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
+        """Show the menu of the options."""
+        return self.async_show_menu(
+            step_id="init", menu_options=["add_calc_sensor", "remove_calc_sensor"]
+        )
+
+    @property
+    def _calc_sensors(self) -> list[dict[str, Any]]:
+        """Return the calculated sensors of the options."""
+        return list(self.config_entry.options.get(CONF.CALC_SENSORS, []))
+
+    def _save(
+        self, calc_sensors: list[dict[str, Any]]
+    ) -> config_entries.ConfigFlowResult:
+        """Store the calculated sensors, the entry is reloaded."""
+        return self.async_create_entry(
+            data={**self.config_entry.options, CONF.CALC_SENSORS: calc_sensors}
+        )
+
+    async def async_step_add_calc_sensor(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
+        """Add a sensor calculated from other items."""
+        errors: dict[str, str] = {}
+        items = [item for device in DEVICELISTS for item in device]
+        if user_input is not None:
+            # the names must differ in their keys, e.g. "COP" and "cop" don't
+            keys = {slugify(item.name) for item in items} | {
+                slugify(sensor[CALC_NAME]) for sensor in self._calc_sensors
+            }
+            if slugify(user_input[CALC_NAME]) in keys:
+                errors[CALC_NAME] = "name_exists"
+            else:
+                try:
+                    bind_inputs(
+                        user_input[CALC_FORMULA],
+                        {item.translation_key for item in items},
+                    )
+                except CalculationError:
+                    errors[CALC_FORMULA] = "invalid_formula"
+            if not errors:
+                return self._save([*self._calc_sensors, user_input])
+
+        schema = vol.Schema(
+            {
+                vol.Required(CALC_NAME): cv.string,
+                vol.Required(CALC_FORMULA): cv.string,
+                vol.Optional(CALC_UNIT, default=""): str,
+                vol.Optional(CALC_PRECISION, default=2): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=4)
+                ),
+            }
+        )
+        return self.async_show_form(
+            step_id="add_calc_sensor",
+            data_schema=self.add_suggested_values_to_schema(schema, user_input),
+            errors=errors,
+        )
+
+    async def async_step_remove_calc_sensor(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.ConfigFlowResult:
+        """Remove calculated sensors."""
+        calc_sensors = self._calc_sensors
+        if not calc_sensors:
+            return self.async_abort(reason="no_calc_sensors")
+        if user_input is not None:
+            return self._save(
+                [
+                    sensor
+                    for sensor in calc_sensors
+                    if sensor[CALC_NAME] not in user_input[CONF.CALC_SENSORS]
+                ]
+            )
+
+        return self.async_show_form(
+            step_id="remove_calc_sensor",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF.CALC_SENSORS, default=[]): cv.multi_select(
+                        {
+                            sensor[CALC_NAME]: sensor[CALC_NAME]
+                            for sensor in calc_sensors
+                        }
+                    )
+                }
+            ),
+        )
+
+
 class InvalidHost(exceptions.HomeAssistantError):
     """Error to indicate there is an invalid hostname."""
 
@@ -31,6 +31,7 @@ class ConfConstants:
     PASSWORD: str = CONF_PASSWORD
     USERNAME: str = CONF_USERNAME
     WEBIF_TOKEN: str = "Web-IF-Token"
+    CALC_SENSORS: str = "calc_sensors"
 
 
 CONF = ConfConstants()
@@ -46,6 +47,11 @@ class MainConstants:
     APPID: int = 100
     DEF_KENNFELDFILE: str = "weishaupt_wbb_kennfeld.json"
     DEF_PREFIX: str = "weishaupt_wbb"
+    # one request per block of adjacent registers, see READSTRATEGIES
+    READ_STRATEGY: str = "block"
+    MAX_BLOCK_SIZE: int = 125
+    MAX_PIPELINED_REQUESTS: int = 4
+    POWERMAP_RESOLUTION: float = 0.5
 
 
 CONST = MainConstants()
@@ -71,6 +77,7 @@ class TypeConstants:
 
     SENSOR = "Sensor"
     SENSOR_CALC = "Sensor_Calc"
+    SENSOR_USER = "Sensor_User"
     SELECT = "Select"
     NUMBER = "Number"
     NUMBER_RO = "Number_RO"
@@ -79,6 +86,52 @@ class TypeConstants:
 TYPES = TypeConstants()
 
 
+@dataclass(frozen=True)
+class ReadStrategyConstants:
+    """Strategies for reading the modbus items of one update cycle."""
+
+    SEQUENTIAL = "sequential"
+    BLOCK = "block"
+    PIPELINED = "pipelined"
+
+
+READSTRATEGIES = ReadStrategyConstants()
+
+
+@dataclass(frozen=True)
+class RegisterConstants:
+    """Modbus register types."""
+
+    INPUT = "input"
+    HOLDING = "holding"
+
+
+REGISTERS = RegisterConstants()
+
+
+@dataclass(frozen=True)
+class BackoffStateConstants:
+    """States of the modbus connection backoff."""
+
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+    BACKOFF = "backoff"
+
+
+BACKOFFSTATES = BackoffStateConstants()
+
+
+@dataclass(frozen=True)
+class ProfilerConstants:
+    """Profilers of the profile_cycles service."""
+
+    CPROFILE = "cprofile"
+    SAMPLING = "sampling"
+
+
+PROFILERS = ProfilerConstants()
+
+
 @dataclass(frozen=True)
 class DeviceConstants:
     """Device constants."""
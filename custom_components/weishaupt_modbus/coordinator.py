@@ -3,6 +3,7 @@
 import asyncio
 from datetime import timedelta
 import logging
+import time
 from typing import Any
 
 from pymodbus import ModbusException
@@ -11,14 +12,29 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
+from .calculation import LEARNED, CalcGraph
 from .configentry import MyConfigEntry
-from .const import CONF, CONST, TYPES, DeviceConstants
+from .const import CONF, CONST, READSTRATEGIES, REGISTERS, TYPES, DeviceConstants
 from .items import ModbusItem
+from .learning import ENERGY_KEYS, FLOW_KEY, OUTSIDE_KEY, REQUEST_KEY, PowerLearner
+from .metrics import CycleMetrics
 from .modbusobject import ModbusAPI, ModbusObject
+from .readplan import ReadBlock, build_read_plan
+from .tuning import TuningResult, async_tune
 from .webif_object import WebifConnection
 
 _LOGGER = logging.getLogger(__name__)
 
+# configuration register of each optional heating circuit, 0 means "aus"
+HEATING_CIRCUITS: dict[str, tuple[str, int]] = {
+    CONF.HK2: (DeviceConstants.HZ2, 41201),
+    CONF.HK3: (DeviceConstants.HZ3, 41301),
+    CONF.HK4: (DeviceConstants.HZ4, 41401),
+    CONF.HK5: (DeviceConstants.HZ5, 41501),
+}
+# modbus exception code of an address the device does not know
+ILLEGAL_ADDRESS = 2
+
 
 async def check_configured(
     modbus_item: ModbusItem, config_entry: MyConfigEntry
@@ -37,6 +53,43 @@ async def check_configured(
             return True
 
 
+async def detect_heating_circuits(modbus_api: ModbusAPI) -> dict[str, bool]:
+    """Probe the configuration registers of the heating circuits 2 to 5.
+
+    The registers are not adjacent, so they are read with concurrent requests
+    instead of one block.
+
+    Args:
+        modbus_api: the modbus API, connected when necessary
+
+    Returns:
+        CONF.HK2 to CONF.HK5 flags of the circuits with a definite answer. A
+        circuit is installed when its configuration is not "aus", it is absent
+        when the register is unknown. Empty without connection.
+
+    """
+    if not modbus_api._modbus_client.connected:  # noqa: SLF001
+        if not await modbus_api.connect(startup=True):
+            return {}
+
+    responses = await asyncio.gather(
+        *(
+            modbus_api.read_registers(REGISTERS.HOLDING, address)
+            for _, address in HEATING_CIRCUITS.values()
+        ),
+        return_exceptions=True,
+    )
+    circuits: dict[str, bool] = {}
+    for conf, response in zip(HEATING_CIRCUITS, responses, strict=True):
+        if isinstance(response, BaseException):
+            _LOGGER.debug("Probing %s failed: %s", conf, str(response))
+        elif not response.isError():
+            circuits[conf] = response.registers[0] != 0
+        elif getattr(response, "exception_code", None) == ILLEGAL_ADDRESS:
+            circuits[conf] = False
+    return circuits
+
+
 class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
     """Modbus coordinator for Weishaupt heat pump."""
 
@@ -60,12 +113,81 @@ class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._modbusitems = api_items
         self._number_of_items = len(api_items)
         self._config_entry = p_config_entry
+        self._read_strategy: str = CONST.READ_STRATEGY
+        self._max_block_size: int = CONST.MAX_BLOCK_SIZE
+        self._read_plan: list[ReadBlock] | None = None
+        self._read_plan_invalid: int = 0
+        self._metrics = CycleMetrics()
+        self._tuning: TuningResult | None = None
+        self._items_by_key: dict[str, ModbusItem] | None = None
+        self._calc_graph: CalcGraph | None = None
+        self.learner: PowerLearner | None = None
 
     @property
     def modbus_items(self) -> list[ModbusItem]:
         """Return the list of modbus items for this coordinator."""
         return self._modbusitems
 
+    @property
+    def metrics(self) -> CycleMetrics:
+        """Return the update cycle metrics."""
+        return self._metrics
+
+    @property
+    def read_plan(self) -> list[ReadBlock] | None:
+        """Return the cached read plan of a full update, if already built."""
+        return self._read_plan
+
+    @property
+    def read_strategy(self) -> str:
+        """Return the strategy used to read the items."""
+        return self._read_strategy
+
+    @read_strategy.setter
+    def read_strategy(self, val: str) -> None:
+        """Set the strategy used to read the items."""
+        self._read_strategy = val
+        self._read_plan = None
+
+    @property
+    def max_block_size(self) -> int:
+        """Return the maximum number of registers per request."""
+        return self._max_block_size
+
+    @max_block_size.setter
+    def max_block_size(self, val: int) -> None:
+        """Set the maximum number of registers per request."""
+        self._max_block_size = val
+        self._read_plan = None
+
+    @property
+    def tuning(self) -> TuningResult | None:
+        """Return the applied tuning result, None when not tuned."""
+        return self._tuning
+
+    def apply_tuning(self, result: TuningResult) -> None:
+        """Use the block size and request timeout of a tuning result."""
+        self._tuning = result
+        self.max_block_size = result.max_block_size
+        self._modbus_api.timeout = result.timeout
+
+    async def async_tune(self) -> TuningResult | None:
+        """Measure the request parameters of the heat pump and apply them.
+
+        Returns:
+            The tuning result, None when the heat pump could not be probed
+
+        """
+        items = [
+            item
+            for item in self._modbusitems
+            if not item.is_invalid and await check_configured(item, self._config_entry)
+        ]
+        result = await async_tune(self._modbus_api, items)
+        if result is not None:
+            self.apply_tuning(result)
+        return result
+
     async def get_value(self, modbus_item: ModbusItem) -> Any:
         """Read a value from the modbus."""
         mbo = ModbusObject(self._modbus_api, modbus_item)
@@ -75,12 +197,76 @@ class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             modbus_item.state = await mbo.get_value()
         return modbus_item.state
 
+    @property
+    def calc_values(self) -> dict[str, Any]:
+        """Return the results of the calculated items by translation key."""
+        return {} if self._calc_graph is None else self._calc_graph.values
+
+    async def evaluate_calculations(self) -> int:
+        """Compute the calculated items whose inputs changed.
+
+        Returns:
+            number of recomputed items
+
+        """
+        if self._calc_graph is None:
+            self._calc_graph = CalcGraph(
+                [
+                    item
+                    for item in self._modbusitems
+                    if item.type in (TYPES.SENSOR_CALC, TYPES.SENSOR_USER)
+                    and await check_configured(item, self._config_entry)
+                ],
+                self.get_item,
+                lambda: self._config_entry.runtime_data.powermap,
+                lambda: (
+                    self._config_entry.runtime_data.powermap
+                    if self.learner is None
+                    else self.learner.powermap
+                ),
+            )
+        return self._calc_graph.evaluate()
+
+    def observe_power(self) -> bool:
+        """Feed the measured values of this update cycle to the power learner.
+
+        Returns:
+            True when the learned power map was refined
+
+        """
+        if self.learner is None:
+            return False
+        energy: float | None = 0.0
+        for key in ENERGY_KEYS:
+            value = self._scaled_state(key)
+            energy = None if energy is None or value is None else energy + value
+        return self.learner.observe(
+            time.monotonic(),
+            energy,
+            self._scaled_state(OUTSIDE_KEY),
+            self._scaled_state(FLOW_KEY),
+            self._scaled_state(REQUEST_KEY),
+        )
+
+    def _scaled_state(self, translation_key: str) -> float | None:
+        """Return the state of an item divided by its divider."""
+        item = self.get_item(translation_key)
+        if item is None or item.state is None or item.is_invalid:
+            return None
+        return item.state / item.params.get("divider", 1)
+
+    def get_item(self, translation_key: str) -> ModbusItem | None:
+        """Return the first item with a translation key."""
+        if self._items_by_key is None:
+            self._items_by_key = {}
+            for item in self._modbusitems:
+                self._items_by_key.setdefault(item.translation_key, item)
+        return self._items_by_key.get(translation_key)
+
     def get_value_from_item(self, translation_key: str) -> Any:
         """Read a value from another modbus item."""
-        for item in self._modbusitems:
-            if item.translation_key == translation_key:
-                return item.state
-        return None
+        item = self.get_item(translation_key)
+        return None if item is None else item.state
 
     async def _async_setup(self) -> None:
         """Set up the coordinator."""
@@ -93,6 +279,37 @@ class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             _LOGGER.warning("Connection failed during setup")
             raise ConfigEntryNotReady("Could not connect to modbus")
 
+    async def async_detect_heating_circuits(self) -> dict[str, bool]:
+        """Detect the installed heating circuits and prune the absent ones.
+
+        Items of circuits that are configured but not installed are marked
+        invalid, so they get no entities and are left out of the read plan.
+        Installed circuits that are not configured are only logged, the flags
+        are changed in the configuration.
+
+        Returns:
+            flags of the circuits with a definite answer, see detect_heating_circuits
+
+        """
+        circuits = await detect_heating_circuits(self._modbus_api)
+        absent = set()
+        for conf, installed in circuits.items():
+            configured = self._config_entry.data[conf]
+            if configured and not installed:
+                _LOGGER.warning("%s is configured but not installed", conf)
+                absent.add(HEATING_CIRCUITS[conf][0])
+            elif installed and not configured:
+                _LOGGER.warning(
+                    "%s is installed but not configured, enable it in the configuration",
+                    conf,
+                )
+        for item in self._modbusitems:
+            if item.device in absent:
+                item.is_invalid = True
+        if absent:
+            self._read_plan = None
+        return circuits
+
     async def fetch_data(self, idx: set[int] | None = None) -> dict[str, Any]:
         """Fetch all values from the modbus."""
         if idx is None or len(idx) == 0:
@@ -103,8 +320,7 @@ class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         if not await self._ensure_connection():
             return {}
 
-        results: dict[str, Any] = {}
-
+        items: list[ModbusItem] = []
         for index in to_update:
             if index >= len(self._modbusitems):
                 continue
@@ -122,11 +338,102 @@ class MyCoordinator(DataUpdateCoordinator[dict[str, Any]]):
                     | TYPES.SELECT
                     | TYPES.SENSOR_CALC
                 ):
-                    value = await self.get_value(item)
-                    results[item.translation_key] = value
-
+                    items.append(item)
+
+        self._metrics.start_cycle(self._modbus_api.metrics.requests)
+        partial = len(to_update) != len(self._modbusitems)
+        match self._read_strategy:
+            case READSTRATEGIES.BLOCK:
+                for block in self.get_read_plan(items, partial):
+                    await self.read_block(block)
+            case READSTRATEGIES.PIPELINED:
+                semaphore = asyncio.Semaphore(CONST.MAX_PIPELINED_REQUESTS)
+
+                async def read_limited(block: ReadBlock) -> None:
+                    async with semaphore:
+                        await self.read_block(block)
+
+                await asyncio.gather(
+                    *(
+                        read_limited(block)
+                        for block in self.get_read_plan(items, partial)
+                    )
+                )
+            case _:
+                for item in items:
+                    await self.get_value(item)
+
+        if not partial and self.observe_power() and self._calc_graph is not None:
+            # the learned grid was refined in place
+            self._calc_graph.invalidate(LEARNED)
+        await self.evaluate_calculations()
+        results = {item.translation_key: item.state for item in items}
+        self._metrics.end_cycle(
+            self._modbus_api.metrics.requests,
+            sum(1 for item in items if item.state is not None),
+        )
         return results
 
+    def get_read_plan(
+        self, modbus_items: list[ModbusItem], partial: bool = False
+    ) -> list[ReadBlock]:
+        """Return the read plan for the items.
+
+        Invalid items are left out. The plan of a full update is cached and only
+        rebuilt when further items became invalid.
+
+        Args:
+            modbus_items: configured items of this cycle
+            partial: True when only a subset of all items is updated
+
+        """
+        valid_items = []
+        for item in modbus_items:
+            if item.is_invalid:
+                item.state = None
+            else:
+                valid_items.append(item)
+        invalid = len(modbus_items) - len(valid_items)
+
+        if partial:
+            return build_read_plan(valid_items, self._max_block_size)
+        if self._read_plan is None or invalid != self._read_plan_invalid:
+            self._read_plan = build_read_plan(valid_items, self._max_block_size)
+            self._read_plan_invalid = invalid
+        return self._read_plan
+
+    async def read_block(self, block: ReadBlock) -> None:
+        """Read all items of a block with one request.
+
+        When the block can't be read as a whole, e.g. because the device does not
+        know one of the addresses, the items are read one by one.
+        """
+        registers: list[int] | None = None
+        start = time.perf_counter()
+        try:
+            mbr = await self._modbus_api.read_registers(
+                block.register_type, block.address, block.count
+            )
+            if not mbr.isError() and len(mbr.registers) == block.count:
+                registers = mbr.registers
+        except ModbusException as exc:
+            _LOGGER.debug(
+                "Reading block %s (%s registers) failed: %s",
+                block.address,
+                block.count,
+                str(exc),
+            )
+
+        self._metrics.record_block(time.perf_counter() - start, registers is None)
+        if registers is None:
+            for item in block.items:
+                await self.get_value(item)
+            return
+
+        for item in block.items:
+            mbo = ModbusObject(self._modbus_api, item)
+            item.state = mbo.check_valid_result(registers[item.address - block.address])
+
     async def _ensure_connection(self) -> bool:
         """Establish modbus connection."""
         if self._modbus_api._modbus_client is None:  # noqa: SLF001
@@ -0,0 +1,88 @@
+"""Diagnostics support for the Weishaupt modbus integration."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.core import HomeAssistant
+
+from .configentry import MyConfigEntry
+from .const import CONF
+from .coordinator import MyCoordinator, check_configured
+from .items import ModbusItem
+from .readplan import ReadBlock, build_read_plan, register_type
+
+TO_REDACT = {CONF.USERNAME, CONF.PASSWORD, CONF.WEBIF_TOKEN}
+
+
+def _read_plan(coordinator: MyCoordinator, items: list[ModbusItem]) -> list[ReadBlock]:
+    """Return the cached read plan or build one for the current items."""
+    if coordinator.read_plan is not None:
+        return coordinator.read_plan
+    return build_read_plan(
+        [item for item in items if not item.is_invalid], coordinator.max_block_size
+    )
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: MyConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry.
+
+    Only data that is already in memory is dumped, nothing is read from the heat
+    pump while the diagnostics are generated.
+    """
+    coordinator: MyCoordinator = config_entry.runtime_data.coordinator
+    modbus_api = coordinator.modbus_api
+
+    items = [
+        item
+        for item in coordinator.modbus_items
+        if await check_configured(item, config_entry)
+        and register_type(item) is not None
+    ]
+    modbus_metrics = modbus_api.metrics.as_dict()
+    register_metrics = modbus_metrics.pop("registers")
+
+    return {
+        "config_entry": async_redact_data(dict(config_entry.data), TO_REDACT),
+        "options": async_redact_data(dict(config_entry.options), TO_REDACT),
+        "read_strategy": coordinator.read_strategy,
+        "max_block_size": coordinator.max_block_size,
+        "tuning": None if coordinator.tuning is None else coordinator.tuning.as_dict(),
+        "learning": None
+        if coordinator.learner is None
+        else {
+            "observations": coordinator.learner.observations,
+            "nodes": int((coordinator.learner.counts > 0).sum()),
+        },
+        "read_plan": [
+            {
+                "register_type": block.register_type,
+                "address": block.address,
+                "count": block.count,
+                "items": [item.translation_key for item in block.items],
+            }
+            for block in _read_plan(coordinator, items)
+        ],
+        "availability": {
+            item.translation_key: {
+                "address": item.address,
+                "type": item.type,
+                "available": not item.is_invalid,
+                "state": item.state,
+            }
+            for item in items
+        },
+        "invalid_registers": sorted(
+            {item.address for item in items if item.is_invalid}
+        ),
+        "connection": {
+            "backoff_state": modbus_api.backoff_state,
+            **modbus_metrics,
+        },
+        "register_metrics": register_metrics,
+        "cycles": coordinator.metrics.as_dict(),
+        "raw_registers": dict(sorted(modbus_api.metrics.raw_registers.items())),
+    }
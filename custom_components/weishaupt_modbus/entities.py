@@ -2,18 +2,25 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.number import NumberEntity
 from homeassistant.components.select import SelectEntity
-from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory
 from homeassistant.core import callback
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .configentry import MyConfigEntry
-from .const import CONF, CONST, FORMATS
+from .const import CONF, CONST, DEVICES, FORMATS, TYPES
 from .coordinator import MyCoordinator, MyWebIfCoordinator
 from .hpconst import reverse_device_list
 from .items import ModbusItem, WebItem
@@ -26,6 +33,21 @@ if TYPE_CHECKING:
 _LOGGER: logging.Logger = __import__("logging").getLogger(__name__)
 
 
+def build_name_prefix(config_entry: MyConfigEntry, device: str) -> str:
+    """Build the prefix of entity names as configured in the config entry."""
+    if config_entry.data[CONF.NAME_DEVICE_PREFIX]:
+        name_device_prefix = config_entry.data[CONF.PREFIX] + "_"
+    else:
+        name_device_prefix = ""
+
+    if config_entry.data[CONF.NAME_TOPIC_PREFIX]:
+        name_topic_prefix = f"{reverse_device_list.get(device, 'UK')}_"
+    else:
+        name_topic_prefix = ""
+
+    return name_topic_prefix + name_device_prefix
+
+
 class MyEntity(Entity):
     """An entity using CoordinatorEntity.
 
@@ -62,20 +84,7 @@ class MyEntity(Entity):
         if dev_postfix == "_":
             dev_postfix = ""
 
-        dev_prefix = self._config_entry.data[CONF.PREFIX]
-
-        if self._config_entry.data[CONF.NAME_DEVICE_PREFIX]:
-            name_device_prefix = dev_prefix + "_"
-        else:
-            name_device_prefix = ""
-
-        if self._config_entry.data[CONF.NAME_TOPIC_PREFIX]:
-            device_key = self._api_item.device
-            name_topic_prefix = f"{reverse_device_list.get(device_key, 'UK')}_"
-        else:
-            name_topic_prefix = ""
-
-        name_prefix = name_topic_prefix + name_device_prefix
+        name_prefix = build_name_prefix(self._config_entry, self._api_item.device)
 
         self._dev_device = self._api_item.device + dev_postfix
         self._dev_device_base = self._api_item.device
@@ -201,7 +210,7 @@ class MyEntity(Entity):
         return self.my_device_info()
 
 
-class MySensorEntity(CoordinatorEntity, SensorEntity, MyEntity):
+class MySensorEntity(CoordinatorEntity[MyCoordinator], SensorEntity, MyEntity):
     """Class that represents a sensor entity.
 
     Derived from Sensorentity
@@ -248,10 +257,6 @@ class MyCalcSensorEntity(MySensorEntity):
     and decorated with general parameters from MyEntity
     """
 
-    # calculates output from map
-    _calculation_source = None
-    _calculation = None
-
     def __init__(
         self,
         config_entry: MyConfigEntry,
@@ -261,80 +266,24 @@ class MyCalcSensorEntity(MySensorEntity):
     ) -> None:
         """Initialize MyCalcSensorEntity."""
         MySensorEntity.__init__(self, config_entry, modbus_item, coordinator, idx)
-
-        if self._api_item.params is not None:
-            self._calculation_source = self._api_item.params.get("calculation", None)
-
-        if self._calculation_source is not None:
-            try:
-                self._calculation = compile(
-                    self._calculation_source, "calculation", "eval"
-                )
-            except SyntaxError:
-                _LOGGER.warning("Syntax error %s", self._calculation_source)
+        if modbus_item.type == TYPES.SENSOR_USER:
+            # calculated sensors of the options have no translation
+            self._attr_translation_key = None
+            self._attr_name = build_name_prefix(config_entry, modbus_item.device) + (
+                modbus_item.name
+            )
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self.translate_val(self._api_item.state)
-        self.async_write_ha_state()
+        """Handle updated data from the coordinator.
 
-    def translate_val(self, val):
-        """Translate a value from the modbus."""
-        if self._calculation_source is None:
-            return None
-        if self._api_item.params is None:
-            return None
-        if "val_1" in self._calculation_source:
-            val_1 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_1", 1)
-            )
-        if "val_2" in self._calculation_source:
-            val_2 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_2", 1)
-            )
-        if "val_3" in self._calculation_source:
-            val_3 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_3", 1)
-            )
-        if "val_4" in self._calculation_source:
-            val_4 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_4", 1)
-            )
-        if "val_5" in self._calculation_source:
-            val_5 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_5", 1)
-            )
-        if "val_6" in self._calculation_source:
-            val_6 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_6", 1)
-            )
-        if "val_7" in self._calculation_source:
-            val_7 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_7", 1)
-            )
-        if "val_8" in self._calculation_source:
-            val_8 = self._config_entry.runtime_data.coordinator.get_value_from_item(  # noqa: F841 pylint: disable=unused-variable
-                self._api_item.params.get("val_8", 1)
-            )
-        if "power" in self._calculation_source:
-            power = self._config_entry.runtime_data.powermap  # noqa: F841 pylint: disable=unused-variable
-
-        try:
-            val_0 = val / self._divider  # noqa: F841 pylint: disable=unused-variable
-            if self._calculation is not None:
-                y = eval(self._calculation)  # pylint: disable=eval-used  # noqa: S307
-            else:
-                return None
-        except ZeroDivisionError:
-            return None
-        except NameError:
-            _LOGGER.warning("Variable not defined %s", self._calculation_source)
-            return None
-        except TypeError:
-            _LOGGER.warning("No valid calculation string")
-            return None
-        return round(y, self._attr_suggested_display_precision)
+        The coordinator computes the calculated items once per cycle, the entity
+        only shows the result.
+        """
+        self._attr_native_value = self.coordinator.calc_values.get(
+            self._api_item.translation_key
+        )
+        self.async_write_ha_state()
 
 
 class MyNumberEntity(CoordinatorEntity, NumberEntity, MyEntity):  # pylint: disable=abstract-method
@@ -508,3 +457,66 @@ class MyWebifSensorEntity(CoordinatorEntity, SensorEntity, MyEntity):
 
         # Update the data
         await self.coordinator.async_request_refresh()
+
+
+@dataclass(frozen=True, kw_only=True)
+class MyDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor that reports the health of the modbus communication."""
+
+    value_fn: Callable[[MyCoordinator], Any]
+
+
+class MyDiagnosticSensorEntity(CoordinatorEntity[MyCoordinator], SensorEntity):
+    """Class that represents a diagnostic sensor of the poll performance.
+
+    The values are taken from the metrics of the coordinator and its ModbusAPI
+    after every update cycle. The sensors are disabled by default.
+    """
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    entity_description: MyDiagnosticSensorEntityDescription
+
+    def __init__(
+        self,
+        config_entry: MyConfigEntry,
+        coordinator: MyCoordinator,
+        description: MyDiagnosticSensorEntityDescription,
+    ) -> None:
+        """Initialize MyDiagnosticSensorEntity."""
+        super().__init__(coordinator)
+        self.entity_description = description
+
+        dev_postfix = "_" + config_entry.data[CONF.DEVICE_POSTFIX]
+        if dev_postfix == "_":
+            dev_postfix = ""
+
+        self._dev_device = DEVICES.SYS + dev_postfix
+        self._dev_translation_placeholders = {"postfix": dev_postfix}
+        self._attr_translation_placeholders = {
+            "prefix": build_name_prefix(config_entry, DEVICES.SYS)
+        }
+        self._attr_unique_id = (
+            f"{config_entry.data[CONF.PREFIX]}_diag_{description.key}{dev_postfix}"
+        )
+        self._attr_native_value = description.value_fn(coordinator)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._attr_native_value = self.entity_description.value_fn(self.coordinator)
+        self.async_write_ha_state()
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device info."""
+        return DeviceInfo(
+            identifiers={(CONST.DOMAIN, str(self._dev_device))},
+            translation_key=DEVICES.SYS,
+            translation_placeholders=self._dev_translation_placeholders,
+            sw_version="Device_SW_Version",
+            model="Device_model",
+            manufacturer="Weishaupt",
+        )
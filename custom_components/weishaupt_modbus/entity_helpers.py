@@ -9,6 +9,7 @@ from .const import TYPES
 from .coordinator import MyCoordinator, MyWebIfCoordinator, check_configured
 from .entities import (
     MyCalcSensorEntity,
+    MyDiagnosticSensorEntity,
     MyNumberEntity,
     MySelectEntity,
     MySensorEntity,
@@ -26,6 +27,7 @@ EntityType = (
     | MySelectEntity
     | MyNumberEntity
     | MyWebifSensorEntity
+    | MyDiagnosticSensorEntity
 )
 
 
@@ -50,6 +52,10 @@ async def check_available(
     if await check_configured(api_item, config_entry) is False:
         return False
 
+    # user defined calculated sensors have no register to check
+    if api_item.type == TYPES.SENSOR_USER:
+        return True
+
     modbus_api = config_entry.runtime_data.modbus_api
     mbo = ModbusObject(modbus_api, api_item, no_connect_warn=True)
     _ = await mbo.get_value()
@@ -94,7 +100,7 @@ async def build_entity_list(
                             entries.append(
                                 MySensorEntity(config_entry, item, coordinator, index)
                             )
-                        case TYPES.SENSOR_CALC:
+                        case TYPES.SENSOR_CALC | TYPES.SENSOR_USER:
                             entries.append(
                                 MyCalcSensorEntity(
                                     config_entry,
@@ -974,8 +974,8 @@ IO_STATUS: list[StatusItem] = [
 #
 # For SENSOR_CALC only:
 # "val_1" .. "val_8": translation keys of other entities that should be used to calculate the value of this entity
-# "calculation": A string that can be used by the eval() command to calculate the sensor value. All Python operations
-#                and the variables val_0 .. val_8 can be used here
+# "calculation": An arithmetic expression to calculate the sensor value. Numbers, + - * / // % **, abs(), min(), max(),
+#                round(), power.map(), learned.map() and the variables val_0 .. val_8 can be used here, see calculation.py
 #                The value of the modbus address of the entity itself is available in val_0
 ##############################################################################################################################
 
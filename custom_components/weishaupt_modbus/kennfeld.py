@@ -2,44 +2,49 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Sequence
+import copy
+from dataclasses import dataclass
+import glob
+import hashlib
+import importlib.util
 import json
 import logging
 from pathlib import Path
+import re
 from typing import Any
 
 import aiofiles  # type: ignore[import-untyped]
 import numpy as np
-from numpy.polynomial import Chebyshev
+from numpy.typing import ArrayLike
 
 from homeassistant.core import HomeAssistant
+from homeassistant.util.hass_dict import HassKey
 
 from .configentry import MyConfigEntry
 from .const import CONF, CONST
 
 _LOGGER = logging.getLogger(__name__)
 
-SPLINE_AVAILABLE = True
-CubicSpline: Any = None
-try:
-    import scipy  # type: ignore[import-untyped] # noqa: F401 pylint: disable=unused-import
-    from scipy.interpolate import CubicSpline  # type: ignore[import-untyped]
-
-    _LOGGER.info(
-        "Scipy available, use precise cubic spline interpolation for heating power"
-    )
-except ModuleNotFoundError:
-    _LOGGER.warning(
-        "Scipy not available, use less precise Chebyshef interpolation for heating power"
-    )
-    SPLINE_AVAILABLE = False
-
-MATPLOTLIB_AVAILABLE = True
-plt: Any = None
-try:
-    import matplotlib.pyplot as plt  # type: ignore[import-not-found,import-untyped]
-except ModuleNotFoundError:
+# outside temperatures in °C covered by the power map
+OUTSIDE_MIN = -30
+OUTSIDE_MAX = 40
+# part of the cache key, to be increased when the grid computation changes
+GRID_CACHE_VERSION = 3
+# hex digits of the cache key in the names of the cache files
+GRID_CACHE_KEY_LENGTH = 16
+# deviation of the map from a known power value that is warned about, relative
+# to the largest known power
+VALIDATION_TOLERANCE = 0.01
+# the key of the plotted grid is stored as PNG text chunk before the image data
+PLOT_KEY_FIELD = "Description"
+PLOT_HEADER_BYTES = 1024
+
+# matplotlib takes seconds to import, it is only imported when a plot is drawn
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec("matplotlib") is not None
+if not MATPLOTLIB_AVAILABLE:
     _LOGGER.warning("Matplotlib not available. Can't create power map image file")
-    MATPLOTLIB_AVAILABLE = False
 
 
 class PowerMap:
@@ -90,28 +95,50 @@ class PowerMap:
         ],
     ]
 
-    # the known x values for linear interpolation
+    # the flow temperatures of the curves in known_y, kennfeld files may give any number of curves
     known_t = [35, 55]
 
     # the aim is generating a 2D power map that gives back the actual power for a certain flow temperature and a given outside temperature
-    # the map should have values on every integer temperature point
-    # at first, all flow temperatures are linearly interpolated
-
-    def __init__(self, config_entry: MyConfigEntry, hass: HomeAssistant) -> None:
-        """Initialize the PowerMap class."""
+    # the map has values on a grid of the configured resolution, lookups interpolate between them
+    # the grid is sampled from a spline surface through the known curves, see build_power_grid
+
+    def __init__(
+        self,
+        config_entry: MyConfigEntry,
+        hass: HomeAssistant,
+        resolution: float = CONST.POWERMAP_RESOLUTION,
+    ) -> None:
+        """Initialize the PowerMap class.
+
+        Args:
+            config_entry: the config entry with the kennfeld file
+            hass: the Home Assistant instance
+            resolution: grid spacing in K of both temperature axes
+
+        """
         self.hass = hass
-        self._config_entry = config_entry
+        # instances are shared by config entries, nothing else of the entry is kept
+        self._kennfeld_file = config_entry.data[CONF.KENNFELD_FILE]
+        self._resolution = resolution
         self._steps = 21
-        self._max_power: list[Any] = []
-        self._interp_y: list[Any] = []
-        self._r_to_interpolate: Any = None
+        # identifies the kennfeld content and settings the grid was built from
+        self._key = ""
         self._all_t: Any = None
+        # the lookup grid, one row per flow temperature, as contiguous float32
+        self._grid: Any = None
+        self._cells: Any = None
+        self._width = 0
+        # grid index = temperature in 0.1 °C * scale + offset
+        self._x_scale = 0.1
+        self._x_offset = 0.0
+        self._y_scale = 0.1
+        self._y_offset = 0.0
+        self._x_last = 0
+        self._y_last = 0
 
     async def initialize(self) -> None:
         """Initialize the power map."""
-        filepath = Path(
-            get_filepath(self.hass) / self._config_entry.data[CONF.KENNFELD_FILE]
-        )
+        filepath = Path(get_filepath(self.hass) / self._kennfeld_file)
 
         try:
             async with aiofiles.open(filepath, encoding="utf-8") as openfile:
@@ -135,86 +162,184 @@ class PowerMap:
                     filepath,
                 )
 
-        self._r_to_interpolate = np.linspace(
-            self.known_t[0], self.known_t[1], self._steps
+        self._all_t = np.linspace(
+            OUTSIDE_MIN,
+            OUTSIDE_MAX,
+            round((OUTSIDE_MAX - OUTSIDE_MIN) / self._resolution) + 1,
         )
-        # the output matrix
-        self._max_power = []
-        self._interp_y = []
-
-        # build the matrix with linear interpolated samples
-        # 1st and last row are populated by known values from diagram, the rest is zero
-        self._interp_y.append(self.known_y[0])
-        v = np.linspace(0, self._steps - 3, self._steps - 2)
-        for _idx in v:
-            self._interp_y.append(np.zeros_like(self.known_x))
-        self._interp_y.append(self.known_y[1])
-
-        for idx in range(len(self.known_x)):
-            # the known y for every column
-            yk = [self._interp_y[0][idx], self._interp_y[self._steps - 1][idx]]
-
-            # linear interpolation
-            ip = np.interp(self._r_to_interpolate, self.known_t, yk)
-
-            # sort the interpolated values into the array
-            for r in range(len(self._r_to_interpolate)):
-                self._interp_y[r][idx] = ip[r]
-
-        # at second step, power vs. outside temp are interpolated using cubic splines
-        # we want to have samples at every integer °C
-        self._all_t = np.linspace(-30, 40, 71)
-        # cubic spline interpolation of power curves
-        for idx in range(len(self._r_to_interpolate)):
-            if SPLINE_AVAILABLE is True and CubicSpline is not None:
-                f: Any = CubicSpline(
-                    self.known_x, self._interp_y[idx], bc_type="natural"
-                )
-            else:
-                f = Chebyshev.fit(self.known_x, self._interp_y[idx], deg=8)
-            self._max_power.append(f(self._all_t))
+        self._steps = round((self.known_t[-1] - self.known_t[0]) / self._resolution) + 1
+        self._key = grid_cache_key(raw_block, self._resolution)
+        cache_file = filepath.with_name(f"{filepath.stem}.{self._key}.npy")
+        grid = await self.hass.async_add_executor_job(
+            load_cached_grid, cache_file, (self._steps, len(self._all_t))
+        )
+        if grid is None:
+            # the grid is built in the executor, fitting the curves blocks for a few ms
+            grid = await self.hass.async_add_executor_job(
+                build_power_grid,
+                self.known_x,
+                self.known_y,
+                self.known_t,
+                self._steps,
+                self._all_t,
+            )
+            grid = np.ascontiguousarray(grid, dtype=np.float32)
+            await self.hass.async_add_executor_job(save_cached_grid, cache_file, grid)
+        self._set_grid(grid)
+        # the grid is shared by all config entries using this power map
+        self._grid.flags.writeable = False
+
+        deviation = np.abs(self.validate()).max()
+        if deviation > VALIDATION_TOLERANCE * np.max(self.known_y):
+            _LOGGER.warning(
+                "Power map deviates up to %.0f W from the values of %s",
+                deviation,
+                filepath,
+            )
 
         try:
             if MATPLOTLIB_AVAILABLE:
-                await self._config_entry.runtime_data.hass.async_add_executor_job(
-                    self.plot_kennfeld_to_file
-                )
+                await self.hass.async_add_executor_job(self.plot_kennfeld_to_file)
         except RuntimeError:
             _LOGGER.warning("Reconfigure powermap")
 
+    @property
+    def grid(self) -> np.ndarray:
+        """Return the power grid, one row per flow temperature."""
+        return self._grid
+
+    @property
+    def outside_temperatures(self) -> np.ndarray:
+        """Return the outside temperatures of the grid columns in °C."""
+        return self._all_t
+
+    @property
+    def flow_temperatures(self) -> np.ndarray:
+        """Return the flow temperatures of the grid rows in °C."""
+        return np.linspace(self.known_t[0], self.known_t[-1], self._grid.shape[0])
+
+    def with_grid(self, grid: np.ndarray) -> PowerMap:
+        """Return a power map over the same temperatures with another grid.
+
+        The grid is used as is when it is a contiguous float32 array, changes
+        of its values are seen by the lookups of the returned map.
+        """
+        powermap = copy.copy(self)
+        powermap._set_grid(grid)  # noqa: SLF001
+        return powermap
+
+    def _set_grid(self, grid: np.ndarray) -> None:
+        """Use a grid over self._all_t and the flow temperatures for lookups."""
+        self._grid = np.ascontiguousarray(grid, dtype=np.float32)
+        # indexing a memoryview gives Python floats without numpy scalar overhead
+        self._cells = memoryview(self._grid.reshape(-1))
+        self._y_last, self._x_last = (size - 1 for size in self._grid.shape)
+        self._width = self._grid.shape[1]
+        per_kelvin = self._x_last / float(self._all_t[-1] - self._all_t[0])
+        self._x_scale = per_kelvin / 10
+        self._x_offset = -float(self._all_t[0]) * per_kelvin
+        per_kelvin = self._y_last / float(self.known_t[-1] - self.known_t[0])
+        self._y_scale = per_kelvin / 10
+        self._y_offset = -float(self.known_t[0]) * per_kelvin
+
     def map(self, x: float, y: float) -> float:
-        """Map temperature values to power."""
-        x = x / 10 - self.known_x[0]
-        x = max(x, 0)
-        x = min(x, 70)
-        y = y / 10 - self.known_t[0]
-        y = max(y, 0)
-        y = min(y, self._steps - 1)
+        """Map temperature values to power.
+
+        The power is interpolated bilinearly between the grid points, both
+        temperatures are clamped to the range of the grid.
+
+        Args:
+            x: outside temperature in 0.1 °C
+            y: flow temperature in 0.1 °C
+
+        """
+        x_last = self._x_last
+        y_last = self._y_last
+        fx = x * self._x_scale + self._x_offset
+        fy = y * self._y_scale + self._y_offset
+        if fx < 0.0:
+            fx = 0.0
+        elif fx > x_last:
+            fx = x_last
+        if fy < 0.0:
+            fy = 0.0
+        elif fy > y_last:
+            fy = y_last
+        # the last grid point is reached from the cell before it
+        ix = int(fx)
+        if ix == x_last:
+            ix -= 1
+        iy = int(fy)
+        if iy == y_last:
+            iy -= 1
+        tx = fx - ix
+
+        cells = self._cells
+        i = iy * self._width + ix
+        j = i + self._width
+        low = cells[i] + tx * (cells[i + 1] - cells[i])
+        high = cells[j] + tx * (cells[j + 1] - cells[j])
+        return low + (fy - iy) * (high - low)
+
+    def validate(self) -> np.ndarray:
+        """Return the deviation of the map from the known power values.
+
+        Returns:
+            map minus known power, in the shape of known_y
+
+        """
+        outside, flow = np.meshgrid(self.known_x, self.known_t)
+        return self.map_many(outside * 10, flow * 10) - np.asarray(
+            self.known_y, dtype=float
+        )
 
-        return self._max_power[int(y)][int(x)]
+    def map_many(self, x: ArrayLike, y: ArrayLike) -> np.ndarray:
+        """Map arrays of temperature values to power, the batched form of map."""
+        fx = np.asarray(x, dtype=float) * self._x_scale + self._x_offset
+        fx = np.clip(fx, 0.0, self._x_last)
+        fy = np.asarray(y, dtype=float) * self._y_scale + self._y_offset
+        fy = np.clip(fy, 0.0, self._y_last)
+        ix = np.minimum(fx.astype(np.intp), self._x_last - 1)
+        iy = np.minimum(fy.astype(np.intp), self._y_last - 1)
+        tx = fx - ix
+
+        cells = self._grid.reshape(-1)
+        i = iy * self._width + ix
+        j = i + self._width
+        low = cells.take(i)
+        low += tx * (cells.take(i + 1) - low)
+        high = cells.take(j)
+        high += tx * (cells.take(j + 1) - high)
+        return low + (fy - iy) * (high - low)
 
     def plot_kennfeld_to_file(self) -> None:
         """Plot the kennfeld file into png image for display."""
-        if not MATPLOTLIB_AVAILABLE or plt is None:
+        if not MATPLOTLIB_AVAILABLE:
             _LOGGER.warning("Matplotlib not available, cannot plot kennfeld")
             return
 
-        plt.plot(self._all_t, np.transpose(self._max_power))
-        plt.ylabel("Max Power")
-        plt.xlabel("°C")
-        plt.grid()
-        plt.xlim(-25, 40)
-        plt.ylim(2000, 12000)
-
         filepath = (
-            self._config_entry.runtime_data.config_dir
-            + "/www/local/"
-            + CONST.DOMAIN
-            + "_powermap.png"
+            self.hass.config.config_dir + "/www/local/" + CONST.DOMAIN + "_powermap.png"
         )
+        if plot_is_current(Path(filepath), self._key):
+            _LOGGER.debug("Power map image file %s is up to date", filepath)
+            return
+
+        # a figure of its own instead of pyplot, that keeps global state and is
+        # not thread safe
+        from matplotlib.figure import Figure  # noqa: PLC0415
+
+        fig = Figure()
+        ax = fig.subplots()
+        ax.plot(self._all_t, np.transpose(self._grid))
+        ax.set_ylabel("Max Power")
+        ax.set_xlabel("°C")
+        ax.grid()
+        ax.set_xlim(-25, 40)
+        ax.set_ylim(2000, 12000)
 
         try:
-            plt.savefig(filepath)
+            fig.savefig(filepath, metadata={PLOT_KEY_FIELD: self._key})
             _LOGGER.info(
                 "Write power map image file %s",
                 filepath,
@@ -226,6 +351,211 @@ class PowerMap:
             )
 
 
+@dataclass
+class _SharedPowerMap:
+    """A power map with the number of config entries using it."""
+
+    powermap: PowerMap
+    initialized: asyncio.Task[None]
+    users: int = 0
+
+
+POWERMAPS: HassKey[dict[tuple[str, float], _SharedPowerMap]] = HassKey(
+    f"{CONST.DOMAIN}_powermaps"
+)
+
+
+async def async_acquire_powermap(
+    hass: HomeAssistant,
+    config_entry: MyConfigEntry,
+    resolution: float = CONST.POWERMAP_RESOLUTION,
+) -> PowerMap:
+    """Return the initialized power map of the kennfeld file of a config entry.
+
+    Config entries with the same kennfeld file and resolution share one
+    instance. Every acquired power map has to be released with
+    release_powermap when the config entry is unloaded.
+    """
+    shared = hass.data.setdefault(POWERMAPS, {})
+    key = (config_entry.data[CONF.KENNFELD_FILE], resolution)
+    if (entry := shared.get(key)) is None:
+        powermap = PowerMap(config_entry, hass, resolution)
+        entry = _SharedPowerMap(powermap, hass.async_create_task(powermap.initialize()))
+        shared[key] = entry
+    entry.users += 1
+    try:
+        # a cancelled setup must not cancel the initialization of other entries
+        await asyncio.shield(entry.initialized)
+    except BaseException:
+        release_powermap(hass, entry.powermap)
+        raise
+    return entry.powermap
+
+
+def release_powermap(hass: HomeAssistant, powermap: PowerMap) -> None:
+    """Release a power map, it is dropped when no config entry uses it anymore."""
+    shared = hass.data.get(POWERMAPS, {})
+    for key, entry in shared.items():
+        if entry.powermap is powermap:
+            entry.users -= 1
+            if entry.users == 0:
+                del shared[key]
+            return
+
+
+def build_power_grid(
+    known_x: Sequence[float],
+    known_y: Sequence[Sequence[float]],
+    known_t: Sequence[float],
+    steps: int,
+    outside: np.ndarray,
+) -> np.ndarray:
+    """Build the power map from the known power curves.
+
+    The map is sampled from a bicubic spline surface through the known power
+    values. Every curve is interpolated along the outside temperature, then
+    the curves are interpolated along the flow temperature. The map spans
+    steps flow temperatures from known_t[0] to known_t[-1]. Outside
+    temperatures beyond known_x get the power of the nearest known one. With
+    two curves the surface is linear between them.
+
+    Args:
+        known_x: increasing outside temperatures of the known power values
+        known_y: known power values, one curve per flow temperature
+        known_t: increasing flow temperatures of the curves
+        steps: number of flow temperatures of the map
+        outside: outside temperatures of the map
+
+    Returns:
+        The power map, one row per flow temperature
+
+    Raises:
+        ValueError: when known_y doesn't have one curve of len(known_x)
+            values per flow temperature
+
+    """
+    curves = np.asarray(known_y, dtype=float)
+    if len(known_t) < 2 or curves.shape != (len(known_t), len(known_x)):
+        raise ValueError(
+            f"Expected {len(known_t)} power curves of {len(known_x)} values "
+            f"for at least 2 flow temperatures, got shape {curves.shape}"
+        )
+    clamped = np.clip(outside, known_x[0], known_x[-1])
+    # one column per outside temperature of the map
+    columns = natural_cubic_spline(known_x, curves, clamped).T
+    flow = np.linspace(known_t[0], known_t[-1], steps)
+    return natural_cubic_spline(known_t, columns, flow).T
+
+
+def natural_cubic_spline(
+    known_x: ArrayLike, known_y: ArrayLike, x: ArrayLike
+) -> np.ndarray:
+    """Evaluate natural cubic splines through the rows of known_y.
+
+    Gives the same result as scipy.interpolate.CubicSpline with
+    bc_type="natural" along the last axis. Outside of known_x the first and
+    last polynomial pieces are extrapolated, as SciPy does.
+
+    Args:
+        known_x: strictly increasing sample positions, with two the
+            spline is the line between them
+        known_y: sample values, one spline per row
+        x: positions to evaluate all splines at
+
+    Returns:
+        The values of the splines, one row per row of known_y
+
+    """
+    xk = np.asarray(known_x, dtype=float)
+    yk = np.asarray(known_y, dtype=float)
+    h = np.diff(xk)
+    slope = np.diff(yk, axis=-1) / h
+
+    # tridiagonal system of the second derivatives m of the inner points,
+    # m is zero at both ends for natural splines
+    diag = 2.0 * (h[:-1] + h[1:])
+    rhs = 6.0 * np.diff(slope, axis=-1)
+    # Thomas algorithm, the elimination runs on all rows at once
+    for i in range(1, len(diag)):
+        factor = h[i] / diag[i - 1]
+        diag[i] -= factor * h[i]
+        rhs[..., i] -= factor * rhs[..., i - 1]
+    m = np.zeros_like(yk)
+    if len(diag):
+        m[..., -2] = rhs[..., -1] / diag[-1]
+    for i in range(len(diag) - 2, -1, -1):
+        m[..., i + 1] = (rhs[..., i] - h[i + 1] * m[..., i + 2]) / diag[i]
+
+    t = np.asarray(x, dtype=float)
+    # the segment of every position
+    seg = np.clip(np.searchsorted(xk, t, side="right") - 1, 0, len(h) - 1)
+    hi = h[seg]
+    right = xk[seg + 1] - t
+    left = t - xk[seg]
+    m0 = m[..., seg]
+    m1 = m[..., seg + 1]
+    return (
+        (m0 * right**3 + m1 * left**3) / (6.0 * hi)
+        + (yk[..., seg] / hi - m0 * hi / 6.0) * right
+        + (yk[..., seg + 1] / hi - m1 * hi / 6.0) * left
+    )
+
+
+def grid_cache_key(kennfeld: str, resolution: float) -> str:
+    """Return the key of the grid built from a kennfeld file with the settings."""
+    settings = {
+        "version": GRID_CACHE_VERSION,
+        "resolution": resolution,
+        "outside": [OUTSIDE_MIN, OUTSIDE_MAX],
+    }
+    digest = hashlib.sha256(kennfeld.encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:GRID_CACHE_KEY_LENGTH]
+
+
+def load_cached_grid(path: Path, shape: tuple[int, int]) -> np.ndarray | None:
+    """Return the memory mapped grid of a cache file, None if missing or invalid."""
+    try:
+        grid = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if grid.shape != shape or grid.dtype != np.float32:
+        _LOGGER.warning("Ignoring power map cache file %s with invalid grid", path)
+        return None
+    _LOGGER.debug("Loaded power map from cache file %s", path)
+    return grid
+
+
+def save_cached_grid(path: Path, grid: np.ndarray) -> None:
+    """Write the grid to a cache file and remove the caches of older versions."""
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        with tmp_path.open("wb") as outfile:
+            np.save(outfile, grid)
+        tmp_path.replace(path)
+        # only the caches of this kennfeld, not of one whose stem starts with
+        # the same dotted prefix, e.g. wbb.10kw.json next to wbb.json
+        stem = path.stem.rsplit(".", 1)[0]
+        pattern = re.compile(
+            rf"{re.escape(stem)}\.[0-9a-f]{{{GRID_CACHE_KEY_LENGTH}}}\.npy"
+        )
+        for stale in path.parent.glob(f"{glob.escape(stem)}.*.npy"):
+            if stale != path and pattern.fullmatch(stale.name):
+                stale.unlink(missing_ok=True)
+    except OSError:
+        _LOGGER.warning("Error writing power map cache file %s", path)
+
+
+def plot_is_current(path: Path, key: str) -> bool:
+    """Return True if the image file shows the grid with the key."""
+    try:
+        with path.open("rb") as infile:
+            header = infile.read(PLOT_HEADER_BYTES)
+    except OSError:
+        return False
+    return f"{PLOT_KEY_FIELD}\0{key}".encode() in header
+
+
 def get_filepath(hass: HomeAssistant) -> Path | None:
     """Get the filepath to the custom component directory."""
     filepath = Path(f"{hass.config.config_dir}/custom_components/{CONST.DOMAIN}")
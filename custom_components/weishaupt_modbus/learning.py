@@ -0,0 +1,315 @@
+"""Online learning of the power map from measured energy.
+
+The power map of the kennfeld file is datasheet data. The heat pump counts the
+heat it produced, so the real power follows from the energy counters: between
+two increments of the counter the heat pump produced the counter resolution
+in the time that passed. Divided by the mean power request this gives the
+maximum power at the mean outside and flow temperature of the interval.
+
+Every observation is stored as ratio to the datasheet power, in two constant
+size estimators:
+
+- a running mean per node of a coarse temperature grid, for the local
+  deviations where the heat pump often runs
+- a least squares fit of a plane over both temperatures, for the general
+  deviation that also covers conditions without observations yet
+
+Both are weighted against the datasheet, which counts as PRIOR_WEIGHT
+observations. The learned grid is the datasheet grid times the blended ratios
+and is refined in place after every observation. Calculations can use it as
+"learned", in the same way as the datasheet power map "power".
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+import numpy as np
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import CONST
+from .kennfeld import PowerMap
+
+_LOGGER = logging.getLogger(__name__)
+
+LEARNING_STORAGE_VERSION = 1
+# seconds a changed estimate waits before it is stored, to limit the writes
+SAVE_DELAY = 600
+# items of the measured values
+OUTSIDE_KEY = "luftansautgemp"
+FLOW_KEY = "vl_temp"
+REQUEST_KEY = "leistungsanforderung"
+ENERGY_KEYS = ("heiz_energie_heute", "ww_energie_heute")
+# J per kWh, the resolution of the energy counters
+JOULE_PER_KWH = 3.6e6
+# K between the nodes of the running means
+NODE_SPACING = 2.5
+# observations the datasheet is worth, at every node and for the plane
+PRIOR_WEIGHT = 5.0
+# a node averages over at most this many observations, so it keeps adapting
+MAX_COUNT = 100
+# intervals with less mean power request or longer ones are no observation
+MIN_REQUEST = 20.0
+MAX_INTERVAL = 7200.0
+# ratios to the datasheet beyond these are measurement errors
+MIN_RATIO = 0.25
+MAX_RATIO = 4.0
+# reference temperatures in °C and scale in K of the plane, keeps its
+# coefficients of similar size
+PLANE_OUTSIDE = 0.0
+PLANE_FLOW = 45.0
+PLANE_SCALE = 10.0
+
+
+def _interpolation_matrix(nodes: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Return the matrix that interpolates values at nodes linearly to points."""
+    return np.array([np.interp(points, nodes, unit) for unit in np.eye(len(nodes))]).T
+
+
+class PowerLearner:
+    """Learn the power map of one heat pump from its energy counters."""
+
+    def __init__(
+        self, datasheet: PowerMap, store: Store[dict[str, Any]] | None = None
+    ) -> None:
+        """Initialize the learner.
+
+        Args:
+            datasheet: the initialized power map of the kennfeld file
+            store: persists the estimate when given
+
+        """
+        self._datasheet = datasheet
+        self._store = store
+        outside = datasheet.outside_temperatures
+        flow = datasheet.flow_temperatures
+        self._outside_nodes = _nodes(outside[0], outside[-1])
+        self._flow_nodes = _nodes(flow[0], flow[-1])
+        shape = (len(self._flow_nodes), len(self._outside_nodes))
+        self.counts: np.ndarray = np.zeros(shape)
+        self.means: np.ndarray = np.ones(shape)
+        # normal equations of the plane ratio = c0 + c1 * outside + c2 * flow
+        self.normal: np.ndarray = np.zeros((3, 3))
+        self.moments: np.ndarray = np.zeros(3)
+        self.observations = 0
+        self._to_outside = _interpolation_matrix(self._outside_nodes, outside)
+        self._to_flow = _interpolation_matrix(self._flow_nodes, flow)
+        self._node_features = np.stack(
+            np.broadcast_arrays(
+                1.0,
+                ((self._outside_nodes - PLANE_OUTSIDE) / PLANE_SCALE)[np.newaxis, :],
+                ((self._flow_nodes - PLANE_FLOW) / PLANE_SCALE)[:, np.newaxis],
+            ),
+            axis=-1,
+        )
+        self.powermap = datasheet.with_grid(datasheet.grid.copy())
+        # the interval since the last increment of the energy counter
+        self._energy: float | None = None
+        self._start: float | None = None
+        self._sums = np.zeros(3)
+        self._samples = 0
+        self._unsaved = False
+
+    def observe(
+        self,
+        now: float,
+        energy: float | None,
+        outside: float | None,
+        flow: float | None,
+        request: float | None,
+    ) -> bool:
+        """Take the measured values of one update cycle.
+
+        Args:
+            now: monotonic time in s
+            energy: heat produced today in kWh
+            outside: outside temperature in °C
+            flow: flow temperature in °C
+            request: power request in %
+
+        Returns:
+            True when an interval was completed and learned from
+
+        """
+        if energy is None or outside is None or flow is None or request is None:
+            # the interval can't be averaged, wait for the next increment
+            self._start = None
+            return False
+        if self._energy is None or energy < self._energy:
+            # first value or the counters were reset at midnight
+            self._energy = energy
+            self._start = None
+            return False
+
+        learned = False
+        if energy > self._energy:
+            if self._start is not None and self._samples:
+                learned = self._learn_interval(now - self._start, energy - self._energy)
+            self._energy = energy
+            self._start = now
+            self._sums[:] = 0.0
+            self._samples = 0
+        if self._start is not None:
+            self._sums += (outside, flow, request)
+            self._samples += 1
+        return learned
+
+    def _learn_interval(self, duration: float, energy: float) -> bool:
+        """Learn from the interval between two increments of the counter."""
+        outside, flow, request = self._sums / self._samples
+        if duration <= 0 or duration > MAX_INTERVAL or request < MIN_REQUEST:
+            return False
+        power = energy * JOULE_PER_KWH / duration
+        return self.learn(outside, flow, power * 100 / request)
+
+    def learn(self, outside: float, flow: float, max_power: float) -> bool:
+        """Learn the maximum power at the temperatures.
+
+        Args:
+            outside: outside temperature in °C
+            flow: flow temperature in °C
+            max_power: maximum power of the heat pump in W
+
+        Returns:
+            False when the power is implausible and was ignored
+
+        """
+        expected = self._datasheet.map(outside * 10, flow * 10)
+        if expected <= 0:
+            return False
+        ratio = max_power / expected
+        if not MIN_RATIO <= ratio <= MAX_RATIO:
+            _LOGGER.debug(
+                "Ignoring power %.0f W at %.1f/%.1f °C, the map gives %.0f W",
+                max_power,
+                outside,
+                flow,
+                expected,
+            )
+            return False
+
+        node = (
+            _nearest(self._flow_nodes, flow),
+            _nearest(self._outside_nodes, outside),
+        )
+        count = min(self.counts[node] + 1, MAX_COUNT)
+        self.means[node] += (ratio - self.means[node]) / count
+        self.counts[node] = count
+        features = np.array(
+            [
+                1.0,
+                (outside - PLANE_OUTSIDE) / PLANE_SCALE,
+                (flow - PLANE_FLOW) / PLANE_SCALE,
+            ]
+        )
+        self.normal += np.outer(features, features)
+        self.moments += ratio * features
+        self.observations += 1
+
+        self.refine()
+        if self._store is not None:
+            self._unsaved = True
+            self._store.async_delay_save(self._stored, SAVE_DELAY)
+        return True
+
+    def _stored(self) -> dict[str, Any]:
+        """Return the estimate for the delayed save of the store."""
+        self._unsaved = False
+        return self.as_dict()
+
+    async def async_unload(self) -> None:
+        """Store the estimate now instead of after the delay."""
+        if self._store is not None and self._unsaved:
+            await self._store.async_save(self._stored())
+
+    def refine(self) -> None:
+        """Update the learned grid in place from the estimators."""
+        # the plane is pulled towards the datasheet, ratio 1 everywhere
+        prior = np.array([PRIOR_WEIGHT, 0.0, 0.0])
+        plane = np.linalg.solve(
+            self.normal + PRIOR_WEIGHT * np.eye(3), self.moments + prior
+        )
+        weight = self.counts / (self.counts + PRIOR_WEIGHT)
+        ratios = weight * self.means + (1 - weight) * (self._node_features @ plane)
+        grid = self._to_flow @ ratios @ self._to_outside.T
+        np.multiply(self._datasheet.grid, grid, out=self.powermap.grid)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the estimate as JSON serializable dict."""
+        return {
+            "outside_nodes": self._outside_nodes.tolist(),
+            "flow_nodes": self._flow_nodes.tolist(),
+            "counts": self.counts.tolist(),
+            "means": self.means.tolist(),
+            "normal": self.normal.tolist(),
+            "moments": self.moments.tolist(),
+            "observations": self.observations,
+        }
+
+    def load(self, data: dict[str, Any]) -> bool:
+        """Continue with an estimate stored with as_dict.
+
+        Returns:
+            False when the estimate doesn't fit the temperatures of the map
+
+        """
+        try:
+            if not (
+                np.array_equal(data["outside_nodes"], self._outside_nodes)
+                and np.array_equal(data["flow_nodes"], self._flow_nodes)
+            ):
+                return False
+            counts = np.array(data["counts"], dtype=float)
+            means = np.array(data["means"], dtype=float)
+            normal = np.array(data["normal"], dtype=float)
+            moments = np.array(data["moments"], dtype=float)
+            observations = int(data["observations"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if (
+            counts.shape != self.counts.shape
+            or means.shape != self.means.shape
+            or normal.shape != self.normal.shape
+            or moments.shape != self.moments.shape
+        ):
+            return False
+        self.counts, self.means = counts, means
+        self.normal, self.moments = normal, moments
+        self.observations = observations
+        self.refine()
+        return True
+
+
+def _nodes(first: float, last: float) -> np.ndarray:
+    """Return the nodes between two temperatures, NODE_SPACING apart or less."""
+    return np.linspace(first, last, max(round((last - first) / NODE_SPACING), 1) + 1)
+
+
+def _nearest(nodes: np.ndarray, value: float) -> int:
+    """Return the index of the node nearest to a value."""
+    return int(np.abs(nodes - value).argmin())
+
+
+def _store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Return the store of the learned power map of a config entry."""
+    return Store(hass, LEARNING_STORAGE_VERSION, f"{CONST.DOMAIN}.learning.{entry_id}")
+
+
+async def async_setup_learner(
+    hass: HomeAssistant, entry_id: str, datasheet: PowerMap
+) -> PowerLearner:
+    """Return the learner of a config entry, with its stored estimate."""
+    store = _store(hass, entry_id)
+    learner = PowerLearner(datasheet, store)
+    data = await store.async_load()
+    if data is not None and not learner.load(data):
+        _LOGGER.warning("Ignoring learned power map that doesn't fit the kennfeld")
+    return learner
+
+
+async def async_remove_learning(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the learned power map of a config entry."""
+    await _store(hass, entry_id).async_remove()
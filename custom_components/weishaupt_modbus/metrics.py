@@ -0,0 +1,352 @@
+"""Metrics.
+
+Latency and error statistics of the modbus communication. All structures have a
+fixed size, so they can run for the lifetime of the integration.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+import time
+from typing import Any
+
+from pymodbus import ModbusException
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+
+# upper bounds of the latency buckets in seconds, the last bucket is open ended
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+# number of recent samples kept for percentiles and per cycle values
+METRICS_WINDOW = 256
+# per register statistics are kept for at most this many addresses
+MAX_TRACKED_REGISTERS = 1024
+# modbus exception codes are one byte
+MAX_EXCEPTION_CODE = 255
+# number of connection events kept
+CONNECTION_HISTORY = 32
+
+
+class LatencyHistogram:
+    """Histogram of latencies with fixed buckets and a window of recent samples."""
+
+    __slots__ = ("_recent", "buckets", "count", "max", "total")
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        """Construct an empty histogram.
+
+        Args:
+            window: number of recent samples kept for percentiles
+
+        """
+        self.buckets: list[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """Add a sample."""
+        idx = 0
+        for bound in LATENCY_BUCKETS:
+            if seconds <= bound:
+                break
+            idx += 1
+        self.buckets[idx] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def percentile(self, quantile: float) -> float | None:
+        """Return a percentile of the recent samples.
+
+        Args:
+            quantile: between 0 and 1, e.g. 0.95
+
+        Returns:
+            Latency in seconds or None without samples
+
+        """
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean of all samples."""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram as plain data."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": dict(
+                zip(
+                    [*(str(bound) for bound in LATENCY_BUCKETS), "inf"],
+                    self.buckets,
+                    strict=True,
+                )
+            ),
+        }
+
+
+class RegisterStats:
+    """Statistics of the requests starting at one register address."""
+
+    __slots__ = ("errors", "last", "max", "requests", "total")
+
+    def __init__(self) -> None:
+        """Construct empty statistics."""
+        self.requests: int = 0
+        self.errors: int = 0
+        self.total: float = 0.0
+        self.last: float = 0.0
+        self.max: float = 0.0
+
+    def record(self, seconds: float, error: bool) -> None:
+        """Add one request."""
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as plain data."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean": self.total / self.requests if self.requests else None,
+            "last": self.last,
+            "max": self.max,
+        }
+
+
+class ModbusMetrics:
+    """Metrics of all requests sent by a ModbusAPI."""
+
+    def __init__(self) -> None:
+        """Construct empty metrics."""
+        self.request_latency = LatencyHistogram()
+        self.registers: dict[int, RegisterStats] = {}
+        self.requests: int = 0
+        self.errors: int = 0
+        self.timeouts: int = 0
+        self.connection_errors: int = 0
+        self.retries: int = 0
+        self.exception_codes: dict[int, int] = {}
+        self.connects: int = 0
+        self.failed_connects: int = 0
+        self.last_success: float | None = None
+        self.raw_registers: dict[int, int] = {}
+        self.connection_history: deque[dict[str, Any]] = deque(
+            maxlen=CONNECTION_HISTORY
+        )
+
+    def _register(self, address: int) -> RegisterStats | None:
+        """Return the statistics of an address, None when too many are tracked."""
+        stats = self.registers.get(address)
+        if stats is None and len(self.registers) < MAX_TRACKED_REGISTERS:
+            stats = self.registers[address] = RegisterStats()
+        return stats
+
+    def record_response(self, address: int, seconds: float, response: Any) -> None:
+        """Record a request that got an answer, which may be a modbus exception.
+
+        Args:
+            address: first register of the request
+            seconds: time until the answer arrived
+            response: the modbus response
+
+        """
+        self.requests += 1
+        self.request_latency.record(seconds)
+        retries = getattr(response, "retries", 0)
+        if isinstance(retries, int):
+            self.retries += retries
+        error = response.isError()
+        if error:
+            self.errors += 1
+            code = getattr(response, "exception_code", 0)
+            if isinstance(code, int) and 0 <= code <= MAX_EXCEPTION_CODE:
+                self.exception_codes[code] = self.exception_codes.get(code, 0) + 1
+        else:
+            self.last_success = time.time()
+            registers = response.registers
+            if address in self.raw_registers or (
+                len(self.raw_registers) < MAX_TRACKED_REGISTERS
+            ):
+                self.raw_registers.update(
+                    zip(
+                        range(address, address + len(registers)),
+                        registers,
+                        strict=True,
+                    )
+                )
+        if (stats := self._register(address)) is not None:
+            stats.record(seconds, error)
+
+    def record_exception(
+        self, address: int, seconds: float, exc: ModbusException
+    ) -> None:
+        """Record a request that failed without an answer.
+
+        Args:
+            address: first register of the request
+            seconds: time until the request failed
+            exc: the exception raised by the client
+
+        """
+        self.requests += 1
+        self.errors += 1
+        self.request_latency.record(seconds)
+        if isinstance(exc, ConnectionException):
+            self.connection_errors += 1
+        elif isinstance(exc, ModbusIOException):
+            # pymodbus reports a missing answer after all retries as io exception
+            self.timeouts += 1
+        if (stats := self._register(address)) is not None:
+            stats.record(seconds, True)
+
+    def record_connect(self, success: bool, failures: int = 0) -> None:
+        """Record a connection attempt.
+
+        Args:
+            success: True when the connection is up
+            failures: failed attempts in a row, including this one
+
+        """
+        self.connects += 1
+        if not success:
+            self.failed_connects += 1
+        self.connection_history.append(
+            {
+                "time": time.time(),
+                "event": "connected" if success else "failed",
+                "failures": failures,
+            }
+        )
+
+    def record_backoff(self, event: str, backoff: float, failures: int) -> None:
+        """Record the start or the end of a backoff period.
+
+        Args:
+            event: "backoff_start" or "backoff_expired"
+            backoff: length of the backoff period in seconds
+            failures: failed attempts in a row
+
+        """
+        self.connection_history.append(
+            {
+                "time": time.time(),
+                "event": event,
+                "backoff": backoff,
+                "failures": failures,
+            }
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics as plain data."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "connection_errors": self.connection_errors,
+            "retries": self.retries,
+            "exception_codes": dict(self.exception_codes),
+            "connects": self.connects,
+            "failed_connects": self.failed_connects,
+            "last_success": self.last_success,
+            "connection_history": list(self.connection_history),
+            "request_latency": self.request_latency.as_dict(),
+            "registers": {
+                address: stats.as_dict()
+                for address, stats in sorted(self.registers.items())
+            },
+        }
+
+
+class CycleMetrics:
+    """Metrics of the update cycles of a coordinator."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        """Construct empty metrics.
+
+        Args:
+            window: number of recent cycles kept
+
+        """
+        self.block_latency = LatencyHistogram(window)
+        self.cycle_duration: deque[float] = deque(maxlen=window)
+        self.items_refreshed: deque[int] = deque(maxlen=window)
+        self.requests_per_cycle: deque[int] = deque(maxlen=window)
+        self.cycles: int = 0
+        self.blocks: int = 0
+        self.failed_blocks: int = 0
+        self.failed_blocks_last_cycle: int = 0
+        self._failed_blocks_at_start: int = 0
+        self._requests_at_start: int = 0
+        self._start: float | None = None
+
+    def start_cycle(self, requests: int) -> None:
+        """Mark the start of a cycle.
+
+        Args:
+            requests: request counter of the modbus metrics at the start
+
+        """
+        self._start = time.perf_counter()
+        self._requests_at_start = requests
+        self._failed_blocks_at_start = self.failed_blocks
+
+    def end_cycle(self, requests: int, items_refreshed: int) -> None:
+        """Mark the end of a cycle.
+
+        Args:
+            requests: request counter of the modbus metrics at the end
+            items_refreshed: number of items that got a value
+
+        """
+        if self._start is None:
+            return
+        self.cycles += 1
+        self.cycle_duration.append(time.perf_counter() - self._start)
+        self.requests_per_cycle.append(requests - self._requests_at_start)
+        self.items_refreshed.append(items_refreshed)
+        self.failed_blocks_last_cycle = (
+            self.failed_blocks - self._failed_blocks_at_start
+        )
+        self._start = None
+
+    def record_block(self, seconds: float, failed: bool) -> None:
+        """Record the read of a block."""
+        self.blocks += 1
+        self.block_latency.record(seconds)
+        if failed:
+            self.failed_blocks += 1
+
+    @property
+    def last_cycle_duration(self) -> float | None:
+        """Return the duration of the last cycle in seconds."""
+        return self.cycle_duration[-1] if self.cycle_duration else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics as plain data."""
+        return {
+            "cycles": self.cycles,
+            "last_cycle_duration": self.last_cycle_duration,
+            "cycle_duration": list(self.cycle_duration),
+            "items_refreshed": list(self.items_refreshed),
+            "requests_per_cycle": list(self.requests_per_cycle),
+            "blocks": self.blocks,
+            "failed_blocks": self.failed_blocks,
+            "failed_blocks_last_cycle": self.failed_blocks_last_cycle,
+            "block_latency": self.block_latency.as_dict(),
+        }
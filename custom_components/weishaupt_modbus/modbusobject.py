@@ -8,14 +8,20 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from pathlib import Path
+import time
 from typing import Any
 
 from pymodbus import ExceptionResponse, ModbusException
 from pymodbus.client import AsyncModbusTcpClient
 
+from homeassistant.core import HomeAssistant
+
 from .configentry import MyConfigEntry
-from .const import CONF, FORMATS, TYPES
+from .const import BACKOFFSTATES, CONF, FORMATS, REGISTERS, TYPES
 from .items import ModbusItem
+from .metrics import ModbusMetrics
+from .recorder import FC_READ_HOLDING, FC_READ_INPUT, FC_WRITE_REGISTER, TrafficRecorder
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,21 +34,49 @@ BACKOFF_THRESHOLD_FAILURES = 3
 class ModbusAPI:
     """ModbusAPI class provides a connection to the modbus, which is used by the ModbusItems."""
 
-    def __init__(self, config_entry: MyConfigEntry) -> None:
+    def __init__(
+        self, config_entry: MyConfigEntry, client: AsyncModbusTcpClient | None = None
+    ) -> None:
         """Construct ModbusAPI.
 
         Args:
             config_entry: HASS config entry
+            client: client to use instead of a TCP connection, e.g. for replays
+
+        """
+        self._init_connection(
+            config_entry.data[CONF.HOST], config_entry.data[CONF.PORT], client
+        )
+
+    @classmethod
+    def from_host(cls, host: str, port: int) -> ModbusAPI:
+        """Construct a ModbusAPI for a heat pump without config entry.
+
+        Used by the config flow, before the entry exists.
+
+        Args:
+            host: host name or IP address of the heat pump
+            port: modbus TCP port
 
         """
-        self._ip: str = config_entry.data[CONF.HOST]
-        self._port: int = config_entry.data[CONF.PORT]
+        modbus_api = cls.__new__(cls)
+        modbus_api._init_connection(host, port, None)  # noqa: SLF001
+        return modbus_api
+
+    def _init_connection(
+        self, host: str, port: int, client: AsyncModbusTcpClient | None
+    ) -> None:
+        """Set up the connection state of a new ModbusAPI."""
+        self._ip: str = host
+        self._port: int = port
         self._connect_pending: bool = False
         self._failed_reconnect_counter: int = 0
         self._last_connection_try: Any = None
-        self._modbus_client: AsyncModbusTcpClient = AsyncModbusTcpClient(
+        self._modbus_client: AsyncModbusTcpClient = client or AsyncModbusTcpClient(
             host=self._ip, port=self._port, name="Weishaupt_WBB", retries=1
         )
+        self._metrics = ModbusMetrics()
+        self._recorder: TrafficRecorder | None = None
 
     def _log_backoff_start(self) -> None:
         """Log when exponential backoff starts."""
@@ -52,6 +86,9 @@ class ModbusAPI:
             self._failed_reconnect_counter,
             BACKOFF_BASE_SECONDS,
         )
+        self._metrics.record_backoff(
+            "backoff_start", BACKOFF_BASE_SECONDS, self._failed_reconnect_counter
+        )
 
     async def connect(self, startup: bool = False) -> bool:
         """Open modbus connection."""
@@ -98,6 +135,9 @@ class ModbusAPI:
                     backoff,
                     self._failed_reconnect_counter,
                 )
+                self._metrics.record_backoff(
+                    "backoff_expired", backoff, self._failed_reconnect_counter
+                )
 
             # Record this attempt time
             self._last_connection_try = now
@@ -105,6 +145,12 @@ class ModbusAPI:
             # ----- Actual connect attempt -----
             await self._modbus_client.connect()
 
+            self._metrics.record_connect(
+                self._modbus_client.connected,
+                0
+                if self._modbus_client.connected
+                else self._failed_reconnect_counter + 1,
+            )
             if self._modbus_client.connected:
                 # SUCCESS
                 if self._failed_reconnect_counter > 0:
@@ -133,6 +179,7 @@ class ModbusAPI:
                 "Connection to heatpump failed (modbus): %s",
                 str(exc),
             )
+            self._metrics.record_connect(False, self._failed_reconnect_counter + 1)
             self._failed_reconnect_counter += 1
             if (
                 self._failed_reconnect_counter == BACKOFF_THRESHOLD_FAILURES
@@ -148,6 +195,7 @@ class ModbusAPI:
                 "Connection to heatpump failed (network): %s",
                 str(exc),
             )
+            self._metrics.record_connect(False, self._failed_reconnect_counter + 1)
             self._failed_reconnect_counter += 1
             if (
                 self._failed_reconnect_counter == BACKOFF_THRESHOLD_FAILURES
@@ -166,6 +214,7 @@ class ModbusAPI:
                 "Connection to heatpump failed (unexpected): %s",
                 str(exc),
             )
+            self._metrics.record_connect(False, self._failed_reconnect_counter + 1)
             self._failed_reconnect_counter += 1
             if (
                 self._failed_reconnect_counter == BACKOFF_THRESHOLD_FAILURES
@@ -194,6 +243,180 @@ class ModbusAPI:
         """Return modbus connection."""
         return self._modbus_client
 
+    @property
+    def metrics(self) -> ModbusMetrics:
+        """Return the request metrics."""
+        return self._metrics
+
+    @property
+    def timeout(self) -> float | None:
+        """Return the request timeout in seconds, None for a client without one."""
+        comm_params = getattr(self._modbus_client, "comm_params", None)
+        return None if comm_params is None else comm_params.timeout_connect
+
+    @timeout.setter
+    def timeout(self, val: float) -> None:
+        """Set the request timeout in seconds."""
+        comm_params = getattr(self._modbus_client, "comm_params", None)
+        if comm_params is not None:
+            comm_params.timeout_connect = val
+
+    @property
+    def recorder(self) -> TrafficRecorder | None:
+        """Return the traffic recorder, None when not recording."""
+        return self._recorder
+
+    def start_recording(self, hass: HomeAssistant, path: Path) -> TrafficRecorder:
+        """Start recording the raw modbus traffic.
+
+        Args:
+            hass: runs the writer of the recording
+            path: JSONL file the traffic is appended to
+
+        Returns:
+            The recorder, an already running one is kept
+
+        """
+        if self._recorder is None or not self._recorder.running:
+            self._recorder = TrafficRecorder(
+                hass, path, header={"host": self._ip, "port": self._port}
+            )
+            self._recorder.start()
+            _LOGGER.info("Recording modbus traffic to %s", path)
+        return self._recorder
+
+    async def stop_recording(self) -> TrafficRecorder | None:
+        """Stop recording and wait until all records are written.
+
+        Returns:
+            The stopped recorder, None when not recording
+
+        """
+        recorder, self._recorder = self._recorder, None
+        if recorder is not None:
+            # a failed writer is reported by the recorder, it never raises here
+            await recorder.stop()
+            if recorder.error is None:
+                _LOGGER.info(
+                    "Recorded %s modbus requests to %s", recorder.records, recorder.path
+                )
+        return recorder
+
+    @property
+    def backoff_state(self) -> str:
+        """Return whether the connection is up, being retried or in backoff."""
+        if self._failed_reconnect_counter >= BACKOFF_THRESHOLD_FAILURES:
+            return BACKOFFSTATES.BACKOFF
+        if self._failed_reconnect_counter > 0 or not self._modbus_client.connected:
+            return BACKOFFSTATES.RECONNECTING
+        return BACKOFFSTATES.CONNECTED
+
+    async def read_registers(
+        self, register_type: str, address: int, count: int = 1
+    ) -> Any:
+        """Read a block of registers.
+
+        Args:
+            register_type: REGISTERS.INPUT or REGISTERS.HOLDING
+            address: first register address
+            count: number of registers
+
+        Returns:
+            The modbus response
+
+        Raises:
+            ModbusException: when the request failed without an answer
+
+        """
+        start = time.perf_counter()
+        try:
+            if register_type == REGISTERS.HOLDING:
+                function_code = FC_READ_HOLDING
+                mbr = await self._modbus_client.read_holding_registers(
+                    address, count=count, device_id=1
+                )
+            else:
+                function_code = FC_READ_INPUT
+                mbr = await self._modbus_client.read_input_registers(
+                    address, count=count, device_id=1
+                )
+        except ModbusException as exc:
+            latency = time.perf_counter() - start
+            self._metrics.record_exception(address, latency, exc)
+            if self._recorder is not None:
+                self._recorder.record(
+                    function_code,
+                    address,
+                    count,
+                    registers=None,
+                    exception=type(exc).__name__,
+                    latency=latency,
+                )
+            raise
+        latency = time.perf_counter() - start
+        self._metrics.record_response(address, latency, mbr)
+        if self._recorder is not None:
+            self._record_response(function_code, address, count, latency, mbr)
+        return mbr
+
+    async def write_register(self, address: int, value: int) -> Any:
+        """Write a single holding register.
+
+        Args:
+            address: register address
+            value: raw register value
+
+        Returns:
+            The modbus response
+
+        Raises:
+            ModbusException: when the request failed without an answer
+
+        """
+        start = time.perf_counter()
+        try:
+            mbr = await self._modbus_client.write_register(address, value, device_id=1)
+        except ModbusException as exc:
+            if self._recorder is not None:
+                self._recorder.record(
+                    FC_WRITE_REGISTER,
+                    address,
+                    1,
+                    registers=None,
+                    exception=type(exc).__name__,
+                    latency=time.perf_counter() - start,
+                )
+            raise
+        if self._recorder is not None:
+            self._record_response(
+                FC_WRITE_REGISTER, address, 1, time.perf_counter() - start, mbr
+            )
+        return mbr
+
+    def _record_response(
+        self, function_code: int, address: int, count: int, latency: float, mbr: Any
+    ) -> None:
+        """Pass a request that got an answer to the recorder."""
+        if mbr.isError():
+            code = getattr(mbr, "exception_code", None)
+            self._recorder.record(  # type: ignore[union-attr]
+                function_code,
+                address,
+                count,
+                registers=None,
+                exception=code,
+                latency=latency,
+            )
+        else:
+            self._recorder.record(  # type: ignore[union-attr]
+                function_code,
+                address,
+                count,
+                registers=list(mbr.registers),
+                exception=None,
+                latency=latency,
+            )
+
 
 class ModbusObject:
     """ModbusObject.
@@ -217,6 +440,7 @@ class ModbusObject:
 
         """
         self._modbus_item: ModbusItem = modbus_item
+        self._modbus_api: ModbusAPI = modbus_api
         self._modbus_client: AsyncModbusTcpClient = modbus_api.get_device()
         self._no_connect_warn: bool = no_connect_warn
 
@@ -362,13 +586,13 @@ class ModbusObject:
                 match self._modbus_item.type:
                     case TYPES.SENSOR | TYPES.SENSOR_CALC:
                         # Sensor entities are read-only
-                        mbr = await self._modbus_client.read_input_registers(
-                            self._modbus_item.address, device_id=1
+                        mbr = await self._modbus_api.read_registers(
+                            REGISTERS.INPUT, self._modbus_item.address
                         )
                         return self.validate_modbus_answer(mbr)
                     case TYPES.SELECT | TYPES.NUMBER | TYPES.NUMBER_RO:
-                        mbr = await self._modbus_client.read_holding_registers(
-                            self._modbus_item.address, device_id=1
+                        mbr = await self._modbus_api.read_registers(
+                            REGISTERS.HOLDING, self._modbus_item.address
                         )
                         return self.validate_modbus_answer(mbr)
                     case _:
@@ -403,10 +627,9 @@ class ModbusObject:
                     # Sensor entities are read-only
                     return
                 case _:
-                    await self._modbus_client.write_register(
+                    await self._modbus_api.write_register(
                         self._modbus_item.address,
                         self.check_valid_response(value),
-                        device_id=1,
                     )
         except ModbusException:
             _LOGGER.warning(
@@ -0,0 +1,174 @@
+"""Profiling of coordinator cycles.
+
+Used by the profile_cycles service. It runs a number of coordinator refreshes,
+including the entity update callbacks, under a profiler and writes the result to
+the config directory. Nothing is hooked into the coordinator, so there is no
+overhead while no profile is taken.
+"""
+
+from __future__ import annotations
+
+import cProfile
+from datetime import datetime
+import json
+import logging
+from pathlib import Path
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from .const import CONST, PROFILERS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread in fixed intervals.
+
+    The samples are stored in the speedscope file format, see
+    https://www.speedscope.app/file-format-schema.json
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """Construct the profiler.
+
+        Args:
+            interval: time between two samples in seconds
+
+        """
+        self._interval = interval
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._frames: dict[tuple[str, str, int], int] = {}
+        self._samples: list[list[int]] = []
+        self._weights: list[float] = []
+        self._duration: float = 0.0
+
+    def _frame_index(self, frame: FrameType) -> int:
+        """Return the index of a frame in the shared frame list."""
+        code = frame.f_code
+        key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+        idx = self._frames.get(key)
+        if idx is None:
+            idx = self._frames[key] = len(self._frames)
+        return idx
+
+    def _sample(self, target: int) -> None:
+        """Take samples of the thread target until stopped, runs in its own thread."""
+        last = time.perf_counter()
+        start = last
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(target)  # noqa: SLF001
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_index(frame))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self._samples.append(stack)
+                self._weights.append(now - last)
+            last = now
+        self._duration = time.perf_counter() - start
+
+    def enable(self) -> None:
+        """Start sampling the calling thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(),),
+            name="weishaupt-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def disable(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def as_speedscope(self, name: str) -> dict[str, Any]:
+        """Return the samples as speedscope document."""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "exporter": CONST.DOMAIN,
+            "name": name,
+            "shared": {
+                "frames": [
+                    {"name": qualname, "file": filename, "line": line}
+                    for qualname, filename, line in self._frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self._duration,
+                    "samples": self._samples,
+                    "weights": self._weights,
+                }
+            ],
+        }
+
+
+def write_profile(profiler: cProfile.Profile | SamplingProfiler, path: Path) -> None:
+    """Write a profile to a file, runs in the executor."""
+    if isinstance(profiler, SamplingProfiler):
+        path.write_text(json.dumps(profiler.as_speedscope(path.stem)), encoding="utf-8")
+    else:
+        profiler.dump_stats(path)
+
+
+async def async_profile_cycles(
+    hass: HomeAssistant,
+    coordinators: list[Any],
+    cycles: int,
+    profiler_type: str = PROFILERS.CPROFILE,
+    interval: float = 0.005,
+) -> Path:
+    """Run coordinator cycles under a profiler and write the profile.
+
+    Everything that runs in the event loop while profiling is recorded, the
+    cycles are run back to back to keep that window short.
+
+    Args:
+        hass: Home Assistant instance
+        coordinators: the coordinators to refresh
+        cycles: number of refreshes per coordinator
+        profiler_type: PROFILERS.CPROFILE or PROFILERS.SAMPLING
+        interval: sampling interval in seconds
+
+    Returns:
+        Path of the written profile
+
+    """
+    profiler: cProfile.Profile | SamplingProfiler
+    if profiler_type == PROFILERS.SAMPLING:
+        profiler = SamplingProfiler(interval)
+        suffix = ".speedscope.json"
+    else:
+        profiler = cProfile.Profile()
+        suffix = ".pstats"
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = Path(hass.config.config_dir) / f"{CONST.DOMAIN}_profile_{timestamp}{suffix}"
+
+    profiler.enable()
+    try:
+        for _ in range(cycles):
+            for coordinator in coordinators:
+                await coordinator.async_refresh()
+    finally:
+        profiler.disable()
+
+    await hass.async_add_executor_job(write_profile, profiler, path)
+    _LOGGER.info("Profile of %s cycles written to %s", cycles, path)
+    return path
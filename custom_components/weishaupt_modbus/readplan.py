@@ -0,0 +1,80 @@
+"""Read plan.
+
+Groups the modbus items of an update cycle into blocks of contiguous registers,
+so that one request can fetch several items at once.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from .const import REGISTERS, TYPES
+from .items import ModbusItem
+
+
+@dataclass
+class ReadBlock:
+    """Contiguous registers of one register type that are read with one request."""
+
+    register_type: str
+    address: int
+    count: int = 0
+    items: list[ModbusItem] = field(default_factory=list)
+
+    @property
+    def end(self) -> int:
+        """Return the first address after the block."""
+        return self.address + self.count
+
+
+def register_type(modbus_item: ModbusItem) -> str | None:
+    """Return the register type an item is read from, same mapping as ModbusObject."""
+    match modbus_item.type:
+        case TYPES.SENSOR | TYPES.SENSOR_CALC:
+            return REGISTERS.INPUT
+        case TYPES.SELECT | TYPES.NUMBER | TYPES.NUMBER_RO:
+            return REGISTERS.HOLDING
+        case _:
+            return None
+
+
+def build_read_plan(
+    modbus_items: list[ModbusItem], max_block_size: int
+) -> list[ReadBlock]:
+    """Build the blocks to read a list of items.
+
+    Items that share an address (e.g. a sensor and a calculated sensor based on it)
+    end up in the same block, the register is only read once.
+
+    Args:
+        modbus_items: items to read
+        max_block_size: maximum number of registers per request
+
+    Returns:
+        List of blocks ordered by register type and address
+
+    """
+    keyed = sorted(
+        (
+            (reg_type, item.address, index, item)
+            for index, item in enumerate(modbus_items)
+            if (reg_type := register_type(item)) is not None
+        ),
+        key=lambda entry: entry[:3],
+    )
+
+    blocks: list[ReadBlock] = []
+    block: ReadBlock | None = None
+    for reg_type, address, _index, item in keyed:
+        if block is not None and block.register_type == reg_type:
+            if address < block.end:
+                block.items.append(item)
+                continue
+            if address == block.end and block.count < max_block_size:
+                block.count += 1
+                block.items.append(item)
+                continue
+        block = ReadBlock(register_type=reg_type, address=address, count=1)
+        block.items.append(item)
+        blocks.append(block)
+    return blocks
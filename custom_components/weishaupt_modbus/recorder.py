@@ -0,0 +1,181 @@
+"""Recorder of the raw modbus traffic.
+
+Every request of a ModbusAPI and its answer can be appended to a JSONL file. The
+first line is a header, every following line one request:
+
+    {"t": 1700000000.123, "fc": 4, "addr": 30001, "count": 4,
+     "regs": [1, 2, 3, 4], "exc": null, "lat": 0.0042}
+
+"exc" is the modbus exception code of an error response or the name of the
+exception raised by the client when no answer arrived. Records are handed to a
+writer task through a bounded queue, when the queue is full the record is
+dropped and counted, so recording never blocks polling.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+import time
+from typing import IO, Any
+
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+RECORDER_FORMAT = "weishaupt_modbus_traffic"
+RECORDER_VERSION = 1
+# number of records that can wait for the writer
+RECORDER_QUEUE_SIZE = 4096
+# maximum number of records written with one executor job
+RECORDER_BATCH_SIZE = 256
+
+# modbus function codes
+FC_READ_HOLDING = 3
+FC_READ_INPUT = 4
+FC_WRITE_REGISTER = 6
+
+
+def _open(path: Path) -> IO[str]:
+    """Open the recording for appending, runs in the executor."""
+    return path.open("a", encoding="utf-8")
+
+
+def _write(file: IO[str], lines: str) -> None:
+    """Append lines to the recording, runs in the executor."""
+    file.write(lines)
+    file.flush()
+
+
+class TrafficRecorder:
+    """Append modbus requests and answers to a JSONL file."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: Path,
+        header: dict[str, Any] | None = None,
+        queue_size: int = RECORDER_QUEUE_SIZE,
+    ) -> None:
+        """Construct the recorder.
+
+        Args:
+            hass: runs the writer task and its file jobs
+            path: file the records are appended to
+            header: additional fields of the header line
+            queue_size: number of records that can wait for the writer
+
+        """
+        self._hass = hass
+        self.path = path
+        self.records: int = 0
+        self.dropped: int = 0
+        # why the recording failed, None while it is written
+        self.error: str | None = None
+        self._header: dict[str, Any] = {
+            "format": RECORDER_FORMAT,
+            "version": RECORDER_VERSION,
+            "start": time.time(),
+            **(header or {}),
+        }
+        self._queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(
+            maxsize=queue_size
+        )
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return True while the writer task is running."""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the writer task."""
+        self._task = self._hass.async_create_task(
+            self._writer(), name=f"weishaupt_modbus recorder {self.path.name}"
+        )
+
+    async def stop(self) -> None:
+        """Write the pending records and stop the writer task."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+        try:
+            await self._task
+        except OSError as exc:
+            self.error = str(exc)
+            _LOGGER.warning("Closing traffic recording %s failed: %s", self.path, exc)
+
+    def record(
+        self,
+        function_code: int,
+        address: int,
+        count: int,
+        *,
+        registers: list[int] | None,
+        exception: int | str | None,
+        latency: float,
+    ) -> None:
+        """Queue one request, never blocks.
+
+        Args:
+            function_code: modbus function code of the request
+            address: first register of the request
+            count: number of registers
+            registers: registers read or written, None on errors
+            exception: modbus exception code or name of the raised exception
+            latency: time until the answer arrived or the request failed
+
+        """
+        try:
+            self._queue.put_nowait(
+                {
+                    "t": round(time.time(), 6),
+                    "fc": function_code,
+                    "addr": address,
+                    "count": count,
+                    "regs": registers,
+                    "exc": exception,
+                    "lat": round(latency, 6),
+                }
+            )
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _writer(self) -> None:
+        """Write queued records in batches until stopped."""
+        hass = self._hass
+        file: IO[str] | None = None
+        try:
+            file = await hass.async_add_executor_job(_open, self.path)
+            await hass.async_add_executor_job(
+                _write, file, json.dumps(self._header) + "\n"
+            )
+            stopped = False
+            while not stopped:
+                batch: list[dict[str, Any]] = []
+                record = await self._queue.get()
+                while record is not None:
+                    batch.append(record)
+                    if len(batch) == RECORDER_BATCH_SIZE or self._queue.empty():
+                        break
+                    record = self._queue.get_nowait()
+                stopped = record is None
+                if batch:
+                    lines = "".join(
+                        json.dumps(item, separators=(",", ":")) + "\n" for item in batch
+                    )
+                    await hass.async_add_executor_job(_write, file, lines)
+                    self.records += len(batch)
+        except OSError as exc:
+            self.error = str(exc)
+            _LOGGER.warning("Writing traffic recording %s failed: %s", self.path, exc)
+        finally:
+            if file is not None:
+                await hass.async_add_executor_job(file.close)
+            if self.dropped:
+                _LOGGER.warning(
+                    "Traffic recording %s dropped %s records", self.path, self.dropped
+                )
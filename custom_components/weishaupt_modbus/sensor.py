@@ -3,21 +3,108 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any
 
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.const import UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .configentry import MyConfigEntry
-from .const import CONF, TYPES
-from .coordinator import MyWebIfCoordinator
-from .entities import MyWebifSensorEntity
+from .const import BACKOFFSTATES, CONF, READSTRATEGIES, TYPES
+from .coordinator import MyCoordinator, MyWebIfCoordinator
+from .entities import (
+    MyDiagnosticSensorEntity,
+    MyDiagnosticSensorEntityDescription,
+    MyWebifSensorEntity,
+)
 from .entity_helpers import build_entity_list
 from .hpconst import WEBIF_INFO_HEIZKREIS1
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def request_latency_p95(coordinator: MyCoordinator) -> float | None:
+    """Return the 95th percentile of the recent request latencies in ms."""
+    p95 = coordinator.modbus_api.metrics.request_latency.percentile(0.95)
+    return None if p95 is None else p95 * 1000
+
+
+def last_success_age(coordinator: MyCoordinator) -> float | None:
+    """Return the seconds since the last successful read."""
+    last_success = coordinator.modbus_api.metrics.last_success
+    return None if last_success is None else time.time() - last_success
+
+
+def failed_blocks(coordinator: MyCoordinator) -> int | None:
+    """Return the blocks of the last cycle that fell back to single reads.
+
+    None when the items are read one by one, there are no blocks then.
+    """
+    if coordinator.read_strategy == READSTRATEGIES.SEQUENTIAL:
+        return None
+    return coordinator.metrics.failed_blocks_last_cycle
+
+
+DIAGNOSTIC_SENSORS: tuple[MyDiagnosticSensorEntityDescription, ...] = (
+    MyDiagnosticSensorEntityDescription(
+        key="diag_cycle_duration",
+        translation_key="diag_cycle_duration",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.metrics.last_cycle_duration,
+    ),
+    MyDiagnosticSensorEntityDescription(
+        key="diag_request_latency_p95",
+        translation_key="diag_request_latency_p95",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        suggested_display_precision=1,
+        value_fn=request_latency_p95,
+    ),
+    MyDiagnosticSensorEntityDescription(
+        key="diag_requests_per_cycle",
+        translation_key="diag_requests_per_cycle",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: (
+            coordinator.metrics.requests_per_cycle[-1]
+            if coordinator.metrics.requests_per_cycle
+            else None
+        ),
+    ),
+    MyDiagnosticSensorEntityDescription(
+        key="diag_failed_blocks",
+        translation_key="diag_failed_blocks",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=failed_blocks,
+    ),
+    MyDiagnosticSensorEntityDescription(
+        key="diag_last_success_age",
+        translation_key="diag_last_success_age",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=0,
+        value_fn=last_success_age,
+    ),
+    MyDiagnosticSensorEntityDescription(
+        key="diag_backoff_state",
+        translation_key="diag_backoff_state",
+        device_class=SensorDeviceClass.ENUM,
+        options=[
+            BACKOFFSTATES.CONNECTED,
+            BACKOFFSTATES.RECONNECTING,
+            BACKOFFSTATES.BACKOFF,
+        ],
+        value_fn=lambda coordinator: coordinator.modbus_api.backoff_state,
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: MyConfigEntry,
@@ -45,6 +132,13 @@ async def async_setup_entry(
         item_type=TYPES.SENSOR_CALC,
         coordinator=coordinator,
     )
+    entries = await build_entity_list(
+        entries=entries,
+        config_entry=config_entry,
+        api_items=coordinator.modbus_items,
+        item_type=TYPES.SENSOR_USER,
+        coordinator=coordinator,
+    )
 
     # Webif Sensors here
     entries = await build_entity_list(
@@ -55,6 +149,12 @@ async def async_setup_entry(
         coordinator=coordinator,
     )
 
+    # diagnostic sensors of the poll performance, disabled by default
+    entries.extend(
+        MyDiagnosticSensorEntity(config_entry, coordinator, description)
+        for description in DIAGNOSTIC_SENSORS
+    )
+
     webifentries = []
 
     if config_entry.data[CONF.CB_WEBIF]:
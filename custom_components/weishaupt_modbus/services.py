@@ -0,0 +1,154 @@
+"""Services of the integration."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .configentry import MyConfigEntry
+from .const import CONF, CONST, PROFILERS
+from .profiling import async_profile_cycles
+from .tuning import async_save_tuning
+
+SERVICE_PROFILE_CYCLES = "profile_cycles"
+SERVICE_START_RECORDING = "start_recording"
+SERVICE_STOP_RECORDING = "stop_recording"
+SERVICE_TUNE = "tune"
+ATTR_CYCLES = "cycles"
+ATTR_PROFILER = "profiler"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_INTERVAL = "interval"
+
+PROFILE_CYCLES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CYCLES, default=3): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=100)
+        ),
+        vol.Optional(ATTR_PROFILER, default=PROFILERS.CPROFILE): vol.In(
+            [PROFILERS.CPROFILE, PROFILERS.SAMPLING]
+        ),
+        vol.Optional(ATTR_INTERVAL, default=0.005): vol.All(
+            vol.Coerce(float), vol.Range(min=0.001, max=1.0)
+        ),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+RECORDING_SCHEMA = vol.Schema({vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string})
+TUNE_SCHEMA = RECORDING_SCHEMA
+
+
+def loaded_entries(hass: HomeAssistant, call: ServiceCall) -> list[MyConfigEntry]:
+    """Return the loaded entries a service call applies to.
+
+    Raises:
+        ServiceValidationError: when no matching entry is loaded
+
+    """
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    entries = [
+        entry
+        for entry in hass.config_entries.async_loaded_entries(CONST.DOMAIN)
+        if entry_id is None or entry.entry_id == entry_id
+    ]
+    if not entries:
+        raise ServiceValidationError(
+            translation_domain=CONST.DOMAIN,
+            translation_key="no_loaded_entry",
+        )
+    return entries
+
+
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def profile_cycles(call: ServiceCall) -> ServiceResponse:
+        """Handle the profile_cycles service."""
+        path = await async_profile_cycles(
+            hass,
+            [entry.runtime_data.coordinator for entry in loaded_entries(hass, call)],
+            call.data[ATTR_CYCLES],
+            call.data[ATTR_PROFILER],
+            call.data[ATTR_INTERVAL],
+        )
+        return {"path": str(path)}
+
+    async def start_recording(call: ServiceCall) -> ServiceResponse:
+        """Handle the start_recording service."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        paths: list[Any] = []
+        for entry in loaded_entries(hass, call):
+            path = (
+                Path(hass.config.config_dir)
+                / f"{CONST.DOMAIN}_traffic_{entry.data[CONF.PREFIX]}_{timestamp}.jsonl"
+            )
+            recorder = entry.runtime_data.modbus_api.start_recording(hass, path)
+            paths.append(str(recorder.path))
+        return {"paths": paths}
+
+    async def stop_recording(call: ServiceCall) -> ServiceResponse:
+        """Handle the stop_recording service."""
+        recordings: list[Any] = []
+        for entry in loaded_entries(hass, call):
+            recorder = await entry.runtime_data.modbus_api.stop_recording()
+            if recorder is not None:
+                recordings.append(
+                    {
+                        "path": str(recorder.path),
+                        "records": recorder.records,
+                        "dropped": recorder.dropped,
+                        "error": recorder.error,
+                    }
+                )
+        return {"recordings": recordings}
+
+    async def tune(call: ServiceCall) -> ServiceResponse:
+        """Handle the tune service."""
+        results: dict[str, Any] = {}
+        for entry in loaded_entries(hass, call):
+            result = await entry.runtime_data.coordinator.async_tune()
+            if result is not None:
+                await async_save_tuning(hass, entry.entry_id, result)
+            results[entry.entry_id] = None if result is None else result.as_dict()
+        return {"results": results}
+
+    hass.services.async_register(
+        CONST.DOMAIN,
+        SERVICE_PROFILE_CYCLES,
+        profile_cycles,
+        schema=PROFILE_CYCLES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        CONST.DOMAIN,
+        SERVICE_START_RECORDING,
+        start_recording,
+        schema=RECORDING_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        CONST.DOMAIN,
+        SERVICE_STOP_RECORDING,
+        stop_recording,
+        schema=RECORDING_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        CONST.DOMAIN,
+        SERVICE_TUNE,
+        tune,
+        schema=TUNE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,219 @@
+"""Tuning of the request parameters.
+
+Firmware versions and modbus gateways differ in the number of registers they
+accept per request and in their response times. The tuning measures the round
+trip time with a few single register reads and searches the largest accepted
+block size on the blocks of the read plan. The results are stored per config
+entry and feed the read planner and the request timeout.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import logging
+import statistics
+import time
+from typing import Any
+
+from pymodbus import ModbusException
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import CONST
+from .items import ModbusItem
+from .modbusobject import ModbusAPI
+from .readplan import ReadBlock, build_read_plan
+
+_LOGGER = logging.getLogger(__name__)
+
+TUNING_STORAGE_VERSION = 1
+# single register reads to measure the round trip time
+RTT_PROBES = 5
+# blocks of the read plan that are tried to find the block size limit
+BLOCK_CANDIDATES = 3
+# request timeout as multiple of the slowest measured response, and its bounds.
+# A fast device keeps the default timeout of the modbus client, a tuning on a
+# quiet network must not make the requests fail when the network gets busy.
+TIMEOUT_FACTOR = 5.0
+MIN_TIMEOUT = 3.0
+MAX_TIMEOUT = 5.0
+# modbus exception code of a block that contains unknown registers
+ILLEGAL_ADDRESS = 2
+# modbus exception codes of a block that is too long, illegal data value and
+# server device failure
+SIZE_ERRORS = frozenset({3, 4})
+
+
+@dataclass
+class TuningResult:
+    """Request parameters measured for one heat pump."""
+
+    max_block_size: int
+    rtt: float
+    timeout: float
+    probes: int
+    tuned_at: str
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the result as JSON serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> TuningResult:
+        """Return a result stored with as_dict."""
+        return cls(**data)
+
+
+class _Prober:
+    """Count and time the probe requests of one tuning run."""
+
+    def __init__(self, modbus_api: ModbusAPI) -> None:
+        self._modbus_api = modbus_api
+        self.probes = 0
+        self.slowest = 0.0
+
+    async def read(self, block: ReadBlock, count: int) -> int | None:
+        """Read the first count registers of a block.
+
+        Returns:
+            None when the read succeeded, otherwise the exception code, 0 when
+            the request timed out or the answer was incomplete
+
+        """
+        self.probes += 1
+        start = time.perf_counter()
+        try:
+            mbr = await self._modbus_api.read_registers(
+                block.register_type, block.address, count
+            )
+        except ModbusException:
+            return 0
+        if mbr.isError():
+            return getattr(mbr, "exception_code", 0)
+        self.slowest = max(self.slowest, time.perf_counter() - start)
+        return None if len(mbr.registers) == count else 0
+
+
+async def _largest_block_size(prober: _Prober, blocks: list[ReadBlock]) -> int:
+    """Return the largest block size the device accepts.
+
+    The longest blocks of the read plan are read as a whole. When the device
+    rejects one for its size, the largest accepted prefix is searched by
+    bisection. Only the exception codes of SIZE_ERRORS count as rejection,
+    blocks with unknown registers or requests that timed out are no indication
+    and the next block is tried.
+    """
+    for block in sorted(blocks, key=lambda block: -block.count)[:BLOCK_CANDIDATES]:
+        error = await prober.read(block, block.count)
+        if error is None:
+            # the plan never has longer blocks than this one, so no limit
+            # beyond the protocol limit is needed
+            return CONST.MAX_BLOCK_SIZE
+        if error not in SIZE_ERRORS:
+            continue
+        if (accepted := await _bisect_block_size(prober, block)) is not None:
+            return accepted
+    return CONST.MAX_BLOCK_SIZE
+
+
+async def _bisect_block_size(prober: _Prober, block: ReadBlock) -> int | None:
+    """Return the largest accepted prefix of a rejected block.
+
+    Returns:
+        None when a probe gave no definite answer
+
+    """
+    accepted, rejected = 1, block.count
+    while rejected - accepted > 1:
+        size = (accepted + rejected) // 2
+        error = await prober.read(block, size)
+        if error is None:
+            accepted = size
+        elif error in SIZE_ERRORS:
+            rejected = size
+        else:
+            return None
+    return accepted
+
+
+async def async_tune(
+    modbus_api: ModbusAPI, modbus_items: list[ModbusItem]
+) -> TuningResult | None:
+    """Measure the request parameters of the heat pump.
+
+    Args:
+        modbus_api: the modbus API, connected when necessary
+        modbus_items: valid items whose read plan is used for probing
+
+    Returns:
+        The measured parameters, None without connection or readable register
+
+    """
+    if not modbus_api._modbus_client.connected:  # noqa: SLF001
+        if not await modbus_api.connect(startup=True):
+            return None
+    blocks = build_read_plan(modbus_items, CONST.MAX_BLOCK_SIZE)
+    if not blocks:
+        return None
+
+    prober = _Prober(modbus_api)
+    rtts: list[float] = []
+    for block in blocks[:BLOCK_CANDIDATES]:
+        if await prober.read(block, 1) is not None:
+            continue
+        for _ in range(RTT_PROBES):
+            start = time.perf_counter()
+            if await prober.read(block, 1) is None:
+                rtts.append(time.perf_counter() - start)
+        break
+    if not rtts:
+        _LOGGER.warning("Tuning failed, no register could be read")
+        return None
+
+    max_block_size = await _largest_block_size(prober, blocks)
+    result = TuningResult(
+        max_block_size=max_block_size,
+        rtt=statistics.median(rtts),
+        timeout=min(max(TIMEOUT_FACTOR * prober.slowest, MIN_TIMEOUT), MAX_TIMEOUT),
+        probes=prober.probes,
+        tuned_at=datetime.now(UTC).isoformat(),
+    )
+    _LOGGER.info(
+        "Tuned with %s probes: block size %s, round trip %.3f s, timeout %.2f s",
+        result.probes,
+        result.max_block_size,
+        result.rtt,
+        result.timeout,
+    )
+    return result
+
+
+def _store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Return the store of the tuning results of a config entry."""
+    return Store(hass, TUNING_STORAGE_VERSION, f"{CONST.DOMAIN}.tuning.{entry_id}")
+
+
+async def async_load_tuning(hass: HomeAssistant, entry_id: str) -> TuningResult | None:
+    """Return the stored tuning result of a config entry, None if never tuned."""
+    data = await _store(hass, entry_id).async_load()
+    if data is None:
+        return None
+    try:
+        return TuningResult.from_dict(data)
+    except TypeError:
+        _LOGGER.warning("Ignoring invalid tuning result %s", data)
+        return None
+
+
+async def async_save_tuning(
+    hass: HomeAssistant, entry_id: str, result: TuningResult
+) -> None:
+    """Store the tuning result of a config entry."""
+    await _store(hass, entry_id).async_save(result.as_dict())
+
+
+async def async_remove_tuning(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the stored tuning result of a config entry."""
+    await _store(hass, entry_id).async_remove()
@@ -0,0 +1,21 @@
+"""Adaptive register scanner for Weishaupt WBB heat pumps."""
+
+from .scanner import (
+    DEFAULT_RANGES,
+    RegisterScanner,
+    ScanRange,
+    ScanResult,
+    load_state,
+    uncovered_blocks,
+    write_csv,
+)
+
+__all__ = [
+    "DEFAULT_RANGES",
+    "RegisterScanner",
+    "ScanRange",
+    "ScanResult",
+    "load_state",
+    "uncovered_blocks",
+    "write_csv",
+]
@@ -0,0 +1,104 @@
+"""Scan the modbus registers of a heat pump.
+
+Example:
+    python -m scan_tool 192.168.42.144 --state scan.jsonl --output register.csv
+    python -m scan_tool 127.0.0.1 --port 5020 --range input:30001-30200
+
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+from pathlib import Path
+import time
+
+from custom_components.weishaupt_modbus.const import REGISTERS
+
+from .scanner import (
+    DEFAULT_RANGES,
+    MAX_BLOCK_SIZE,
+    RegisterScanner,
+    ScanRange,
+    write_csv,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _parse_range(value: str) -> ScanRange:
+    """Parse a range like input:30001-39999."""
+    try:
+        register_type, addresses = value.split(":")
+        start, end = addresses.split("-")
+        scan_range = ScanRange(register_type, int(start), int(end))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid range {value}") from exc
+    if register_type not in (REGISTERS.INPUT, REGISTERS.HOLDING):
+        raise argparse.ArgumentTypeError(f"invalid register type {register_type}")
+    return scan_range
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description="Weishaupt WBB register scanner")
+    parser.add_argument("host")
+    parser.add_argument("--port", type=int, default=502)
+    parser.add_argument(
+        "--range",
+        dest="ranges",
+        type=_parse_range,
+        action="append",
+        help="register range to scan, e.g. input:30001-39999, can be repeated",
+    )
+    parser.add_argument(
+        "--connections", type=int, default=4, help="concurrent connections"
+    )
+    parser.add_argument("--block-size", type=int, default=MAX_BLOCK_SIZE)
+    parser.add_argument(
+        "--timeout", type=float, default=1.0, help="request timeout in seconds"
+    )
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help="JSONL file of finished blocks, an existing scan is resumed",
+    )
+    parser.add_argument("--output", type=Path, default=Path("register.csv"))
+    parser.add_argument(
+        "--column", help="header of the value column, defaults to the host"
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    """Run the scan and write the CSV file."""
+    args = parse_args()
+    scanner = RegisterScanner(
+        args.host,
+        args.port,
+        connections=args.connections,
+        block_size=args.block_size,
+        timeout=args.timeout,
+        retries=args.retries,
+        state_path=args.state,
+    )
+    start = time.perf_counter()
+    result = await scanner.scan(args.ranges or DEFAULT_RANGES)
+    write_csv(args.output, result, args.column or args.host)
+    _LOGGER.info(
+        "Found %s input and %s holding registers with %s requests in %.1f s, "
+        "%s blocks failed, results written to %s",
+        len(result.values[REGISTERS.INPUT]),
+        len(result.values[REGISTERS.HOLDING]),
+        result.requests,
+        time.perf_counter() - start,
+        len(result.failed),
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main())
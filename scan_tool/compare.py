@@ -0,0 +1,227 @@
+"""Compare register scans of several installations.
+
+Loads any number of CSV files in the format of auswertung_register.csv into one
+table with a column per installation and classifies every register:
+
+- unavailable: all values report a missing sensor or an unset value
+- constant: all installations report the same value
+- different: the installations report different values
+- single: only one installation reports the register
+
+Registers that are not in hpconst.py and not unavailable are suggested as new
+ModbusItem entries.
+
+Example:
+    python -m scan_tool.compare scans/*.csv --output compare.csv --suggest
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import time
+
+import numpy as np
+
+from custom_components.weishaupt_modbus.const import DEVICES
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+
+_LOGGER = logging.getLogger(__name__)
+
+# marks a register that is not in a scan
+MISSING = -1
+# raw values of a missing sensor (-32768 as signed or unsigned) and of an unset value
+UNAVAILABLE_VALUES = (32768, -32768, 65535)
+
+
+@dataclass(frozen=True)
+class RegisterStatusConstants:
+    """Classification of a register across installations."""
+
+    UNAVAILABLE = "unavailable"
+    CONSTANT = "constant"
+    DIFFERENT = "different"
+    SINGLE = "single"
+
+
+STATUS = RegisterStatusConstants()
+
+
+@dataclass
+class RegisterTable:
+    """Register values of several installations, one column per installation."""
+
+    registers: np.ndarray
+    columns: list[str]
+    values: np.ndarray
+    names: dict[int, str]
+
+
+def read_scan(
+    path: Path,
+) -> tuple[list[str], list[int], list[list[int]], dict[int, str]]:
+    """Read one CSV file.
+
+    Returns:
+        value column headers, registers, values per column and documented names
+
+    """
+    with path.open(encoding="utf-8") as file:
+        reader = csv.reader(file, delimiter=";")
+        header = next(reader)
+        columns = header[2:]
+        registers: list[int] = []
+        values: list[list[int]] = [[] for _ in columns]
+        names: dict[int, str] = {}
+        for row in reader:
+            try:
+                register = int(row[0])
+            except (IndexError, ValueError):
+                continue
+            registers.append(register)
+            if len(row) > 1 and row[1]:
+                names[register] = row[1]
+            for idx in range(len(columns)):
+                try:
+                    values[idx].append(int(row[2 + idx]))
+                except (IndexError, ValueError):
+                    values[idx].append(MISSING)
+    return columns, registers, values, names
+
+
+def load_scans(paths: list[Path]) -> RegisterTable:
+    """Load CSV files into one table over the union of all registers.
+
+    Columns of different files with the same header get the file name added.
+    """
+    scans = [read_scan(path) for path in paths]
+    registers = np.unique(
+        np.concatenate(
+            [
+                np.asarray(scan_registers, dtype=np.int64)
+                for _, scan_registers, _, _ in scans
+            ]
+            or [np.empty(0, dtype=np.int64)]
+        )
+    )
+    columns: list[str] = []
+    data: list[np.ndarray] = []
+    names: dict[int, str] = {}
+    for path, (scan_columns, scan_registers, scan_values, scan_names) in zip(
+        paths, scans, strict=True
+    ):
+        rows = np.searchsorted(registers, np.asarray(scan_registers, dtype=np.int64))
+        for column, column_values in zip(scan_columns, scan_values, strict=True):
+            full = np.full(len(registers), MISSING, dtype=np.int64)
+            full[rows] = column_values
+            columns.append(f"{column} ({path.stem})" if column in columns else column)
+            data.append(full)
+        for register, name in scan_names.items():
+            names.setdefault(register, name)
+    values = (
+        np.column_stack(data) if data else np.empty((len(registers), 0), dtype=np.int64)
+    )
+    return RegisterTable(registers, columns, values, names)
+
+
+def classify(table: RegisterTable) -> np.ndarray:
+    """Return the status of every register of the table."""
+    values = table.values
+    present = values != MISSING
+    count = present.sum(axis=1)
+    unavailable = np.isin(values, UNAVAILABLE_VALUES) | ~present
+    # compare every value with the first present value of its row
+    first = values[np.arange(len(values)), present.argmax(axis=1)]
+    same = ((values == first[:, None]) | ~present).all(axis=1)
+
+    status = np.full(len(values), STATUS.DIFFERENT, dtype=object)
+    status[same] = STATUS.CONSTANT
+    status[count == 1] = STATUS.SINGLE
+    status[unavailable.all(axis=1)] = STATUS.UNAVAILABLE
+    return status
+
+
+def suggest_items(table: RegisterTable, status: np.ndarray) -> list[str]:
+    """Return ModbusItem definitions for registers missing in hpconst.py.
+
+    The device is taken from the known items of the same register group, e.g.
+    33101 and 43101 belong to the heat pump.
+    """
+    items = [item for device in DEVICELISTS for item in device]
+    known = np.asarray(sorted({item.address for item in items}), dtype=np.int64)
+    groups = {item.address % 10000 // 100: item.device for item in items}
+    candidates = ~np.isin(table.registers, known) & (status != STATUS.UNAVAILABLE)
+
+    suggestions = []
+    for address in table.registers[candidates].tolist():
+        device = groups.get(address % 10000 // 100, DEVICES.UK)
+        device_name = next(
+            name for name, value in vars(type(DEVICES)).items() if value == device
+        )
+        mtype = "TYPES.NUMBER_RO" if address >= 40000 else "TYPES.SENSOR"
+        name = table.names.get(address, f"Register {address}").replace('"', "'")
+        suggestions.append(
+            f'ModbusItem( address={address}, name="{name}", '
+            f"mformat=FORMATS.UNKNOWN, mtype={mtype}, device=DEVICES.{device_name}, "
+            f'translation_key="reg_{address}"),'
+        )
+    return suggestions
+
+
+def write_report(path: Path, table: RegisterTable, status: np.ndarray) -> None:
+    """Write the table with the status of every register as CSV."""
+    with path.open("w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";", lineterminator="\n")
+        writer.writerow(["Register", "Name Doku", *table.columns, "Status"])
+        for register, row, row_status in zip(
+            table.registers.tolist(),
+            table.values.tolist(),
+            status.tolist(),
+            strict=True,
+        ):
+            writer.writerow(
+                [
+                    register,
+                    table.names.get(register, ""),
+                    *("" if value == MISSING else value for value in row),
+                    row_status,
+                ]
+            )
+
+
+def main() -> None:
+    """Compare the scans given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scans", nargs="+", type=Path)
+    parser.add_argument("--output", type=Path, default=Path("compare.csv"))
+    parser.add_argument(
+        "--suggest",
+        action="store_true",
+        help="print ModbusItem entries for registers missing in hpconst.py",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    table = load_scans(args.scans)
+    status = classify(table)
+    write_report(args.output, table, status)
+    counts = dict(zip(*np.unique(status, return_counts=True), strict=True))
+    _LOGGER.info(
+        "%s registers of %s installations compared in %.2f s: %s",
+        len(table.registers),
+        len(table.columns),
+        time.perf_counter() - start,
+        ", ".join(f"{count} {name}" for name, count in sorted(counts.items())),
+    )
+    if args.suggest:
+        for line in suggest_items(table, status):
+            print(line)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
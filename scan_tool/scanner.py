@@ -0,0 +1,338 @@
+"""Adaptive scanner of the modbus registers of a heat pump.
+
+The register ranges are probed with block reads. A block that fails with an
+illegal address or an illegal value contains registers that do not exist, its
+valid runs are searched with reads that double in size after a success and are
+halved after a failure. Several connections work on the blocks concurrently,
+the heat pump answers the requests of one connection strictly in order.
+
+Every finished block is appended to a JSONL state file, so an interrupted scan
+can be resumed. Blocks that timed out are not stored and are probed again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+from dataclasses import dataclass, field
+import json
+import logging
+from pathlib import Path
+from typing import IO, Any
+
+from pymodbus import ModbusException
+from pymodbus.client import AsyncModbusTcpClient
+
+from custom_components.weishaupt_modbus.const import REGISTERS
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+
+_LOGGER = logging.getLogger(__name__)
+
+# modbus limit of registers per read request
+MAX_BLOCK_SIZE = 125
+# exception codes that mean the block contains registers that do not exist
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_ILLEGAL_VALUE = 0x03
+
+
+@dataclass(frozen=True)
+class ScanRange:
+    """Range of registers of one type, both ends included."""
+
+    register_type: str
+    start: int
+    end: int
+
+
+DEFAULT_RANGES = (
+    ScanRange(REGISTERS.INPUT, 30001, 39999),
+    ScanRange(REGISTERS.HOLDING, 40001, 49999),
+)
+
+
+@dataclass
+class ScanResult:
+    """Registers found by a scan."""
+
+    values: dict[str, dict[int, int]] = field(
+        default_factory=lambda: {REGISTERS.INPUT: {}, REGISTERS.HOLDING: {}}
+    )
+    invalid: dict[str, set[int]] = field(
+        default_factory=lambda: {REGISTERS.INPUT: set(), REGISTERS.HOLDING: set()}
+    )
+    failed: list[tuple[str, int, int]] = field(default_factory=list)
+    requests: int = 0
+
+    def store(
+        self, register_type: str, address: int, count: int, registers: list[int] | None
+    ) -> None:
+        """Store a finished block, registers is None for invalid registers."""
+        if registers is None:
+            self.invalid[register_type].update(range(address, address + count))
+        else:
+            self.values[register_type].update(
+                zip(range(address, address + count), registers, strict=True)
+            )
+
+    def covered(self, register_type: str) -> set[int]:
+        """Return the registers that need no further probing."""
+        return self.values[register_type].keys() | self.invalid[register_type]
+
+
+def uncovered_blocks(
+    scan_range: ScanRange, covered: set[int], block_size: int
+) -> list[tuple[int, int]]:
+    """Return the blocks of a range that still have to be probed.
+
+    Args:
+        scan_range: the range to scan
+        covered: registers already probed
+        block_size: maximum number of registers per block
+
+    Returns:
+        list of (address, count), consecutive registers are joined
+
+    """
+    blocks: list[tuple[int, int]] = []
+    start: int | None = None
+    for address in range(scan_range.start, scan_range.end + 2):
+        if address <= scan_range.end and address not in covered:
+            if start is None:
+                start = address
+            if address - start + 1 < block_size:
+                continue
+            blocks.append((start, address - start + 1))
+            start = None
+        elif start is not None:
+            blocks.append((start, address - start))
+            start = None
+    return blocks
+
+
+def load_state(path: Path) -> ScanResult:
+    """Return the result stored in a state file, empty when it does not exist."""
+    result = ScanResult()
+    if not path.exists():
+        return result
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                block = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of an interrupted scan may be cut off
+                continue
+            result.store(block["type"], block["addr"], block["count"], block["regs"])
+    return result
+
+
+def write_csv(path: Path, result: ScanResult, column: str) -> None:
+    """Write the valid registers in the format of auswertung_register.csv.
+
+    Args:
+        path: CSV file to write
+        result: result of the scan
+        column: header of the value column, e.g. the heat pump model
+
+    """
+    names = {item.address: item.name for device in DEVICELISTS for item in device}
+    with path.open("w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";", lineterminator="\n")
+        writer.writerow(["Register", "Name Doku", column])
+        for register_type in (REGISTERS.INPUT, REGISTERS.HOLDING):
+            values = result.values[register_type]
+            for address in sorted(values):
+                writer.writerow([address, names.get(address, ""), values[address]])
+
+
+class RegisterScanner:
+    """Scan register ranges with block reads over several connections."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 502,
+        *,
+        connections: int = 4,
+        block_size: int = MAX_BLOCK_SIZE,
+        timeout: float = 1.0,
+        retries: int = 2,
+        device_id: int = 1,
+        state_path: Path | None = None,
+    ) -> None:
+        """Construct the scanner.
+
+        Args:
+            host: address of the heat pump
+            port: modbus TCP port
+            connections: number of concurrent connections
+            block_size: registers per block of the first probe
+            timeout: timeout of one request in seconds
+            retries: retries of a request that timed out
+            device_id: modbus device id
+            state_path: JSONL file to store finished blocks for resuming
+
+        """
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.block_size = min(block_size, MAX_BLOCK_SIZE)
+        self.timeout = timeout
+        self.retries = retries
+        self.device_id = device_id
+        self.state_path = state_path
+        self._state: IO[str] | None = None
+
+    async def scan(
+        self, ranges: tuple[ScanRange, ...] | list[ScanRange] = DEFAULT_RANGES
+    ) -> ScanResult:
+        """Scan the ranges, continue a previous scan when a state file exists.
+
+        Raises:
+            ConnectionError: when no connection to the heat pump can be opened
+
+        """
+        result = (
+            load_state(self.state_path) if self.state_path is not None else ScanResult()
+        )
+        queue: asyncio.Queue[tuple[str, int, int]] = asyncio.Queue()
+        for scan_range in ranges:
+            covered = result.covered(scan_range.register_type)
+            for address, count in uncovered_blocks(
+                scan_range, covered, self.block_size
+            ):
+                queue.put_nowait((scan_range.register_type, address, count))
+        if queue.empty():
+            return result
+
+        clients = []
+        for _ in range(self.connections):
+            client = AsyncModbusTcpClient(
+                self.host, port=self.port, timeout=self.timeout, retries=self.retries
+            )
+            await client.connect()
+            if client.connected:
+                clients.append(client)
+        if not clients:
+            raise ConnectionError(f"Connection to {self.host}:{self.port} failed")
+
+        if self.state_path is not None:
+            self._state = self.state_path.open("a", encoding="utf-8")
+        workers = [
+            asyncio.create_task(self._worker(client, queue, result))
+            for client in clients
+        ]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for client in clients:
+                client.close()
+            if self._state is not None:
+                self._state.close()
+                self._state = None
+        return result
+
+    async def _worker(
+        self,
+        client: AsyncModbusTcpClient,
+        queue: asyncio.Queue[tuple[str, int, int]],
+        result: ScanResult,
+    ) -> None:
+        """Scan blocks from the queue until cancelled."""
+        while True:
+            register_type, address, count = await queue.get()
+            try:
+                await self._scan_block(client, result, register_type, address, count)
+            finally:
+                queue.task_done()
+
+    async def _read(
+        self, client: AsyncModbusTcpClient, register_type: str, address: int, count: int
+    ) -> list[int] | None:
+        """Read registers, None when the block contains invalid registers.
+
+        Raises:
+            ModbusException: when there is no answer or another exception code
+
+        """
+        if register_type == REGISTERS.HOLDING:
+            response = await client.read_holding_registers(
+                address, count=count, device_id=self.device_id
+            )
+        else:
+            response = await client.read_input_registers(
+                address, count=count, device_id=self.device_id
+            )
+        if not response.isError():
+            return list(response.registers)
+        if response.exception_code in (EXC_ILLEGAL_ADDRESS, EXC_ILLEGAL_VALUE):
+            return None
+        raise ModbusException(f"exception code {response.exception_code}")
+
+    async def _scan_block(
+        self,
+        client: AsyncModbusTcpClient,
+        result: ScanResult,
+        register_type: str,
+        address: int,
+        count: int,
+    ) -> None:
+        """Scan one block.
+
+        When the block read fails the registers are probed from the start. Every
+        valid read doubles the size of the next one, a failing read is retried
+        with half the size until a single register fails and is invalid. So
+        both runs of valid registers and gaps cost few requests.
+        """
+        end = address + count
+        size = count
+        first = True
+        while address < end:
+            count = min(size, end - address)
+            result.requests += 1
+            try:
+                registers = await self._read(client, register_type, address, count)
+            except ModbusException as exc:
+                _LOGGER.warning(
+                    "Reading %s registers %s+%s failed: %s",
+                    register_type,
+                    address,
+                    count,
+                    exc,
+                )
+                result.failed.append((register_type, address, end - address))
+                return
+            if registers is not None:
+                self._store(result, register_type, address, count, registers)
+                address += count
+                size = 2 * count
+            elif count == 1:
+                self._store(result, register_type, address, 1, None)
+                address += 1
+            elif first:
+                size = 1
+            else:
+                size = count // 2
+            first = False
+
+    def _store(
+        self,
+        result: ScanResult,
+        register_type: str,
+        address: int,
+        count: int,
+        registers: list[int] | None,
+    ) -> None:
+        """Store a finished block in the result and the state file."""
+        result.store(register_type, address, count, registers)
+        if self._state is not None:
+            block: dict[str, Any] = {
+                "type": register_type,
+                "addr": address,
+                "count": count,
+                "regs": registers,
+            }
+            self._state.write(json.dumps(block) + "\n")
+            self._state.flush()
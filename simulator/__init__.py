@@ -0,0 +1,27 @@
+"""Local Modbus TCP simulator of the Weishaupt WBB register map and traffic replay."""
+
+from .faults import FAULTS, SCENARIOS, FaultEvent, FaultRule, FaultySimulator
+from .replay import ReplayClient, ReplayStats, load_recording
+from .server import (
+    SENSOR_MISSING,
+    RegisterMap,
+    SimulatorStats,
+    WbbSimulator,
+    load_register_map,
+)
+
+__all__ = [
+    "FAULTS",
+    "SCENARIOS",
+    "SENSOR_MISSING",
+    "FaultEvent",
+    "FaultRule",
+    "FaultySimulator",
+    "RegisterMap",
+    "ReplayClient",
+    "ReplayStats",
+    "SimulatorStats",
+    "WbbSimulator",
+    "load_recording",
+    "load_register_map",
+]
@@ -0,0 +1,93 @@
+"""Run the WBB simulator as standalone process.
+
+Example:
+    python -m simulator --port 5020 --latency 0.02 --column Ostrama
+    python -m simulator --scenario flaky --fault-seed 42
+
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+
+from .faults import SCENARIOS, FaultySimulator
+from .server import MAX_REGISTERS_PER_REQUEST, load_register_map
+
+
+def _parse_addresses(value: str) -> list[int]:
+    """Parse a comma separated list of register addresses."""
+    return [int(address) for address in value.split(",") if address]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description="Weishaupt WBB Modbus TCP simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument(
+        "--column",
+        default="MadOne",
+        help="column of auswertung_register.csv used for the register values",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="response delay in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra delay in seconds"
+    )
+    parser.add_argument(
+        "--max-count",
+        type=int,
+        default=MAX_REGISTERS_PER_REQUEST,
+        help="maximum registers per read request",
+    )
+    parser.add_argument(
+        "--holes",
+        type=_parse_addresses,
+        default=[],
+        help="addresses answering with illegal address, e.g. 30003,31103",
+    )
+    parser.add_argument(
+        "--missing",
+        type=_parse_addresses,
+        default=[],
+        help="addresses reporting a missing sensor (-32768)",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--scenario",
+        choices=sorted(SCENARIOS),
+        default="none",
+        help="fault scenario to inject",
+    )
+    parser.add_argument(
+        "--fault-seed", type=int, default=0, help="seed to replay a fault sequence"
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    """Run the simulator until interrupted."""
+    args = parse_args()
+    simulator = FaultySimulator(
+        registers=load_register_map(args.column),
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        max_count=args.max_count,
+        holes=args.holes,
+        missing=args.missing,
+        seed=args.seed,
+        rules=SCENARIOS[args.scenario],
+        fault_seed=args.fault_seed,
+    )
+    async with simulator:
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main())
@@ -0,0 +1,200 @@
+"""Scripted fault scenarios for the WBB simulator.
+
+Every request handled by a FaultySimulator is numbered. For each request the
+rules of the scenario are checked in order and the first one that fires is
+applied. Random decisions are drawn from a generator seeded once per
+simulator, so the same seed and request sequence always give the same faults.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import random
+
+from .server import (
+    EXC_DEVICE_FAILURE,
+    EXC_ILLEGAL_ADDRESS,
+    EXC_ILLEGAL_VALUE,
+    WbbSimulator,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FaultConstants:
+    """Kinds of faults the simulator can inject."""
+
+    DROP = "drop"
+    DELAY = "delay"
+    EXCEPTION = "exception"
+    HALF_OPEN = "half_open"
+    REBOOT = "reboot"
+
+
+FAULTS = FaultConstants()
+
+
+@dataclass(frozen=True)
+class FaultRule:
+    """A fault and the condition that triggers it.
+
+    Attributes:
+        kind: one of FAULTS
+        probability: chance per request that the fault fires
+        at_requests: request numbers (starting at 1) that always fire
+        delay: response delay in seconds for FAULTS.DELAY
+        duration: length of the outage in seconds for FAULTS.REBOOT
+        exception_codes: codes to choose from for FAULTS.EXCEPTION
+
+    """
+
+    kind: str
+    probability: float = 0.0
+    at_requests: tuple[int, ...] = ()
+    delay: float = 0.0
+    duration: float = 0.0
+    exception_codes: tuple[int, ...] = (EXC_DEVICE_FAILURE,)
+
+
+@dataclass(frozen=True)
+class FaultEvent:
+    """Record of an injected fault."""
+
+    request: int
+    kind: str
+    detail: float | None = None
+
+
+# Predefined scenarios, selectable by name from the command line
+SCENARIOS: dict[str, list[FaultRule]] = {
+    "none": [],
+    "flaky": [
+        FaultRule(
+            kind=FAULTS.EXCEPTION,
+            probability=0.05,
+            exception_codes=(EXC_DEVICE_FAILURE, EXC_ILLEGAL_VALUE),
+        ),
+        FaultRule(kind=FAULTS.DROP, probability=0.01),
+    ],
+    "slow": [FaultRule(kind=FAULTS.DELAY, probability=0.1, delay=5.0)],
+    "illegal": [
+        FaultRule(
+            kind=FAULTS.EXCEPTION,
+            probability=0.2,
+            exception_codes=(EXC_ILLEGAL_ADDRESS,),
+        ),
+    ],
+    "half_open": [FaultRule(kind=FAULTS.HALF_OPEN, at_requests=(50,))],
+    "reboot": [FaultRule(kind=FAULTS.REBOOT, at_requests=(100,), duration=60.0)],
+}
+
+
+class FaultySimulator(WbbSimulator):
+    """WBB simulator that injects the faults of a scenario."""
+
+    def __init__(
+        self,
+        *args,
+        rules: list[FaultRule] | None = None,
+        fault_seed: int = 0,
+        **kwargs,
+    ) -> None:
+        """Construct the simulator.
+
+        Args:
+            args: positional arguments of WbbSimulator
+            rules: fault rules, checked in order for every request
+            fault_seed: seed that makes the fault sequence replayable
+            kwargs: keyword arguments of WbbSimulator
+
+        """
+        super().__init__(*args, **kwargs)
+        self.rules: list[FaultRule] = rules or []
+        self.events: list[FaultEvent] = []
+        self.rebooting: bool = False
+        self._fault_random = random.Random(fault_seed)
+        self._request_counter: int = 0
+        self._half_open: set[asyncio.StreamWriter] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def next_fault(self) -> FaultRule | None:
+        """Count the request and return the fault to inject, if any."""
+        self._request_counter += 1
+        fired = None
+        for rule in self.rules:
+            # draw for every rule to keep the random sequence independent of the outcome
+            chance = self._fault_random.random()
+            if fired is None and (
+                self._request_counter in rule.at_requests or chance < rule.probability
+            ):
+                fired = rule
+        return fired
+
+    async def handle_pdu(
+        self, pdu: bytes, writer: asyncio.StreamWriter
+    ) -> bytes | None:
+        """Answer a request or inject a fault instead."""
+        if writer in self._half_open:
+            return None
+
+        rule = self.next_fault()
+        if rule is None:
+            return self.process(pdu)
+
+        match rule.kind:
+            case FAULTS.DROP:
+                self._record(rule.kind)
+                writer.close()
+                return None
+            case FAULTS.DELAY:
+                self._record(rule.kind, rule.delay)
+                await asyncio.sleep(rule.delay)
+                return self.process(pdu)
+            case FAULTS.EXCEPTION:
+                code = self._fault_random.choice(rule.exception_codes)
+                self._record(rule.kind, code)
+                return self.exception(pdu[0], code)
+            case FAULTS.HALF_OPEN:
+                # socket stays open, but nothing is answered anymore
+                self._record(rule.kind)
+                self._half_open.add(writer)
+                return None
+            case FAULTS.REBOOT:
+                self._record(rule.kind, rule.duration)
+                task = asyncio.get_running_loop().create_task(
+                    self.reboot(rule.duration)
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                return None
+        return self.process(pdu)
+
+    async def reboot(self, duration: float) -> None:
+        """Go offline for a while, like a heat pump that restarts."""
+        if self.rebooting or self._server is None:
+            return
+        self.rebooting = True
+        _LOGGER.info("Simulated reboot for %.1f s", duration)
+        self._server.close()
+        self.drop_connections()
+        self._half_open.clear()
+        try:
+            await asyncio.sleep(duration)
+            await self.start()
+        finally:
+            self.rebooting = False
+
+    async def stop(self) -> None:
+        """Stop the simulator including a pending reboot."""
+        for task in list(self._tasks):
+            task.cancel()
+        self._half_open.clear()
+        await super().stop()
+
+    def _record(self, kind: str, detail: float | None = None) -> None:
+        """Remember an injected fault."""
+        self.events.append(FaultEvent(self._request_counter, kind, detail))
+        _LOGGER.debug("Request %s: inject %s", self._request_counter, kind)
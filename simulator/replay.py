@@ -0,0 +1,190 @@
+"""Replay of recorded modbus traffic.
+
+ReplayClient implements the part of AsyncModbusTcpClient used by ModbusAPI and
+answers every request from a recording written by the traffic recorder of the
+integration. A request that was recorded with the same function code, address
+and count gets the next recorded answer, the last one is repeated when the
+recording is exhausted. Other requests, e.g. after the read plan changed, are
+composed from the latest known register values and fail with an illegal
+address when a register was never seen.
+
+With speed None the answers are returned as fast as possible, otherwise the
+recorded latency divided by speed is waited for each answer, so speed 1.0 plays
+back in real time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import json
+from pathlib import Path
+from typing import Any, Self
+
+from pymodbus import ExceptionResponse, ModbusException
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.pdu.register_message import (
+    ReadHoldingRegistersResponse,
+    ReadInputRegistersResponse,
+    WriteSingleRegisterResponse,
+)
+
+from custom_components.weishaupt_modbus.recorder import RECORDER_FORMAT
+
+from .server import EXC_ILLEGAL_ADDRESS, FC_READ_HOLDING, FC_READ_INPUT, FC_WRITE_SINGLE
+
+# exceptions raised by the client, as named in the recording
+EXCEPTIONS: dict[str, type[ModbusException]] = {
+    "ModbusIOException": ModbusIOException,
+    "ConnectionException": ConnectionException,
+}
+
+RESPONSES = {
+    FC_READ_HOLDING: ReadHoldingRegistersResponse,
+    FC_READ_INPUT: ReadInputRegistersResponse,
+    FC_WRITE_SINGLE: WriteSingleRegisterResponse,
+}
+
+
+def load_recording(path: Path) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Return the header and the records of a traffic recording.
+
+    Raises:
+        ValueError: when the file is not a traffic recording
+
+    """
+    with path.open(encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file if line.strip()]
+    if not lines or lines[0].get("format") != RECORDER_FORMAT:
+        raise ValueError(f"{path} is not a {RECORDER_FORMAT} recording")
+    return lines[0], lines[1:]
+
+
+@dataclass
+class ReplayStats:
+    """How the requests of a replay were answered."""
+
+    requests: int = 0
+    replayed: int = 0
+    composed: int = 0
+    missing: int = 0
+
+
+class ReplayClient:
+    """Stand-in for AsyncModbusTcpClient that answers from a recording."""
+
+    def __init__(
+        self,
+        records: list[dict[str, Any]],
+        speed: float | None = None,
+        header: dict[str, Any] | None = None,
+    ) -> None:
+        """Construct the client.
+
+        Args:
+            records: the recorded requests, in recording order
+            speed: playback speed, None plays back as fast as possible
+            header: header of the recording
+
+        """
+        self.header: dict[str, Any] = header or {}
+        self.speed = speed
+        self.connected: bool = False
+        self.stats = ReplayStats()
+        self._answers: dict[tuple[int, int, int], deque[dict[str, Any]]] = {}
+        self._last: dict[tuple[int, int, int], dict[str, Any]] = {}
+        # latest register values by input/holding table, seeded with the first
+        # value of every register in the recording
+        self._registers: dict[bool, dict[int, int]] = {True: {}, False: {}}
+        for record in records:
+            key = (record["fc"], record["addr"], record["count"])
+            self._answers.setdefault(key, deque()).append(record)
+            if record["regs"] is not None:
+                table = self._registers[record["fc"] == FC_READ_INPUT]
+                for offset, value in enumerate(record["regs"]):
+                    table.setdefault(record["addr"] + offset, value)
+
+    @classmethod
+    def from_file(cls, path: Path, speed: float | None = None) -> Self:
+        """Construct a client from a recording file."""
+        header, records = load_recording(path)
+        return cls(records, speed, header)
+
+    async def connect(self) -> bool:
+        """Open the replayed connection."""
+        self.connected = True
+        return True
+
+    def close(self) -> None:
+        """Close the replayed connection."""
+        self.connected = False
+
+    async def read_input_registers(
+        self, address: int, *, count: int = 1, device_id: int = 1
+    ) -> Any:
+        """Answer a read of input registers."""
+        return await self._answer(FC_READ_INPUT, address, count, device_id)
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, device_id: int = 1
+    ) -> Any:
+        """Answer a read of holding registers."""
+        return await self._answer(FC_READ_HOLDING, address, count, device_id)
+
+    async def write_register(
+        self, address: int, value: int, *, device_id: int = 1
+    ) -> Any:
+        """Answer a write of a holding register."""
+        self._registers[False][address] = value
+        return await self._answer(FC_WRITE_SINGLE, address, 1, device_id, [value])
+
+    def _next_record(self, key: tuple[int, int, int]) -> dict[str, Any] | None:
+        """Return the next recorded answer of a request."""
+        answers = self._answers.get(key)
+        if answers:
+            self._last[key] = answers.popleft()
+        return self._last.get(key)
+
+    async def _answer(
+        self,
+        function_code: int,
+        address: int,
+        count: int,
+        device_id: int,
+        written: list[int] | None = None,
+    ) -> Any:
+        """Return the response of a request, raise the recorded exception."""
+        self.stats.requests += 1
+        record = self._next_record((function_code, address, count))
+        if record is not None:
+            self.stats.replayed += 1
+            if self.speed is None:
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(record["lat"] / self.speed)
+            exception = record["exc"]
+            if isinstance(exception, str):
+                raise EXCEPTIONS.get(exception, ModbusException)(exception)
+            if exception is not None:
+                return ExceptionResponse(function_code, exception, device_id)
+            registers = written or record["regs"]
+            if function_code != FC_WRITE_SINGLE:
+                self._registers[function_code == FC_READ_INPUT].update(
+                    zip(range(address, address + count), registers, strict=True)
+                )
+        else:
+            await asyncio.sleep(0)
+            table = self._registers[function_code == FC_READ_INPUT]
+            if written is None and any(
+                reg not in table for reg in range(address, address + count)
+            ):
+                self.stats.missing += 1
+                return ExceptionResponse(function_code, EXC_ILLEGAL_ADDRESS, device_id)
+            self.stats.composed += 1
+            registers = written or [
+                table[reg] for reg in range(address, address + count)
+            ]
+        return RESPONSES[function_code](
+            dev_id=device_id, address=address, count=count, registers=registers
+        )
@@ -0,0 +1,296 @@
+"""Modbus TCP stand-in for a Weishaupt WBB heat pump.
+
+The server speaks just enough Modbus TCP to answer the requests issued by the
+integration (read input/holding registers, write single/multiple registers).
+Addresses are served exactly as they are listed in hpconst.py, e.g. 30001 for
+the outside temperature, so no offset translation is needed on the client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+from dataclasses import dataclass, field
+import logging
+from pathlib import Path
+import random
+import struct
+from typing import Self
+
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+
+_LOGGER = logging.getLogger(__name__)
+
+SAMPLE_FILE = (
+    Path(__file__).resolve().parent.parent
+    / "custom_components"
+    / "weishaupt_modbus"
+    / "auswertung_register.csv"
+)
+
+# Modbus function codes used by the integration
+FC_READ_HOLDING = 0x03
+FC_READ_INPUT = 0x04
+FC_WRITE_SINGLE = 0x06
+FC_WRITE_MULTIPLE = 0x10
+
+# Modbus exception codes
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_ILLEGAL_VALUE = 0x03
+EXC_DEVICE_FAILURE = 0x04
+
+# Raw register value the WBB reports for a temperature sensor that is not installed
+SENSOR_MISSING = 32768
+
+MAX_REGISTERS_PER_REQUEST = 125
+MBAP_HEADER = struct.Struct(">HHHB")
+
+
+@dataclass
+class RegisterMap:
+    """Register values of the simulated heat pump, split by register type."""
+
+    input: dict[int, int] = field(default_factory=dict)
+    holding: dict[int, int] = field(default_factory=dict)
+
+    def table(self, function_code: int) -> dict[int, int]:
+        """Return the register table addressed by a function code."""
+        if function_code == FC_READ_INPUT:
+            return self.input
+        return self.holding
+
+    def set(self, address: int, value: int) -> None:
+        """Set a register, the table is chosen by the address range."""
+        if address >= 40000:
+            self.holding[address] = value & 0xFFFF
+        else:
+            self.input[address] = value & 0xFFFF
+
+    def remove(self, address: int) -> None:
+        """Remove a register so that reading it fails with an illegal address."""
+        self.input.pop(address, None)
+        self.holding.pop(address, None)
+
+
+def load_register_map(column: str | None = "MadOne") -> RegisterMap:
+    """Build the register map from hpconst.DEVICELISTS.
+
+    Args:
+        column: column of auswertung_register.csv used to seed the values
+            (e.g. "MadOne" or "Ostrama"). None leaves all registers at 0.
+
+    Returns:
+        Register map containing every address known to the integration and
+        every address of the sample file.
+
+    """
+    registers = RegisterMap()
+    for device in DEVICELISTS:
+        for item in device:
+            registers.set(item.address, 0)
+
+    if column is None:
+        return registers
+
+    with SAMPLE_FILE.open(encoding="utf-8") as file:
+        for row in csv.DictReader(file, delimiter=";"):
+            try:
+                registers.set(int(row["Register"]), int(row[column]))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return registers
+
+
+@dataclass
+class SimulatorStats:
+    """Traffic counters of the simulator."""
+
+    connections: int = 0
+    requests: int = 0
+    exceptions: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        self.connections = 0
+        self.requests = 0
+        self.exceptions = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+class WbbSimulator:
+    """Local Modbus TCP server that behaves like a WBB.
+
+    Requests on one connection are answered strictly in order, as the heat pump does.
+    """
+
+    def __init__(
+        self,
+        registers: RegisterMap | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        max_count: int = MAX_REGISTERS_PER_REQUEST,
+        holes: tuple[int, ...] | list[int] = (),
+        missing: tuple[int, ...] | list[int] = (),
+        seed: int | None = None,
+    ) -> None:
+        """Construct the simulator.
+
+        Args:
+            registers: register map to serve, defaults to load_register_map()
+            host: interface to listen on
+            port: TCP port, 0 picks a free port
+            latency: delay in seconds before every response
+            jitter: maximum random delay added to the latency
+            max_count: maximum number of registers accepted per read request
+            holes: addresses that answer with "illegal data address"
+            missing: addresses that report a missing sensor (-32768)
+            seed: seed for the jitter random generator
+
+        """
+        self.registers = registers if registers is not None else load_register_map()
+        for address in holes:
+            self.registers.remove(address)
+        for address in missing:
+            self.registers.set(address, SENSOR_MISSING)
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self.max_count = max_count
+        self.stats = SimulatorStats()
+        self._port = port
+        self._random = random.Random(seed)
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    @property
+    def port(self) -> int:
+        """Return the port the simulator listens on."""
+        return self._port
+
+    async def start(self) -> None:
+        """Start listening."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self._port
+        )
+        self._port = self._server.sockets[0].getsockname()[1]
+        _LOGGER.info("WBB simulator listening on %s:%s", self.host, self._port)
+
+    async def stop(self) -> None:
+        """Stop listening and drop all open connections."""
+        if self._server is None:
+            return
+        self._server.close()
+        tasks = list(self._connections.values())
+        self.drop_connections()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    def drop_connections(self) -> None:
+        """Close all client connections without stopping the server."""
+        for writer, task in list(self._connections.items()):
+            writer.close()
+            task.cancel()
+        self._connections.clear()
+
+    async def __aenter__(self) -> Self:
+        """Start the simulator as async context manager."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Stop the simulator when leaving the context."""
+        await self.stop()
+
+    def response_delay(self) -> float:
+        """Return the delay for the next response."""
+        if self.jitter > 0:
+            return self.latency + self._random.uniform(0, self.jitter)
+        return self.latency
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one client connection until it is closed."""
+        self.stats.connections += 1
+        task = asyncio.current_task()
+        if task is not None:
+            self._connections[writer] = task
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                tid, pid, length, unit = MBAP_HEADER.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                self.stats.requests += 1
+                self.stats.bytes_in += len(header) + len(pdu)
+
+                response = await self.handle_pdu(pdu, writer)
+                if response is None:
+                    continue
+
+                delay = self.response_delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                frame = MBAP_HEADER.pack(tid, pid, len(response) + 1, unit) + response
+                writer.write(frame)
+                await writer.drain()
+                self.stats.bytes_out += len(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def handle_pdu(
+        self, pdu: bytes, writer: asyncio.StreamWriter
+    ) -> bytes | None:
+        """Answer one request PDU received on a connection.
+
+        Returning None sends no answer at all. Subclasses use this to inject faults.
+        """
+        return self.process(pdu)
+
+    def process(self, pdu: bytes) -> bytes:
+        """Build the response PDU for a request PDU."""
+        function_code = pdu[0]
+        if function_code in (FC_READ_HOLDING, FC_READ_INPUT):
+            address, count = struct.unpack(">HH", pdu[1:5])
+            if not 1 <= count <= self.max_count:
+                return self.exception(function_code, EXC_ILLEGAL_VALUE)
+            table = self.registers.table(function_code)
+            try:
+                values = [table[address + i] for i in range(count)]
+            except KeyError:
+                return self.exception(function_code, EXC_ILLEGAL_ADDRESS)
+            return struct.pack(f">BB{count}H", function_code, 2 * count, *values)
+
+        if function_code == FC_WRITE_SINGLE:
+            address, value = struct.unpack(">HH", pdu[1:5])
+            if address not in self.registers.holding:
+                return self.exception(function_code, EXC_ILLEGAL_ADDRESS)
+            self.registers.holding[address] = value
+            return pdu[:5]
+
+        if function_code == FC_WRITE_MULTIPLE:
+            address, count = struct.unpack(">HH", pdu[1:5])
+            values = struct.unpack(f">{count}H", pdu[6 : 6 + 2 * count])
+            if any(address + i not in self.registers.holding for i in range(count)):
+                return self.exception(function_code, EXC_ILLEGAL_ADDRESS)
+            for i, value in enumerate(values):
+                self.registers.holding[address + i] = value
+            return pdu[:5]
+
+        return self.exception(function_code, EXC_ILLEGAL_FUNCTION)
+
+    def exception(self, function_code: int, code: int) -> bytes:
+        """Build an exception response PDU."""
+        self.stats.exceptions += 1
+        return struct.pack(">BB", function_code | 0x80, code)
@@ -0,0 +1,65 @@
+"""Shared fixtures for the test suite."""
+
+from collections.abc import AsyncGenerator, Callable
+import copy
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.weishaupt_modbus.const import CONF, CONST
+from custom_components.weishaupt_modbus.hpconst import DEVICELISTS
+from custom_components.weishaupt_modbus.items import ModbusItem
+from simulator import WbbSimulator
+
+
+@pytest.fixture
+async def wbb_simulator(socket_enabled: None) -> AsyncGenerator[WbbSimulator]:
+    """Start a local WBB simulator on a free port."""
+    simulator = WbbSimulator()
+    await simulator.start()
+    yield simulator
+    await simulator.stop()
+
+
+@pytest.fixture
+def make_config_entry() -> Callable[..., MagicMock]:
+    """Return a factory of config entries without heating circuits 2 to 5."""
+
+    def factory(port: int = 502, data: dict[str, Any] | None = None) -> MagicMock:
+        entry = MagicMock()
+        entry.data = {
+            CONF.HOST: "127.0.0.1",
+            CONF.PORT: port,
+            CONF.PREFIX: CONST.DEF_PREFIX,
+            CONF.DEVICE_POSTFIX: "",
+            CONF.NAME_DEVICE_PREFIX: False,
+            CONF.NAME_TOPIC_PREFIX: False,
+            CONF.HK2: False,
+            CONF.HK3: False,
+            CONF.HK4: False,
+            CONF.HK5: False,
+            **(data or {}),
+        }
+        entry.options = {}
+        return entry
+
+    return factory
+
+
+@pytest.fixture
+def config_entry(
+    wbb_simulator: WbbSimulator, make_config_entry: Callable[..., MagicMock]
+) -> MagicMock:
+    """Create a config entry for the simulator."""
+    return make_config_entry(wbb_simulator.port)
+
+
+@pytest.fixture
+def all_items() -> Callable[[], list[ModbusItem]]:
+    """Return a factory of copies of all items of the heat pump."""
+
+    def factory() -> list[ModbusItem]:
+        return [copy.deepcopy(item) for device in DEVICELISTS for item in device]
+
+    return factory
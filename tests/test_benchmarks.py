@@ -0,0 +1,77 @@
+"""Smoke tests for the benchmark scripts."""
+
+from benchmarks import hot_paths, poll_cycle, regression, startup
+from custom_components.weishaupt_modbus.const import READSTRATEGIES
+
+
+async def test_hot_paths(hass, tmp_path):
+    """Test all hot path cases run and report their numbers."""
+    cases = await hot_paths.build_cases(hass, str(tmp_path))
+
+    for case in cases:
+        assert case.args, case.name
+        assert all(sample > 0 for sample in hot_paths.time_case(case, 50, 1))
+        assert hot_paths.allocations(case, 10)["alloc_bytes_per_op"] >= 0
+
+
+async def test_startup(hass, tmp_path):
+    """Test the power map setup is measured."""
+    result = await startup.measure_powermap(hass, str(tmp_path), 3)
+
+    assert result["initialize_ms"] > 0
+    assert result["build_ms"]["min"] > 0
+
+
+async def test_poll_cycle(hass, socket_enabled):
+    """Test a cycle against the simulator is measured."""
+    result = await poll_cycle.run_profile(hass, "lan", READSTRATEGIES.BLOCK, 1)
+
+    assert result["requests_per_cycle"] > 0
+
+
+class TestRegressionGate:
+    """Test the comparison against a baseline."""
+
+    def test_within_tolerance(self):
+        """Test small changes and improvements pass."""
+        comparisons = regression.compare(
+            {"a.cycle_ms": 100.0, "b.cycle_ms": 100.0},
+            {"a.cycle_ms": 110.0, "b.cycle_ms": 50.0},
+        )
+
+        assert not any(comp.regressed for comp in comparisons)
+
+    def test_regression(self):
+        """Test a slower metric fails and is marked in the report."""
+        comparisons = regression.compare(
+            {"a.cycle_ms": 100.0, "a.requests_per_cycle": 24.0},
+            {"a.cycle_ms": 200.0, "a.requests_per_cycle": 25.0},
+        )
+
+        assert [comp.name for comp in comparisons if comp.regressed] == [
+            "a.cycle_ms",
+            "a.requests_per_cycle",
+        ]
+        report = regression.format_report(comparisons)
+        assert "! a.cycle_ms" in report
+        assert "+100.0%" in report
+
+    def test_custom_tolerance(self):
+        """Test tolerances given by pattern win over the defaults."""
+        tolerances = regression.parse_tolerances(["a.*=1.5"])
+
+        comparisons = regression.compare(
+            {"a.cycle_ms": 100.0}, {"a.cycle_ms": 200.0}, tolerances
+        )
+
+        assert comparisons[0].tolerance == 1.5
+        assert not comparisons[0].regressed
+
+    def test_missing_metric(self):
+        """Test a metric missing in the baseline fails, a removed one is reported."""
+        comparisons = regression.compare({"old.cycle_ms": 1.0}, {"new.cycle_ms": 1.0})
+
+        assert [comp.name for comp in comparisons if comp.regressed] == ["new.cycle_ms"]
+        report = regression.format_report(comparisons, only_changes=True)
+        assert "! new.cycle_ms" in report
+        assert "? old.cycle_ms" in report
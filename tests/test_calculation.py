@@ -0,0 +1,312 @@
+"""Tests for the calculation expressions of calculated sensors."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.weishaupt_modbus.calculation import (
+    CALC_FORMULA,
+    CALC_NAME,
+    CALC_PRECISION,
+    CALC_UNIT,
+    CalcGraph,
+    Calculation,
+    CalculationError,
+    bind_inputs,
+    user_calc_items,
+)
+from custom_components.weishaupt_modbus.const import (
+    CONF,
+    CONST,
+    DEVICES,
+    FORMATS,
+    TYPES,
+)
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.readplan import register_type
+from homeassistant.data_entry_flow import FlowResultType
+
+
+class FakePowerMap:
+    """Power map that returns the sum of its arguments."""
+
+    def map(self, x, y):
+        """Return the power for outside and flow temperature."""
+        return x + y
+
+
+class TestCalculation:
+    """Test parsing and evaluating calculations."""
+
+    def test_variables(self):
+        """Test the variables are collected in a fixed order."""
+        calculation = Calculation("(val_0 / 100) * power.map(val_1, val_2)")
+
+        assert calculation.variables == ("power", "val_0", "val_1", "val_2")
+        assert calculation(FakePowerMap(), 50, 2, 3) == 2.5
+
+    @pytest.mark.parametrize(
+        ("source", "values", "expected"),
+        [
+            ("val_0 - val_1/10", (25.0, 200), 5.0),
+            ("-val_0 // 4 + 10 % 3", (9,), -2),
+            ("2 ** val_0", (10,), 1024.0),
+            ("round(max(val_0, val_1, 0.5) / 3, 1)", (1, 2), 0.7),
+            ("abs(min(val_0, -1))", (3,), 1),
+        ],
+    )
+    def test_evaluate(self, source, values, expected):
+        """Test the supported operations give the same results as Python."""
+        assert Calculation(source)(*values) == expected
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "__import__('os').system('true')",
+            "val_0.__class__",
+            "power.data",
+            "open('x')",
+            "val_9 + 1",
+            "x",
+            "[val_0]",
+            "val_0 if val_1 else 0",
+            "'a' * 3",
+            "True + 1",
+            "val_0 +",
+        ],
+    )
+    def test_rejected(self, source):
+        """Test everything beyond arithmetic on the variables is rejected."""
+        with pytest.raises(CalculationError):
+            Calculation(source)
+
+    def test_overflow(self):
+        """Test a huge power overflows instead of growing without bounds."""
+        with pytest.raises(OverflowError):
+            Calculation("10 ** 10 ** 10")()
+
+
+def make_item(key, params, mtype=TYPES.SENSOR_CALC):
+    """Create an item with params."""
+    return ModbusItem(
+        address=30001,
+        name=key,
+        mformat=FORMATS.NUMBER,
+        mtype=mtype,
+        device=DEVICES.WP,
+        translation_key=key,
+        params=params,
+    )
+
+
+class TestCalcGraph:
+    """Test evaluating calculated items in dependency order."""
+
+    def make_graph(self, items):
+        """Build a graph over items."""
+        by_key = {item.translation_key: item for item in items}
+        return CalcGraph(
+            [item for item in items if item.type == TYPES.SENSOR_CALC],
+            by_key.get,
+            FakePowerMap,
+        )
+
+    def test_order(self):
+        """Test a calculation can use the result of another calculation."""
+        source = make_item("source", None, TYPES.SENSOR)
+        source.state = 4
+        # defined before the item it depends on
+        double = make_item("double", {"val_1": "sum", "calculation": "val_1 * 2"})
+        total = make_item("sum", {"val_1": "source", "calculation": "val_0 + val_1"})
+        total.state = 1
+        graph = self.make_graph([source, double, total])
+
+        assert graph.evaluate() == 2
+        assert graph.keys == ["sum", "double"]
+        assert graph.values == {"sum": 5, "double": 10}
+
+    def test_changed_inputs(self):
+        """Test only items with changed inputs are recomputed."""
+        first = make_item("first", {"calculation": "val_0 * 2"})
+        second = make_item("second", {"calculation": "val_0 / 2"})
+        first.state = second.state = 8
+        graph = self.make_graph([first, second])
+        graph.evaluate()
+
+        second.state = 4
+
+        assert graph.evaluate() == 1
+        assert graph.values == {"first": 16, "second": 2}
+
+    def test_missing_input(self):
+        """Test missing inputs and divisions by zero give no value."""
+        ratio = make_item("ratio", {"val_1": "other", "calculation": "val_0 / val_1"})
+        ratio.state = 3
+        other = make_item("other", None, TYPES.SENSOR)
+        graph = self.make_graph([ratio, other])
+
+        graph.evaluate()
+        assert graph.values == {"ratio": None}
+        other.state = 0
+        graph.evaluate()
+        assert graph.values == {"ratio": None}
+
+    def test_learned(self):
+        """Test the learned power map is used for learned.map."""
+        item = make_item(
+            "power", {"calculation": "learned.map(val_0, 1) - power.map(val_0, 1)"}
+        )
+        item.state = 2
+        learned = MagicMock()
+        learned.map.return_value = 10
+        graph = CalcGraph([item], {}.get, FakePowerMap, lambda: learned)
+
+        graph.evaluate()
+
+        assert graph.values == {"power": 7}
+        learned.map.assert_called_once_with(2, 1)
+
+    def test_invalidate(self):
+        """Test items using a map that changed in place are recomputed."""
+        item = make_item("power", {"calculation": "learned.map(val_0, 1)"})
+        item.state = 2
+        learned = MagicMock()
+        learned.map.return_value = 10
+        graph = CalcGraph([item], {}.get, FakePowerMap, lambda: learned)
+        graph.evaluate()
+
+        learned.map.return_value = 12
+        assert graph.evaluate() == 0
+        graph.invalidate("learned")
+
+        assert graph.evaluate() == 1
+        assert graph.values == {"power": 12}
+
+    def test_cycle(self):
+        """Test items that depend on each other are left out."""
+        first = make_item("first", {"val_1": "second", "calculation": "val_1"})
+        second = make_item("second", {"val_1": "first", "calculation": "val_1"})
+        third = make_item("third", {"calculation": "val_0 + 1"})
+        third.state = 1
+        invalid = make_item("invalid", {"calculation": "val_0.real"})
+
+        graph = self.make_graph([first, second, third, invalid])
+        graph.evaluate()
+
+        assert graph.values == {"third": 2}
+
+
+async def test_coordinator(hass, make_config_entry, all_items):
+    """Test the coordinator computes the calculated items of hpconst."""
+    config_entry = make_config_entry()
+    coordinator = MyCoordinator(hass, MagicMock(), all_items(), config_entry)
+    config_entry.runtime_data.powermap = FakePowerMap()
+    coordinator.get_item("spreizung").state = 350
+    coordinator.get_item("rl_temp").state = 300
+    coordinator.get_item("tagesarbeitszahl_heute").state = 10
+    coordinator.get_item("el_energie_heute").state = 0
+    coordinator.get_item("waermeleistung").state = 50
+    coordinator.get_item("luftansautgemp").state = 20
+    coordinator.get_item("vl_temp").state = 30
+
+    await coordinator.evaluate_calculations()
+
+    assert coordinator.calc_values["spreizung"] == 5.0
+    assert coordinator.calc_values["tagesarbeitszahl_heute"] is None
+    assert coordinator.calc_values["waermeleistung"] == 25
+
+
+class TestUserCalcSensors:
+    """Test calculated sensors defined in the options."""
+
+    def test_bind_inputs(self):
+        """Test item keys of a formula are replaced by variables."""
+        calculation, inputs = bind_inputs(
+            "round(heiz_energie_heute / el_energie_heute, 1)",
+            {"el_energie_heute", "heiz_energie_heute", "vl_temp"},
+        )
+
+        assert calculation == "round(val_2 / val_1, 1)"
+        assert inputs == {"val_1": "el_energie_heute", "val_2": "heiz_energie_heute"}
+
+    @pytest.mark.parametrize("formula", ["vl_temp - unknown", "vl_temp.real", "("])
+    def test_bind_invalid(self, formula):
+        """Test unknown items and invalid expressions are rejected."""
+        with pytest.raises(CalculationError):
+            bind_inputs(formula, {"vl_temp"})
+
+    def test_items(self):
+        """Test user sensors are computed from the displayed values of other items."""
+        flow = make_item("vl_temp", {"divider": 10}, TYPES.SENSOR)
+        ret = make_item("rl_temp", {"divider": 10}, TYPES.SENSOR)
+        flow.state, ret.state = 352, 301
+        items = user_calc_items(
+            [
+                {
+                    CALC_NAME: "Spreizung VL/RL",
+                    CALC_FORMULA: "vl_temp - rl_temp",
+                    CALC_UNIT: "°C",
+                    CALC_PRECISION: 1,
+                },
+                {CALC_NAME: "Broken", CALC_FORMULA: "removed_item * 2"},
+                # same key as the first one
+                {CALC_NAME: "spreizung VL-RL", CALC_FORMULA: "vl_temp"},
+            ],
+            {"vl_temp", "rl_temp"},
+        )
+        graph = CalcGraph(items, {"vl_temp": flow, "rl_temp": ret}.get, FakePowerMap)
+
+        graph.evaluate()
+
+        assert [item.name for item in items] == ["Spreizung VL/RL"]
+        assert items[0].type == TYPES.SENSOR_USER
+        assert register_type(items[0]) is None
+        assert graph.values == {"user_spreizung_vl_rl": 5.1}
+
+
+async def test_options_flow(hass, enable_custom_integrations):
+    """Test calculated sensors are added and removed in the options flow."""
+    entry = MockConfigEntry(domain=CONST.DOMAIN, data={}, options={})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    assert result["type"] is FlowResultType.MENU
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "add_calc_sensor"}
+    )
+    sensor = {
+        CALC_NAME: "COP heute",
+        CALC_FORMULA: "heiz_energie_heute / el_energie_heute",
+        CALC_UNIT: "",
+        CALC_PRECISION: 2,
+    }
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {**sensor, CALC_FORMULA: "heiz_energie_heute / x"}
+    )
+    assert result["errors"] == {CALC_FORMULA: "invalid_formula"}
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], sensor
+    )
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert entry.options[CONF.CALC_SENSORS] == [sensor]
+
+    # a name that only differs in case would get the same key
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "add_calc_sensor"}
+    )
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {**sensor, CALC_NAME: "cop heute"}
+    )
+    assert result["errors"] == {CALC_NAME: "name_exists"}
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "remove_calc_sensor"}
+    )
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF.CALC_SENSORS: ["COP heute"]}
+    )
+    assert entry.options[CONF.CALC_SENSORS] == []
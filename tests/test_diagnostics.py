@@ -0,0 +1,49 @@
+"""Tests for the diagnostics download."""
+
+import copy
+
+from custom_components.weishaupt_modbus.const import CONF, READSTRATEGIES
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.weishaupt_modbus.hpconst import MODBUS_SYS_ITEMS
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from homeassistant.components.diagnostics import REDACTED
+
+
+async def test_diagnostics(hass, wbb_simulator, make_config_entry):
+    """Test the dump after a block read with one missing register."""
+    wbb_simulator.registers.remove(30002)
+    config_entry = make_config_entry(
+        wbb_simulator.port,
+        {CONF.USERNAME: "user", CONF.PASSWORD: "secret", CONF.WEBIF_TOKEN: "token"},
+    )
+    api = ModbusAPI(config_entry)
+    coordinator = MyCoordinator(
+        hass, api, copy.deepcopy(MODBUS_SYS_ITEMS), config_entry
+    )
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+    config_entry.runtime_data.coordinator = coordinator
+    assert await api.connect(startup=True)
+    await coordinator.fetch_data()
+    await coordinator.fetch_data()
+    api.close()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+
+    entry_data = diagnostics["config_entry"]
+    assert entry_data[CONF.USERNAME] == REDACTED
+    assert entry_data[CONF.PASSWORD] == REDACTED
+    assert entry_data[CONF.WEBIF_TOKEN] == REDACTED
+    assert entry_data[CONF.HOST] == "127.0.0.1"
+
+    assert diagnostics["invalid_registers"] == [30002]
+    assert diagnostics["availability"]["aussentemp"]["available"] is True
+    assert [
+        (block["address"], block["count"]) for block in diagnostics["read_plan"]
+    ] == [(40001, 2), (30001, 1), (30003, 4)]
+    assert diagnostics["cycles"]["cycles"] == 2
+    assert diagnostics["connection"]["backoff_state"] == "reconnecting"
+    assert diagnostics["connection"]["connection_history"][0]["event"] == "connected"
+    assert diagnostics["raw_registers"][30001] == 90
@@ -0,0 +1,165 @@
+"""Fault injection tests against the WBB simulator."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+from pymodbus import ModbusException
+from pymodbus.client import AsyncModbusTcpClient
+import pytest
+
+from custom_components.weishaupt_modbus.const import CONF, FORMATS, TYPES
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI, ModbusObject
+from simulator import FAULTS, SCENARIOS, FaultRule, FaultySimulator
+
+
+@pytest.fixture
+async def faulty_simulator(socket_enabled):
+    """Start a simulator without rules, tests add the rules they need."""
+    simulator = FaultySimulator(fault_seed=1)
+    await simulator.start()
+    yield simulator
+    await simulator.stop()
+
+
+@pytest.fixture
+async def modbus_api(faulty_simulator):
+    """Create a connected ModbusAPI for the simulator."""
+    config_entry = MagicMock()
+    config_entry.data = {CONF.HOST: "127.0.0.1", CONF.PORT: faulty_simulator.port}
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+    yield api
+    api.close()
+
+
+@pytest.fixture
+def temperature_item():
+    """Create the outside temperature item."""
+    return ModbusItem(
+        address=30001,
+        name="Aussentemperatur",
+        mformat=FORMATS.TEMPERATURE,
+        mtype=TYPES.SENSOR,
+        device="dev_system",
+        translation_key="aussentemp",
+    )
+
+
+class TestFaultSequence:
+    """Test the fault decisions themselves."""
+
+    def test_replayable_by_seed(self):
+        """Test the same seed gives the same faults."""
+        runs = []
+        for _ in range(2):
+            simulator = FaultySimulator(rules=SCENARIOS["flaky"], fault_seed=42)
+            runs.append([simulator.next_fault() for _ in range(500)])
+
+        assert runs[0] == runs[1]
+        assert any(rule is not None for rule in runs[0])
+
+    def test_different_seed(self):
+        """Test another seed gives other faults."""
+        first = FaultySimulator(rules=SCENARIOS["flaky"], fault_seed=1)
+        second = FaultySimulator(rules=SCENARIOS["flaky"], fault_seed=2)
+
+        assert [first.next_fault() for _ in range(500)] != [
+            second.next_fault() for _ in range(500)
+        ]
+
+    def test_at_requests(self):
+        """Test faults scheduled for fixed request numbers."""
+        simulator = FaultySimulator(rules=[FaultRule(FAULTS.DROP, at_requests=(3,))])
+
+        faults = [simulator.next_fault() for _ in range(5)]
+
+        assert [rule is not None for rule in faults] == [
+            False,
+            False,
+            True,
+            False,
+            False,
+        ]
+
+
+class TestModbusUnderFaults:
+    """Test how ModbusAPI and ModbusObject cope with faults."""
+
+    async def test_exception_code(self, faulty_simulator, modbus_api, temperature_item):
+        """Test a device failure answer yields no value but keeps the item."""
+        faulty_simulator.rules = [FaultRule(FAULTS.EXCEPTION, at_requests=(1,))]
+        mbo = ModbusObject(modbus_api, temperature_item)
+
+        assert await mbo.get_value() is None
+        assert temperature_item.is_invalid is False
+        assert await mbo.get_value() == 90
+
+    async def test_illegal_address_marks_invalid(
+        self, faulty_simulator, modbus_api, temperature_item
+    ):
+        """Test a spurious illegal address answer disables the item."""
+        faulty_simulator.rules = [
+            FaultRule(FAULTS.EXCEPTION, at_requests=(1,), exception_codes=(2,))
+        ]
+        mbo = ModbusObject(modbus_api, temperature_item)
+
+        assert await mbo.get_value() is None
+        assert temperature_item.is_invalid is True
+
+    async def test_dropped_connection(
+        self, faulty_simulator, modbus_api, temperature_item
+    ):
+        """Test a dropped connection is healed by the client retry."""
+        faulty_simulator.rules = [FaultRule(FAULTS.DROP, at_requests=(1,))]
+        mbo = ModbusObject(modbus_api, temperature_item)
+
+        assert await mbo.get_value() == 90
+        assert faulty_simulator.stats.connections == 2
+        assert temperature_item.is_invalid is False
+
+    async def test_reboot_window(self, faulty_simulator, modbus_api, temperature_item):
+        """Test connection failures during a reboot and recovery afterwards."""
+        reboot = asyncio.create_task(faulty_simulator.reboot(0.3))
+        await asyncio.sleep(0.05)
+        modbus_api.close()
+
+        assert await modbus_api.connect() is False
+        assert modbus_api._failed_reconnect_counter == 1
+
+        await reboot
+        assert await modbus_api.connect() is True
+        assert modbus_api._failed_reconnect_counter == 0
+        assert await ModbusObject(modbus_api, temperature_item).get_value() == 90
+
+
+class TestTimeouts:
+    """Test faults that only show as timeouts on the client side."""
+
+    async def test_delay_past_timeout(self, faulty_simulator):
+        """Test a delayed answer runs into the client timeout."""
+        faulty_simulator.rules = [FaultRule(FAULTS.DELAY, at_requests=(1,), delay=0.5)]
+        client = AsyncModbusTcpClient(
+            "127.0.0.1", port=faulty_simulator.port, timeout=0.1, retries=0
+        )
+        await client.connect()
+
+        with pytest.raises(ModbusException):
+            await client.read_input_registers(30001, device_id=1)
+        client.close()
+
+        assert faulty_simulator.events[0].kind == FAULTS.DELAY
+
+    async def test_half_open(self, faulty_simulator):
+        """Test a half open socket stays connected but never answers."""
+        faulty_simulator.rules = [FaultRule(FAULTS.HALF_OPEN, at_requests=(2,))]
+        client = AsyncModbusTcpClient(
+            "127.0.0.1", port=faulty_simulator.port, timeout=0.1, retries=0
+        )
+        await client.connect()
+
+        rr = await client.read_input_registers(30001, device_id=1)
+        assert rr.registers == [90]
+        with pytest.raises(ModbusException):
+            await client.read_input_registers(30001, device_id=1)
+        client.close()
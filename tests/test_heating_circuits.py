@@ -0,0 +1,94 @@
+"""Tests for the detection of the installed heating circuits."""
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.weishaupt_modbus import config_flow
+from custom_components.weishaupt_modbus.const import CONF, CONST, DEVICES
+from custom_components.weishaupt_modbus.coordinator import (
+    MyCoordinator,
+    detect_heating_circuits,
+)
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+
+
+def install_circuits(wbb_simulator):
+    """Install circuit 2, switch off circuit 3 and remove circuits 4 and 5."""
+    wbb_simulator.registers.set(41201, 1)
+    wbb_simulator.registers.set(41301, 0)
+    wbb_simulator.registers.remove(41401)
+    wbb_simulator.registers.remove(41501)
+
+
+async def test_detect(wbb_simulator, config_entry):
+    """Test circuits are installed when their configuration is not off."""
+    install_circuits(wbb_simulator)
+    api = ModbusAPI(config_entry)
+
+    circuits = await detect_heating_circuits(api)
+    api.close()
+
+    assert circuits == {
+        CONF.HK2: True,
+        CONF.HK3: False,
+        CONF.HK4: False,
+        CONF.HK5: False,
+    }
+
+
+async def test_prune_absent(hass, wbb_simulator, make_config_entry, all_items):
+    """Test items of circuits that are configured but absent are pruned."""
+    install_circuits(wbb_simulator)
+    config_entry = make_config_entry(
+        wbb_simulator.port, {CONF.HK2: True, CONF.HK4: True}
+    )
+    items = all_items()
+    api = ModbusAPI(config_entry)
+    coordinator = MyCoordinator(hass, api, items, config_entry)
+
+    await coordinator.async_detect_heating_circuits()
+    api.close()
+
+    pruned = {item.device for item in items if item.is_invalid}
+    assert pruned == {DEVICES.HZ4}
+
+
+async def test_probe(wbb_simulator):
+    """Test the config flow probes the heat pump given by host and port."""
+    install_circuits(wbb_simulator)
+
+    circuits = await config_flow.probe_heating_circuits(
+        {CONF.HOST: "127.0.0.1", CONF.PORT: wbb_simulator.port}
+    )
+
+    assert circuits[CONF.HK2] is True
+    assert circuits[CONF.HK3] is False
+
+
+async def test_reconfigure_probe_failed(
+    hass, enable_custom_integrations, make_config_entry, monkeypatch
+):
+    """Test reconfigure shows the configured circuits when the probe fails."""
+
+    async def fail(data):
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(config_flow, "probe_heating_circuits", fail)
+    data = make_config_entry(
+        data={
+            CONF.HK3: True,
+            CONF.KENNFELD_FILE: CONST.DEF_KENNFELDFILE,
+            CONF.CB_WEBIF: False,
+            CONF.USERNAME: "",
+            CONF.PASSWORD: "",
+            CONF.WEBIF_TOKEN: "",
+        }
+    ).data
+    entry = MockConfigEntry(domain=CONST.DOMAIN, data=data)
+    entry.add_to_hass(hass)
+
+    result = await entry.start_reconfigure_flow(hass)
+
+    assert result["step_id"] == "reconfigure"
+    defaults = {str(key): key.default() for key in result["data_schema"].schema}
+    assert defaults[CONF.HK2] is False
+    assert defaults[CONF.HK3] is True
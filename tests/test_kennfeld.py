@@ -0,0 +1,325 @@
+"""Tests for the power map of the heat pump."""
+
+import asyncio
+import json
+from pathlib import Path
+import shutil
+
+import numpy as np
+import pytest
+
+from custom_components.weishaupt_modbus import kennfeld
+from custom_components.weishaupt_modbus.const import CONF, CONST
+from custom_components.weishaupt_modbus.kennfeld import (
+    POWERMAPS,
+    PowerMap,
+    async_acquire_powermap,
+    build_power_grid,
+    natural_cubic_spline,
+    release_powermap,
+)
+
+OUTSIDE = np.linspace(-30, 40, 71)
+# a kennfeld with four flow temperatures
+CURVES = {
+    "known_x": [-20, -10, 0, 10, 20],
+    "known_t": [35, 45, 55, 65],
+    "known_y": [
+        [3000, 5000, 7000, 8500, 9000],
+        [3000, 4800, 6600, 7800, 8000],
+        [3000, 4500, 6000, 6900, 7000],
+        [3000, 4100, 5200, 5800, 6000],
+    ],
+}
+
+
+class TestBuildPowerGrid:
+    """Test building the grid from the known curves."""
+
+    def test_spline(self):
+        """Test the known curves are met and the rows in between interpolated."""
+        grid = build_power_grid(
+            PowerMap.known_x, PowerMap.known_y, PowerMap.known_t, 21, OUTSIDE
+        )
+        known = np.isin(OUTSIDE, PowerMap.known_x)
+
+        assert grid.shape == (21, 71)
+        np.testing.assert_allclose(grid[0, known], PowerMap.known_y[0])
+        np.testing.assert_allclose(grid[20, known], PowerMap.known_y[1])
+        np.testing.assert_allclose(grid[10], (grid[0] + grid[20]) / 2)
+
+    @pytest.mark.parametrize(
+        "kennfeld_file",
+        sorted(Path(kennfeld.__file__).parent.glob("*kennfeld.json")),
+        ids=lambda path: path.name,
+    )
+    def test_scipy(self, kennfeld_file):
+        """Test the spline is the natural cubic spline of SciPy, also outside."""
+        interpolate = pytest.importorskip("scipy.interpolate")
+        data = json.loads(kennfeld_file.read_text(encoding="utf-8"))
+
+        expected = interpolate.CubicSpline(
+            data["known_x"], data["known_y"], axis=1, bc_type="natural"
+        )(OUTSIDE)
+
+        np.testing.assert_allclose(
+            natural_cubic_spline(data["known_x"], data["known_y"], OUTSIDE),
+            expected,
+            rtol=1e-9,
+        )
+
+    def test_short(self):
+        """Test the smallest spline, through three points."""
+        values = natural_cubic_spline([0, 1, 2], [0, 1, 0], [0, 0.5, 1, 2])
+
+        np.testing.assert_allclose(values, [0, 0.6875, 1, 0])
+
+    def test_curves(self):
+        """Test any number of curves give a smooth surface through all of them."""
+        interpolate = pytest.importorskip("scipy.interpolate")
+        flow = np.linspace(35, 65, 31)
+
+        grid = build_power_grid(
+            CURVES["known_x"], CURVES["known_y"], CURVES["known_t"], 31, OUTSIDE
+        )
+
+        on_curves = np.isin(OUTSIDE, CURVES["known_x"])
+        np.testing.assert_allclose(grid[::10, on_curves], CURVES["known_y"])
+        # the bicubic spline surface, evaluated along both axes one after another
+        columns = interpolate.CubicSpline(
+            CURVES["known_x"], CURVES["known_y"], axis=1, bc_type="natural"
+        )(OUTSIDE)
+        expected = interpolate.CubicSpline(
+            CURVES["known_t"], columns, axis=0, bc_type="natural"
+        )(flow)
+        np.testing.assert_allclose(grid[:, on_curves], expected[:, on_curves])
+
+    def test_clamped(self):
+        """Test outside temperatures beyond the curves keep their end values."""
+        grid = build_power_grid(
+            CURVES["known_x"], CURVES["known_y"], CURVES["known_t"], 4, OUTSIDE
+        )
+
+        np.testing.assert_allclose(grid[:, OUTSIDE <= -20], 3000)
+        np.testing.assert_allclose(
+            grid[:, OUTSIDE >= 20].T, [[9000, 8000, 7000, 6000]] * 21
+        )
+
+    def test_invalid(self):
+        """Test curves that don't match the temperatures are rejected."""
+        with pytest.raises(ValueError, match="4 power curves of 5 values"):
+            build_power_grid(
+                CURVES["known_x"], CURVES["known_y"][:3], CURVES["known_t"], 4, OUTSIDE
+            )
+
+
+@pytest.fixture
+def make_powermap(hass, tmp_path, make_config_entry):
+    """Return a factory of power maps in a config directory below tmp_path."""
+
+    def factory(
+        kennfeld_file=CONST.DEF_KENNFELDFILE, resolution=CONST.POWERMAP_RESOLUTION
+    ):
+        component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+        if not component_dir.exists():
+            component_dir.mkdir(parents=True)
+            (tmp_path / "www" / "local").mkdir(parents=True)
+            shutil.copy(
+                Path(kennfeld.__file__).with_name(CONST.DEF_KENNFELDFILE),
+                component_dir,
+            )
+        hass.config.config_dir = str(tmp_path)
+        config_entry = make_config_entry(data={CONF.KENNFELD_FILE: kennfeld_file})
+        return PowerMap(config_entry, hass, resolution)
+
+    return factory
+
+
+@pytest.fixture
+async def powermap(make_powermap, monkeypatch):
+    """Return the default power map, without plotting it."""
+    monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+    powermap = make_powermap()
+    await powermap.initialize()
+    return powermap
+
+
+class TestMap:
+    """Test looking up the power of temperatures."""
+
+    def test_grid_points(self, powermap):
+        """Test temperatures on the grid give the fitted power."""
+        grid = build_power_grid(
+            PowerMap.known_x, PowerMap.known_y, PowerMap.known_t, 41, OUTSIDE
+        )
+
+        assert powermap.map(-300, 350) == pytest.approx(grid[0, 0])
+        assert powermap.map(0, 450) == pytest.approx(grid[20, 30])
+        assert powermap.map(400, 550) == pytest.approx(grid[40, 70])
+
+    def test_bilinear(self, powermap):
+        """Test the power between grid points is interpolated on both axes."""
+        # the corners of the grid cell around -9.9 °C and 40.2 °C
+        corners = [powermap.map(x, y) for y in (400, 405) for x in (-100, -95)]
+        low = corners[0] + 0.2 * (corners[1] - corners[0])
+        high = corners[2] + 0.2 * (corners[3] - corners[2])
+
+        assert powermap.map(-99, 402) == pytest.approx(low + 0.4 * (high - low))
+        # no steps between neighbouring temperatures
+        assert powermap.map(-99, 402) != powermap.map(-98, 402)
+
+    def test_clamped(self, powermap):
+        """Test temperatures out of the grid are clamped."""
+        assert powermap.map(-500, 100) == powermap.map(-300, 350)
+        assert powermap.map(600, 900) == powermap.map(400, 550)
+
+    def test_map_many(self, powermap):
+        """Test the batched lookup gives the same results as single lookups."""
+        rng = np.random.default_rng(1)
+        x = rng.uniform(-400, 500, 200)
+        y = rng.uniform(200, 700, 200)
+
+        expected = [powermap.map(xi, yi) for xi, yi in zip(x, y, strict=True)]
+
+        np.testing.assert_allclose(powermap.map_many(x, y), expected, rtol=1e-6)
+
+    async def test_validate(self, make_powermap, tmp_path, monkeypatch, caplog):
+        """Test the map is checked against the curves of the kennfeld file."""
+        monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+        make_powermap()
+        component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+        (component_dir / "curves_kennfeld.json").write_text(
+            json.dumps(CURVES), encoding="utf-8"
+        )
+        # power at 50 °C outside can't be shown by a map that ends at 40 °C
+        beyond = {**CURVES, "known_x": [-20, -10, 0, 10, 50]}
+        (component_dir / "beyond_kennfeld.json").write_text(
+            json.dumps(beyond), encoding="utf-8"
+        )
+
+        powermap = make_powermap("curves_kennfeld.json")
+        await powermap.initialize()
+        assert "deviates" not in caplog.text
+        np.testing.assert_allclose(powermap.validate(), 0, atol=1e-3)
+        assert powermap.map(-50, 600) == pytest.approx(
+            (powermap.map(-50, 550) + powermap.map(-50, 650)) / 2, rel=0.01
+        )
+
+        powermap = make_powermap("beyond_kennfeld.json")
+        await powermap.initialize()
+        assert "deviates" in caplog.text
+        assert np.abs(powermap.validate()).max() > 100
+
+
+class TestCache:
+    """Test the grid and the plot are reused while the kennfeld is unchanged."""
+
+    async def test_grid(self, make_powermap, tmp_path, monkeypatch):
+        """Test the cached grid is loaded instead of built."""
+        monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+        first = make_powermap()
+        await first.initialize()
+        component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+        cache_files = list(component_dir.glob("*.npy"))
+
+        def fail(*args):
+            raise AssertionError("grid is built again")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(kennfeld, "build_power_grid", fail)
+            second = make_powermap()
+            await second.initialize()
+
+        assert len(cache_files) == 1
+        assert second.map(-55, 412) == first.map(-55, 412)
+
+    async def test_changed(self, make_powermap, tmp_path, monkeypatch):
+        """Test a changed kennfeld or resolution builds and caches a new grid."""
+        monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+        await make_powermap().initialize()
+        component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+        kennfeld_file = component_dir / CONST.DEF_KENNFELDFILE
+        old_cache = next(component_dir.glob("*.npy"))
+        # the cache of another kennfeld with the same dotted prefix
+        other_cache = component_dir / (
+            f"{kennfeld_file.stem}.10kw.{'0' * kennfeld.GRID_CACHE_KEY_LENGTH}.npy"
+        )
+        other_cache.write_bytes(b"")
+        kennfeld_file.write_text(
+            kennfeld_file.read_text(encoding="utf-8").replace("5700", "5000"),
+            encoding="utf-8",
+        )
+
+        powermap = make_powermap()
+        await powermap.initialize()
+
+        assert not old_cache.exists()
+        assert other_cache.exists()
+        assert len(list(component_dir.glob("*.npy"))) == 2
+        assert powermap.map(-300, 350) == pytest.approx(5000)
+
+    async def test_plot(self, make_powermap, tmp_path):
+        """Test the image is only drawn again for a different grid."""
+        image = tmp_path / "www" / "local" / f"{CONST.DOMAIN}_powermap.png"
+        await make_powermap().initialize()
+        written = image.stat().st_mtime_ns
+        image.touch()
+        touched = image.stat().st_mtime_ns
+
+        await make_powermap().initialize()
+        assert image.stat().st_mtime_ns == touched
+
+        await make_powermap(resolution=1.0).initialize()
+        assert image.stat().st_mtime_ns not in (written, touched)
+
+
+class TestShared:
+    """Test config entries share the power maps of the same kennfeld file."""
+
+    async def test_refcount(self, hass, make_powermap, make_config_entry, monkeypatch):
+        """Test one instance is built per file and dropped with its last user."""
+        monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+        make_powermap()
+        initialized = []
+        initialize = PowerMap.initialize
+
+        async def count(powermap):
+            initialized.append(powermap)
+            await initialize(powermap)
+
+        monkeypatch.setattr(PowerMap, "initialize", count)
+        entry = make_config_entry(data={CONF.KENNFELD_FILE: CONST.DEF_KENNFELDFILE})
+
+        first, second = await asyncio.gather(
+            async_acquire_powermap(hass, entry), async_acquire_powermap(hass, entry)
+        )
+        other = await async_acquire_powermap(hass, entry, 1.0)
+
+        assert first is second
+        assert other is not first
+        assert initialized == [first, other]
+        with pytest.raises(ValueError):
+            first._grid[0, 0] = 0
+
+        release_powermap(hass, first)
+        assert await async_acquire_powermap(hass, entry) is first
+        release_powermap(hass, first)
+        release_powermap(hass, second)
+        release_powermap(hass, other)
+        assert hass.data[POWERMAPS] == {}
+
+    async def test_failed(self, hass, tmp_path, make_powermap, make_config_entry):
+        """Test a power map that fails to initialize is not kept."""
+        make_powermap()
+        component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+        (component_dir / "broken_kennfeld.json").write_text("{}", encoding="utf-8")
+        entry = make_config_entry(data={CONF.KENNFELD_FILE: "broken_kennfeld.json"})
+
+        results = await asyncio.gather(
+            async_acquire_powermap(hass, entry),
+            async_acquire_powermap(hass, entry),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, KeyError) for result in results)
+        assert hass.data[POWERMAPS] == {}
@@ -0,0 +1,164 @@
+"""Tests for learning the power map from the energy counters."""
+
+import asyncio
+from pathlib import Path
+import shutil
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from custom_components.weishaupt_modbus import kennfeld, learning
+from custom_components.weishaupt_modbus.const import CONF, CONST
+from custom_components.weishaupt_modbus.kennfeld import PowerMap
+from custom_components.weishaupt_modbus.learning import (
+    PowerLearner,
+    async_remove_learning,
+    async_setup_learner,
+)
+
+
+@pytest.fixture
+async def datasheet(hass, tmp_path, monkeypatch, make_config_entry):
+    """Return the default power map, without plotting it."""
+    monkeypatch.setattr(kennfeld, "MATPLOTLIB_AVAILABLE", False)
+    component_dir = tmp_path / "custom_components" / CONST.DOMAIN
+    component_dir.mkdir(parents=True)
+    shutil.copy(
+        Path(kennfeld.__file__).with_name(CONST.DEF_KENNFELDFILE), component_dir
+    )
+    hass.config.config_dir = str(tmp_path)
+    config_entry = make_config_entry(data={CONF.KENNFELD_FILE: CONST.DEF_KENNFELDFILE})
+    powermap = PowerMap(config_entry, hass)
+    await powermap.initialize()
+    return powermap
+
+
+class TestLearn:
+    """Test refining the learned grid from observed powers."""
+
+    def test_initial(self, datasheet):
+        """Test without observations the learned map is the datasheet."""
+        learner = PowerLearner(datasheet)
+
+        np.testing.assert_allclose(learner.powermap.grid, datasheet.grid, rtol=1e-6)
+        assert learner.powermap.grid is not datasheet.grid
+
+    def test_ratio(self, datasheet):
+        """Test a constant deviation is learned also where nothing was observed."""
+        learner = PowerLearner(datasheet)
+        grid = learner.powermap.grid
+        for outside in (-5, 0, 5, 10):
+            for flow in (30, 40, 50):
+                for _ in range(20):
+                    assert learner.learn(
+                        outside, flow, 0.8 * datasheet.map(outside * 10, flow * 10)
+                    )
+
+        # refined in place, the calculations keep their reference
+        assert learner.powermap.grid is grid
+        assert learner.observations == 240
+        assert learner.powermap.map(50, 400) == pytest.approx(
+            0.8 * datasheet.map(50, 400), rel=0.01
+        )
+        # the plane of the ratio carries the deviation to other temperatures
+        assert learner.powermap.map(-200, 550) == pytest.approx(
+            0.8 * datasheet.map(-200, 550), rel=0.05
+        )
+        # the datasheet is shared and stays as it is
+        assert not datasheet.grid.flags.writeable
+
+    def test_local(self, datasheet):
+        """Test a deviation at one node is weighted against the datasheet."""
+        learner = PowerLearner(datasheet)
+        expected = datasheet.map(0, 350)
+
+        learner.learn(0, 35, 1.5 * expected)
+        once = learner.powermap.map(0, 350) / expected
+        for _ in range(learning.MAX_COUNT * 2):
+            learner.learn(0, 35, 1.5 * expected)
+
+        assert 1 < once < 1.5
+        assert learner.powermap.map(0, 350) / expected == pytest.approx(1.5, rel=0.01)
+        assert learner.counts.max() == learning.MAX_COUNT
+
+    @pytest.mark.parametrize("ratio", [0.1, 5])
+    def test_implausible(self, datasheet, ratio):
+        """Test powers far away from the datasheet are ignored."""
+        learner = PowerLearner(datasheet)
+
+        assert not learner.learn(0, 35, ratio * datasheet.map(0, 350))
+        assert learner.observations == 0
+
+
+class TestObserve:
+    """Test deriving the maximum power from the energy counters."""
+
+    def test_interval(self, datasheet):
+        """Test the power between two increments of the counter is learned."""
+        learner = PowerLearner(datasheet)
+        learned = []
+        learner.learn = lambda *args: learned.append(args) or True
+
+        # the first increment only starts the interval
+        assert not learner.observe(0, 10, 0, 30, 50)
+        assert not learner.observe(60, 11, 0, 30, 50)
+        assert not learner.observe(960, 11, 2, 40, 50)
+        assert learner.observe(1860, 12, 4, 50, 50)
+
+        # 1 kWh in 1800 s at 50 % request is 4000 W maximum power
+        assert learned == [(1.0, 35.0, pytest.approx(4000))]
+
+    @pytest.mark.parametrize(
+        ("values", "reason"),
+        [
+            ([(0, 5, 0, 30, 50), (60, 6, 0, 30, 50), (120, 3, 0, 30, 50)], "reset"),
+            ([(0, 5, 0, 30, 50), (60, 6, 0, 30, 50), (8000, 7, 0, 30, 50)], "long"),
+            ([(0, 5, 0, 30, 50), (60, 6, 0, 30, 10), (660, 7, 0, 30, 10)], "request"),
+            ([(0, 5, 0, 30, 50), (60, 6, 0, 30, 50), (360, 6, None, 30, 50)], "gap"),
+        ],
+    )
+    def test_ignored(self, datasheet, values, reason):
+        """Test intervals without a reliable power are no observation."""
+        learner = PowerLearner(datasheet)
+        learner.learn = MagicMock(return_value=True)
+
+        for value in values:
+            assert not learner.observe(*value), reason
+        assert not learner.observe(1200, 8, 0, 30, 50)
+
+        learner.learn.assert_not_called()
+
+
+async def test_store(hass, hass_storage, datasheet, monkeypatch):
+    """Test the estimate is stored and restored per entry."""
+    monkeypatch.setattr(learning, "SAVE_DELAY", 0)
+    learner = await async_setup_learner(hass, "entry", datasheet)
+    for _ in range(10):
+        learner.learn(0, 35, 1.2 * datasheet.map(0, 350))
+    # the delayed write is scheduled in the next iteration of the loop
+    await asyncio.sleep(0)
+    await hass.async_block_till_done()
+
+    restored = await async_setup_learner(hass, "entry", datasheet)
+    other = PowerLearner(datasheet)
+
+    np.testing.assert_array_equal(restored.powermap.grid, learner.powermap.grid)
+    assert restored.observations == 10
+    assert not other.load({**learner.as_dict(), "flow_nodes": [35, 55]})
+    assert not other.load({"counts": []})
+
+    await async_remove_learning(hass, "entry")
+    assert f"{CONST.DOMAIN}.learning.entry" not in hass_storage
+
+
+async def test_unload(hass, hass_storage, datasheet):
+    """Test an estimate that waits for the delayed save is stored at unload."""
+    learner = await async_setup_learner(hass, "entry", datasheet)
+    await learner.async_unload()
+    assert f"{CONST.DOMAIN}.learning.entry" not in hass_storage
+
+    learner.learn(0, 35, 1.2 * datasheet.map(0, 350))
+    await learner.async_unload()
+
+    assert hass_storage[f"{CONST.DOMAIN}.learning.entry"]["data"]["observations"] == 1
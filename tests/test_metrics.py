@@ -0,0 +1,140 @@
+"""Tests for the modbus and update cycle metrics."""
+
+import copy
+from unittest.mock import MagicMock
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+import pytest
+
+from custom_components.weishaupt_modbus.const import READSTRATEGIES, REGISTERS
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.hpconst import MODBUS_SYS_ITEMS
+from custom_components.weishaupt_modbus.metrics import (
+    LATENCY_BUCKETS,
+    LatencyHistogram,
+    ModbusMetrics,
+)
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from simulator import FAULTS, FaultRule, FaultySimulator
+
+
+class TestLatencyHistogram:
+    """Test the latency histogram."""
+
+    def test_buckets(self):
+        """Test samples are sorted into the right buckets."""
+        histogram = LatencyHistogram()
+
+        for seconds in (0.0005, 0.001, 0.003, 10.0):
+            histogram.record(seconds)
+
+        assert histogram.buckets[0] == 2
+        assert histogram.buckets[2] == 1
+        assert histogram.buckets[len(LATENCY_BUCKETS)] == 1
+        assert histogram.count == 4
+        assert histogram.max == 10.0
+
+    def test_window(self):
+        """Test percentiles only use the recent samples."""
+        histogram = LatencyHistogram(window=10)
+
+        for _ in range(100):
+            histogram.record(1.0)
+        for _ in range(10):
+            histogram.record(0.01)
+
+        assert histogram.percentile(0.95) == 0.01
+        assert histogram.count == 110
+        assert len(histogram.buckets) == len(LATENCY_BUCKETS) + 1
+
+    def test_empty(self):
+        """Test an empty histogram has no percentiles."""
+        histogram = LatencyHistogram()
+
+        assert histogram.percentile(0.95) is None
+        assert histogram.mean is None
+
+
+class TestModbusMetrics:
+    """Test the request counters."""
+
+    def test_exception_codes(self):
+        """Test modbus exception answers are counted by code."""
+        metrics = ModbusMetrics()
+        error = MagicMock(retries=1, exception_code=2)
+        error.isError.return_value = True
+
+        metrics.record_response(30001, 0.01, error)
+        metrics.record_response(30001, 0.01, error)
+
+        assert metrics.exception_codes == {2: 2}
+        assert metrics.retries == 2
+        assert metrics.registers[30001].errors == 2
+        assert metrics.last_success is None
+
+    def test_exceptions(self):
+        """Test timeouts and connection errors are told apart."""
+        metrics = ModbusMetrics()
+
+        metrics.record_exception(30001, 1.0, ModbusIOException("no answer"))
+        metrics.record_exception(30002, 0.0, ConnectionException("closed"))
+
+        assert metrics.timeouts == 1
+        assert metrics.connection_errors == 1
+        assert metrics.errors == 2
+
+
+@pytest.fixture
+async def faulty_simulator(socket_enabled):
+    """Start a simulator without rules."""
+    simulator = FaultySimulator(fault_seed=1)
+    await simulator.start()
+    yield simulator
+    await simulator.stop()
+
+
+@pytest.fixture
+def config_entry(faulty_simulator, make_config_entry):
+    """Create a config entry for the simulator."""
+    return make_config_entry(faulty_simulator.port)
+
+
+async def test_api_metrics(faulty_simulator, config_entry):
+    """Test ModbusAPI counts requests, exception answers and connects."""
+    faulty_simulator.rules = [FaultRule(FAULTS.EXCEPTION, at_requests=(2,))]
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+
+    for _ in range(3):
+        await api.read_registers(REGISTERS.INPUT, 30001)
+    api.close()
+
+    metrics = api.metrics
+    assert metrics.connects == 1
+    assert metrics.requests == 3
+    assert metrics.exception_codes == {4: 1}
+    assert metrics.registers[30001].requests == 3
+    assert metrics.last_success is not None
+    assert metrics.as_dict()["request_latency"]["count"] == 3
+
+
+async def test_cycle_metrics(hass, faulty_simulator, config_entry):
+    """Test the coordinator records cycles and failed blocks."""
+    faulty_simulator.registers.remove(30002)
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+    items = copy.deepcopy(MODBUS_SYS_ITEMS)
+    coordinator = MyCoordinator(hass, api, items, config_entry)
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+
+    await coordinator.fetch_data()
+    await coordinator.fetch_data()
+    api.close()
+
+    metrics = coordinator.metrics
+    assert metrics.cycles == 2
+    assert metrics.failed_blocks_last_cycle == 0
+    assert metrics.failed_blocks >= 1
+    assert metrics.requests_per_cycle[-1] < metrics.requests_per_cycle[0]
+    assert metrics.items_refreshed[-1] > 0
+    assert metrics.last_cycle_duration is not None
@@ -0,0 +1,79 @@
+"""Tests for the profile_cycles service."""
+
+import json
+import pstats
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.weishaupt_modbus.const import CONST, PROFILERS
+from custom_components.weishaupt_modbus.profiling import async_profile_cycles
+from custom_components.weishaupt_modbus.services import (
+    SERVICE_PROFILE_CYCLES,
+    async_register_services,
+)
+from homeassistant.exceptions import ServiceValidationError
+
+
+def busy_cycle() -> None:
+    """Burn some CPU like a coordinator cycle does."""
+    end = time.perf_counter() + 0.02
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture(autouse=True)
+def config_dir(hass, tmp_path):
+    """Write the profiles to a temporary config dir."""
+    hass.config.config_dir = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def coordinator():
+    """Create a coordinator stand-in that counts its refreshes."""
+    mock = MagicMock()
+    mock.refreshes = 0
+
+    async def async_refresh():
+        mock.refreshes += 1
+        busy_cycle()
+
+    mock.async_refresh = async_refresh
+    return mock
+
+
+async def test_cprofile(hass, config_dir, coordinator):
+    """Test a cProfile run writes a pstats file with the cycle in it."""
+    path = await async_profile_cycles(hass, [coordinator], 2)
+
+    assert coordinator.refreshes == 2
+    assert path.suffix == ".pstats"
+    assert path.parent == config_dir
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == "busy_cycle" for func in stats.stats)  # type: ignore[attr-defined]
+
+
+async def test_sampling(hass, coordinator):
+    """Test a sampling run writes a speedscope file."""
+    path = await async_profile_cycles(
+        hass, [coordinator], 3, PROFILERS.SAMPLING, interval=0.002
+    )
+
+    document = json.loads(path.read_text(encoding="utf-8"))
+    frames = [frame["name"] for frame in document["shared"]["frames"]]
+    profile = document["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"]) > 0
+    assert "busy_cycle" in frames
+
+
+async def test_service_without_entry(hass):
+    """Test the service refuses to run without a loaded entry."""
+    async_register_services(hass)
+
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            CONST.DOMAIN, SERVICE_PROFILE_CYCLES, {"cycles": 1}, blocking=True
+        )
@@ -0,0 +1,125 @@
+"""Tests for the read plan and the block read strategies of the coordinator."""
+
+import pytest
+
+from custom_components.weishaupt_modbus.const import (
+    FORMATS,
+    READSTRATEGIES,
+    REGISTERS,
+    TYPES,
+)
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.items import ModbusItem
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from custom_components.weishaupt_modbus.readplan import build_read_plan
+
+
+def make_item(address: int, mtype: str = TYPES.SENSOR) -> ModbusItem:
+    """Create a plain item for an address."""
+    return ModbusItem(
+        address=address,
+        name=f"Register {address}",
+        mformat=FORMATS.NUMBER,
+        mtype=mtype,
+        device="dev_system",
+        translation_key=f"reg_{address}",
+    )
+
+
+class TestBuildReadPlan:
+    """Test grouping items into blocks."""
+
+    def test_contiguous(self):
+        """Test contiguous addresses share one block, gaps start a new one."""
+        items = [make_item(30003), make_item(30001), make_item(30002), make_item(30006)]
+
+        plan = build_read_plan(items, 125)
+
+        assert [(block.address, block.count) for block in plan] == [
+            (30001, 3),
+            (30006, 1),
+        ]
+        assert [item.address for item in plan[0].items] == [30001, 30002, 30003]
+
+    def test_register_types(self):
+        """Test input and holding registers are never merged."""
+        items = [make_item(30001), make_item(40001, TYPES.NUMBER), make_item(30002)]
+
+        plan = build_read_plan(items, 125)
+
+        assert [(block.register_type, block.count) for block in plan] == [
+            (REGISTERS.HOLDING, 1),
+            (REGISTERS.INPUT, 2),
+        ]
+
+    def test_shared_address(self):
+        """Test items on the same address read the register once."""
+        items = [make_item(30001), make_item(30001, TYPES.SENSOR_CALC)]
+
+        plan = build_read_plan(items, 125)
+
+        assert len(plan) == 1
+        assert plan[0].count == 1
+        assert len(plan[0].items) == 2
+
+    def test_max_block_size(self):
+        """Test blocks are split at the maximum size."""
+        items = [make_item(30001 + offset) for offset in range(10)]
+
+        plan = build_read_plan(items, 4)
+
+        assert [block.count for block in plan] == [4, 4, 2]
+
+
+@pytest.fixture
+async def modbus_api(config_entry):
+    """Create a connected ModbusAPI for the simulator."""
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+    yield api
+    api.close()
+
+
+@pytest.fixture
+def make_coordinator(hass, config_entry, modbus_api):
+    """Return a factory of coordinators that read with the connected API."""
+
+    def factory(items):
+        return MyCoordinator(hass, modbus_api, items, config_entry)
+
+    return factory
+
+
+@pytest.mark.parametrize("strategy", [READSTRATEGIES.BLOCK, READSTRATEGIES.PIPELINED])
+async def test_strategy_same_values(
+    wbb_simulator, make_coordinator, all_items, strategy
+):
+    """Test block reads give the same values as reading item by item."""
+    reference = make_coordinator(all_items())
+    expected = await reference.fetch_data()
+
+    coordinator = make_coordinator(all_items())
+    coordinator.read_strategy = strategy
+    wbb_simulator.stats.reset()
+    result = await coordinator.fetch_data()
+
+    assert result == expected
+    assert wbb_simulator.stats.requests < len(expected) / 2
+
+
+async def test_block_falls_back(wbb_simulator, make_coordinator):
+    """Test a block with an unknown address is read item by item."""
+    wbb_simulator.registers.remove(30002)
+    items = [make_item(30001), make_item(30002), make_item(30003)]
+    coordinator = make_coordinator(items)
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+
+    await coordinator.fetch_data()
+
+    assert [item.is_invalid for item in items] == [False, True, False]
+    assert items[0].state is not None
+
+    # the plan is rebuilt without the invalid item
+    wbb_simulator.stats.reset()
+    await coordinator.fetch_data()
+    assert wbb_simulator.stats.requests == 2
@@ -0,0 +1,104 @@
+"""Tests for the raw modbus traffic recorder."""
+
+import json
+from unittest.mock import MagicMock
+
+from custom_components.weishaupt_modbus.const import CONF, REGISTERS
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from custom_components.weishaupt_modbus.recorder import (
+    FC_READ_HOLDING,
+    FC_READ_INPUT,
+    FC_WRITE_REGISTER,
+    RECORDER_FORMAT,
+    TrafficRecorder,
+)
+
+
+def read_recording(path):
+    """Return the header and the records of a recording."""
+    header, *records = (
+        json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()
+    )
+    return header, records
+
+
+async def test_recording(hass, wbb_simulator, tmp_path):
+    """Test reads, a write and an exception response are recorded."""
+    wbb_simulator.registers.remove(30002)
+    config_entry = MagicMock()
+    config_entry.data = {CONF.HOST: "127.0.0.1", CONF.PORT: wbb_simulator.port}
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+    path = tmp_path / "traffic.jsonl"
+    assert api.start_recording(hass, path) is api.recorder
+
+    await api.read_registers(REGISTERS.INPUT, 30001)
+    await api.read_registers(REGISTERS.INPUT, 30002)
+    await api.read_registers(REGISTERS.HOLDING, 40001, 2)
+    await api.write_register(41105, 215)
+    recorder = await api.stop_recording()
+    api.close()
+
+    assert api.recorder is None
+    assert recorder.records == 4
+    header, records = read_recording(path)
+    assert header["format"] == RECORDER_FORMAT
+    assert header["port"] == wbb_simulator.port
+    assert [(r["fc"], r["addr"], r["count"]) for r in records] == [
+        (FC_READ_INPUT, 30001, 1),
+        (FC_READ_INPUT, 30002, 1),
+        (FC_READ_HOLDING, 40001, 2),
+        (FC_WRITE_REGISTER, 41105, 1),
+    ]
+    assert records[0]["regs"] == [wbb_simulator.registers.input[30001]]
+    assert records[0]["exc"] is None
+    assert records[1]["regs"] is None
+    assert records[1]["exc"] == 2
+    assert records[3]["regs"] == [215]
+    assert all(r["lat"] > 0 for r in records)
+
+
+async def test_full_queue_drops(hass, tmp_path):
+    """Test records are dropped instead of blocking when the queue is full."""
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(hass, path, queue_size=2)
+    recorder.start()
+
+    for address in range(5):
+        recorder.record(
+            FC_READ_INPUT, address, 1, registers=[0], exception=None, latency=0.001
+        )
+    await recorder.stop()
+
+    assert recorder.dropped == 3
+    assert recorder.records == 2
+    assert not recorder.running
+    _, records = read_recording(path)
+    assert [r["addr"] for r in records] == [0, 1]
+
+
+async def test_open_failed(hass, wbb_simulator, config_entry, tmp_path):
+    """Test a recording that can't be opened doesn't break stopping it."""
+    missing = tmp_path / "missing" / "traffic.jsonl"
+    api = ModbusAPI(config_entry)
+    assert await api.connect(startup=True)
+    failed = api.start_recording(hass, missing)
+    await api.read_registers(REGISTERS.INPUT, 30001)
+    await hass.async_block_till_done()
+
+    assert not failed.running
+    assert await api.stop_recording() is failed
+    assert failed.error is not None
+    assert failed.records == 0
+
+    # starting again replaces a failed recording
+    failed = api.start_recording(hass, missing)
+    await hass.async_block_till_done()
+    recorder = api.start_recording(hass, tmp_path / "traffic.jsonl")
+    await api.read_registers(REGISTERS.INPUT, 30001)
+    await api.stop_recording()
+    api.close()
+
+    assert recorder is not failed
+    assert recorder.error is None
+    assert recorder.records == 1
@@ -0,0 +1,101 @@
+"""Tests for replaying recorded modbus traffic."""
+
+import copy
+
+from pymodbus.exceptions import ModbusIOException
+import pytest
+
+from custom_components.weishaupt_modbus.const import READSTRATEGIES, REGISTERS
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.hpconst import MODBUS_SYS_ITEMS
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from custom_components.weishaupt_modbus.recorder import FC_READ_INPUT, TrafficRecorder
+from simulator import ReplayClient
+
+
+def record(address, count, registers=None, exception=None, latency=0.01):
+    """Return one record of an input register read."""
+    return {
+        "t": 0.0,
+        "fc": FC_READ_INPUT,
+        "addr": address,
+        "count": count,
+        "regs": registers,
+        "exc": exception,
+        "lat": latency,
+    }
+
+
+async def test_replay_coordinator(hass, wbb_simulator, config_entry, tmp_path):
+    """Test a replayed cycle gives the same states as the recorded one."""
+    wbb_simulator.registers.remove(30002)
+    path = tmp_path / "traffic.jsonl"
+    api = ModbusAPI(config_entry)
+    coordinator = MyCoordinator(
+        hass, api, copy.deepcopy(MODBUS_SYS_ITEMS), config_entry
+    )
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+    assert await api.connect(startup=True)
+    api.start_recording(hass, path)
+    recorded = [await coordinator.fetch_data() for _ in range(2)]
+    await api.stop_recording()
+    api.close()
+
+    client = ReplayClient.from_file(path)
+    replay_api = ModbusAPI(config_entry, client=client)
+    replay_coordinator = MyCoordinator(
+        hass, replay_api, copy.deepcopy(MODBUS_SYS_ITEMS), config_entry
+    )
+    replay_coordinator.read_strategy = READSTRATEGIES.BLOCK
+    assert await replay_api.connect(startup=True)
+    replayed = [await replay_coordinator.fetch_data() for _ in range(2)]
+
+    assert replayed == recorded
+    assert client.stats.requests == client.stats.replayed > 0
+
+
+async def test_compose_and_missing():
+    """Test requests that were not recorded are composed from known registers."""
+    client = ReplayClient([record(30001, 3, [1, 2, 3])])
+
+    composed = await client.read_input_registers(30002, count=2)
+    missing = await client.read_input_registers(30003, count=2)
+    exhausted = await client.read_input_registers(30001, count=3)
+
+    assert composed.registers == [2, 3]
+    assert missing.isError()
+    assert missing.exception_code == 2
+    assert exhausted.registers == [1, 2, 3]
+    assert client.stats.composed == client.stats.missing == 1
+    assert client.stats.replayed == 1
+
+
+async def test_recorded_errors(make_config_entry):
+    """Test recorded exception responses and client exceptions are replayed."""
+    client = ReplayClient(
+        [record(30001, 1, exception=2), record(30002, 1, exception="ModbusIOException")]
+    )
+    api = ModbusAPI(make_config_entry(), client=client)
+
+    response = await api.read_registers(REGISTERS.INPUT, 30001)
+    with pytest.raises(ModbusIOException):
+        await api.read_registers(REGISTERS.INPUT, 30002)
+
+    assert response.exception_code == 2
+    assert api.metrics.timeouts == 1
+
+
+async def test_roundtrip(hass, tmp_path):
+    """Test a recording written by the recorder can be loaded."""
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(hass, path, header={"port": 1502})
+    recorder.start()
+    recorder.record(
+        FC_READ_INPUT, 30001, 1, registers=[42], exception=None, latency=0.002
+    )
+    await recorder.stop()
+
+    client = ReplayClient.from_file(path, speed=1000.0)
+
+    assert client.header["port"] == 1502
+    assert (await client.read_input_registers(30001)).registers == [42]
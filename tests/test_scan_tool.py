@@ -0,0 +1,132 @@
+"""Tests for the register scanner."""
+
+import csv
+import json
+
+from custom_components.weishaupt_modbus.const import REGISTERS
+from scan_tool import (
+    RegisterScanner,
+    ScanRange,
+    load_state,
+    uncovered_blocks,
+    write_csv,
+)
+from scan_tool.compare import STATUS, classify, load_scans, suggest_items
+
+RANGES = [
+    ScanRange(REGISTERS.INPUT, 30001, 31300),
+    ScanRange(REGISTERS.HOLDING, 40001, 41200),
+]
+
+
+def expected_values(wbb_simulator):
+    """Return the registers of the simulator inside RANGES."""
+    return {
+        scan_range.register_type: {
+            address: value
+            for address, value in getattr(
+                wbb_simulator.registers, scan_range.register_type
+            ).items()
+            if scan_range.start <= address <= scan_range.end
+        }
+        for scan_range in RANGES
+    }
+
+
+def test_uncovered_blocks():
+    """Test covered registers are skipped and blocks are limited in size."""
+    scan_range = ScanRange(REGISTERS.INPUT, 1, 20)
+
+    blocks = uncovered_blocks(scan_range, {4, 5, 18}, 8)
+
+    assert blocks == [(1, 3), (6, 8), (14, 4), (19, 2)]
+
+
+async def test_scan(wbb_simulator, tmp_path):
+    """Test the scan finds every register and reads valid runs in blocks."""
+    wbb_simulator.registers.remove(30002)
+    wbb_simulator.max_count = 60
+    for address in range(30500, 30800):
+        wbb_simulator.registers.set(address, address % 7)
+    scanner = RegisterScanner(
+        "127.0.0.1", wbb_simulator.port, state_path=tmp_path / "scan.jsonl"
+    )
+
+    result = await scanner.scan(RANGES)
+
+    assert result.values == expected_values(wbb_simulator)
+    assert 30002 in result.invalid[REGISTERS.INPUT]
+    assert not result.failed
+    # every invalid register needs a read of its own, valid runs are read in blocks
+    valid = sum(len(values) for values in result.values.values())
+    invalid = sum(len(addresses) for addresses in result.invalid.values())
+    assert result.requests - invalid < valid / 3
+
+    output = tmp_path / "register.csv"
+    write_csv(output, result, "Simulator")
+    with output.open(encoding="utf-8") as file:
+        rows = list(csv.DictReader(file, delimiter=";"))
+    assert rows[0] == {
+        "Register": "30001",
+        "Name Doku": "Aussentemperatur",
+        "Simulator": str(wbb_simulator.registers.input[30001]),
+    }
+    assert len(rows) == sum(len(values) for values in result.values.values())
+
+
+async def test_resume(wbb_simulator, tmp_path):
+    """Test a scan continues from the state file of an interrupted scan."""
+    state = tmp_path / "scan.jsonl"
+    first = RegisterScanner("127.0.0.1", wbb_simulator.port, state_path=state)
+    await first.scan(RANGES[:1])
+    # an interrupted write leaves a cut off line
+    with state.open("a", encoding="utf-8") as file:
+        file.write('{"type": "holding", "addr"')
+    assert load_state(state).values[REGISTERS.INPUT]
+
+    second = RegisterScanner("127.0.0.1", wbb_simulator.port, state_path=state)
+    wbb_simulator.stats.reset()
+    result = await second.scan(RANGES)
+
+    assert result.values == expected_values(wbb_simulator)
+    addresses = [
+        json.loads(line)["addr"]
+        for line in state.read_text(encoding="utf-8").splitlines()[-3:]
+    ]
+    assert all(address > 40000 for address in addresses)
+    assert wbb_simulator.stats.requests == result.requests
+
+
+def test_compare(tmp_path):
+    """Test registers are classified across scans with different registers."""
+    first = tmp_path / "first.csv"
+    first.write_text(
+        "Register;Name Doku;MadOne;Ostrama\n"
+        "30001;Aussentemperatur;90;130\n"
+        "30003;Fehler;65535;65535\n"
+        "31106;;0;0\n"
+        "39000;;5;5\n",
+        encoding="utf-8",
+    )
+    second = tmp_path / "second.csv"
+    second.write_text(
+        "Register;Name Doku;User\n30001;;95\n30003;;32768\n31106;;0\n33150;Neu;7\n",
+        encoding="utf-8",
+    )
+
+    table = load_scans([first, second])
+    status = dict(zip(table.registers.tolist(), classify(table), strict=True))
+
+    assert table.columns == ["MadOne", "Ostrama", "User"]
+    assert status == {
+        30001: STATUS.DIFFERENT,
+        30003: STATUS.UNAVAILABLE,
+        31106: STATUS.CONSTANT,
+        33150: STATUS.SINGLE,
+        39000: STATUS.CONSTANT,
+    }
+    suggestions = suggest_items(table, classify(table))
+    assert len(suggestions) == 2
+    assert suggestions[0].startswith('ModbusItem( address=33150, name="Neu"')
+    assert "device=DEVICES.WP" in suggestions[0]
+    assert "device=DEVICES.UK" in suggestions[1]
@@ -0,0 +1,71 @@
+"""Tests for the diagnostic sensors of the poll performance."""
+
+import copy
+from unittest.mock import MagicMock
+
+from custom_components.weishaupt_modbus.const import (
+    BACKOFFSTATES,
+    CONST,
+    READSTRATEGIES,
+)
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.entities import MyDiagnosticSensorEntity
+from custom_components.weishaupt_modbus.hpconst import MODBUS_SYS_ITEMS
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from custom_components.weishaupt_modbus.sensor import DIAGNOSTIC_SENSORS
+from homeassistant.const import EntityCategory
+
+
+def sensor_values(config_entry, coordinator):
+    """Create the diagnostic sensors and return their values by key."""
+    return {
+        description.key: MyDiagnosticSensorEntity(
+            config_entry, coordinator, description
+        ).native_value
+        for description in DIAGNOSTIC_SENSORS
+    }
+
+
+async def test_diagnostic_sensors(hass, config_entry):
+    """Test the values of the diagnostic sensors before and after a cycle."""
+    api = ModbusAPI(config_entry)
+    coordinator = MyCoordinator(
+        hass, api, copy.deepcopy(MODBUS_SYS_ITEMS), config_entry
+    )
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+
+    values = sensor_values(config_entry, coordinator)
+    assert values["diag_cycle_duration"] is None
+    assert values["diag_last_success_age"] is None
+    assert values["diag_backoff_state"] == BACKOFFSTATES.RECONNECTING
+
+    assert await api.connect(startup=True)
+    await coordinator.fetch_data()
+    values = sensor_values(config_entry, coordinator)
+    api.close()
+
+    assert values["diag_cycle_duration"] > 0
+    assert values["diag_request_latency_p95"] > 0
+    assert values["diag_requests_per_cycle"] == 2
+    assert values["diag_failed_blocks"] == 0
+    assert 0 <= values["diag_last_success_age"] < 10
+    assert values["diag_backoff_state"] == BACKOFFSTATES.CONNECTED
+
+
+def test_failed_blocks_sequential(hass, config_entry):
+    """Test the failed blocks are unknown when no blocks are read."""
+    coordinator = MyCoordinator(hass, MagicMock(), [], config_entry)
+    coordinator.read_strategy = READSTRATEGIES.SEQUENTIAL
+
+    assert sensor_values(config_entry, coordinator)["diag_failed_blocks"] is None
+
+
+def test_disabled_by_default(hass, config_entry):
+    """Test the sensors are diagnostic and not enabled by default."""
+    coordinator = MyCoordinator(hass, MagicMock(), [], config_entry)
+
+    for description in DIAGNOSTIC_SENSORS:
+        entity = MyDiagnosticSensorEntity(config_entry, coordinator, description)
+        assert entity.entity_category == EntityCategory.DIAGNOSTIC
+        assert entity.entity_registry_enabled_default is False
+        assert entity.unique_id == f"{CONST.DEF_PREFIX}_diag_{description.key}"
@@ -0,0 +1,110 @@
+"""Unit tests for the WBB simulator."""
+
+import asyncio
+import time
+
+from pymodbus.client import AsyncModbusTcpClient
+import pytest
+
+from simulator import SENSOR_MISSING, WbbSimulator, load_register_map
+
+
+@pytest.fixture
+async def client(wbb_simulator):
+    """Create a client connected to the simulator."""
+    modbus_client = AsyncModbusTcpClient(
+        host="127.0.0.1", port=wbb_simulator.port, retries=0
+    )
+    await modbus_client.connect()
+    yield modbus_client
+    modbus_client.close()
+
+
+class TestRegisterMap:
+    """Test the register map loader."""
+
+    def test_seeded_from_sample_file(self):
+        """Test values are taken from the selected column."""
+        madone = load_register_map("MadOne")
+        ostrama = load_register_map("Ostrama")
+
+        assert madone.input[30001] == 90
+        assert ostrama.input[30001] == 130
+        assert madone.holding[41108] == 40
+
+    def test_contains_all_items(self):
+        """Test every hpconst address is served."""
+        registers = load_register_map(None)
+
+        assert registers.input[36801] == 0
+        assert registers.holding[45108] == 0
+        assert 41501 in registers.holding
+
+
+class TestWbbSimulator:
+    """Test the simulated Modbus TCP server."""
+
+    async def test_read_input_registers(self, client):
+        """Test reading a block of input registers."""
+        rr = await client.read_input_registers(30001, count=6, device_id=1)
+
+        assert not rr.isError()
+        assert rr.registers == [90, 90, 65535, 65535, 1, 20]
+
+    async def test_read_holding_registers(self, client):
+        """Test reading holding registers."""
+        rr = await client.read_holding_registers(40001, count=2, device_id=1)
+
+        assert rr.registers == [1, 0]
+
+    async def test_illegal_address(self, client):
+        """Test a block reaching into a gap is rejected."""
+        rr = await client.read_input_registers(30005, count=3, device_id=1)
+
+        assert rr.isError()
+        assert rr.exception_code == 2
+
+    async def test_max_count(self, client, wbb_simulator):
+        """Test requests above the maximum register count are rejected."""
+        wbb_simulator.max_count = 4
+
+        rr = await client.read_input_registers(30001, count=5, device_id=1)
+
+        assert rr.isError()
+        assert rr.exception_code == 3
+
+    async def test_write_register(self, client, wbb_simulator):
+        """Test writing a holding register."""
+        await client.write_register(41105, 215, device_id=1)
+
+        assert wbb_simulator.registers.holding[41105] == 215
+        assert wbb_simulator.stats.requests == 1
+
+    async def test_holes_and_missing(self, socket_enabled):
+        """Test configured holes and missing sensors."""
+        async with WbbSimulator(holes=[30002], missing=[33104]) as simulator:
+            modbus_client = AsyncModbusTcpClient(host="127.0.0.1", port=simulator.port)
+            await modbus_client.connect()
+
+            hole = await modbus_client.read_input_registers(30002, device_id=1)
+            missing = await modbus_client.read_input_registers(33104, device_id=1)
+            modbus_client.close()
+
+        assert hole.exception_code == 2
+        assert missing.registers == [SENSOR_MISSING]
+
+    async def test_latency(self, client, wbb_simulator):
+        """Test the configured latency delays the response."""
+        wbb_simulator.latency = 0.05
+
+        start = time.monotonic()
+        await client.read_input_registers(30001, device_id=1)
+
+        assert time.monotonic() - start >= 0.05
+
+    async def test_drop_connections(self, client, wbb_simulator):
+        """Test dropping connections is noticed by the client."""
+        wbb_simulator.drop_connections()
+        await asyncio.sleep(0.05)
+
+        assert not client.connected
@@ -0,0 +1,110 @@
+"""Tests for the tuning of block size and request timeout."""
+
+import pytest
+
+from custom_components.weishaupt_modbus import tuning
+from custom_components.weishaupt_modbus.const import CONST, READSTRATEGIES, REGISTERS
+from custom_components.weishaupt_modbus.coordinator import MyCoordinator
+from custom_components.weishaupt_modbus.modbusobject import ModbusAPI
+from custom_components.weishaupt_modbus.readplan import ReadBlock
+from custom_components.weishaupt_modbus.tuning import (
+    MIN_TIMEOUT,
+    TuningResult,
+    _largest_block_size,
+    async_load_tuning,
+    async_save_tuning,
+)
+
+
+@pytest.fixture
+async def coordinator(hass, config_entry, all_items):
+    """Create a coordinator with all items for the simulator."""
+    return MyCoordinator(hass, ModbusAPI(config_entry), all_items(), config_entry)
+
+
+async def test_tune_block_size(wbb_simulator, coordinator):
+    """Test the largest accepted block size is found and used by the planner."""
+    wbb_simulator.max_count = 11
+    coordinator.read_strategy = READSTRATEGIES.BLOCK
+
+    result = await coordinator.async_tune()
+    rejected = coordinator.modbus_api.metrics.exception_codes.get(3, 0)
+    data = await coordinator.fetch_data()
+    coordinator.modbus_api.close()
+
+    assert result is not None
+    assert result.max_block_size == 11
+    assert result.probes < 20
+    assert coordinator.max_block_size == 11
+    assert max(block.count for block in coordinator.read_plan) <= 11
+    # no block of the cycle is rejected for its size
+    assert coordinator.modbus_api.metrics.exception_codes.get(3, 0) == rejected
+    assert any(value is not None for value in data.values())
+
+
+async def test_tune_timeout(wbb_simulator, coordinator, monkeypatch):
+    """Test the request timeout follows the response time of the device."""
+    wbb_simulator.latency = 0.2
+
+    # a fast device keeps the default timeout of the client
+    result = await coordinator.async_tune()
+    assert result is not None
+    assert result.timeout == MIN_TIMEOUT == coordinator.modbus_api.timeout
+
+    monkeypatch.setattr(tuning, "MIN_TIMEOUT", 0.5)
+    result = await coordinator.async_tune()
+    coordinator.modbus_api.close()
+
+    assert result is not None
+    assert result.max_block_size == CONST.MAX_BLOCK_SIZE
+    assert result.rtt >= 0.2
+    assert 0.5 < result.timeout == coordinator.modbus_api.timeout
+
+
+class FakeProber:
+    """Prober that answers with the exception codes of a list."""
+
+    def __init__(self, errors):
+        """Initialize with the answers of the probes in order."""
+        self.errors = list(errors)
+        self.sizes = []
+
+    async def read(self, block, count):
+        """Return the next answer."""
+        self.sizes.append((block.address, count))
+        return self.errors.pop(0)
+
+
+def make_block(address, count):
+    """Create a block of count registers."""
+    return ReadBlock(REGISTERS.INPUT, address, count, [])
+
+
+async def test_block_size_rejected():
+    """Test a block rejected for its size is bisected."""
+    # 64 is rejected, 32 accepted, 48 rejected, then 40, 44, 46 and 47 accepted
+    prober = FakeProber([3, None, 4, None, None, None, None])
+
+    assert await _largest_block_size(prober, [make_block(100, 64)]) == 47
+
+
+async def test_block_size_timeout():
+    """Test a probe that timed out does not limit the block size."""
+    blocks = [make_block(100, 64), make_block(200, 50), make_block(300, 40)]
+    # the first block times out, the second in the bisection, the third is fine
+    prober = FakeProber([0, 3, 0, None])
+
+    assert await _largest_block_size(prober, blocks) == CONST.MAX_BLOCK_SIZE
+    assert prober.sizes == [(100, 64), (200, 50), (200, 25), (300, 40)]
+
+
+async def test_store(hass):
+    """Test results are stored per entry."""
+    result = TuningResult(
+        max_block_size=40, rtt=0.01, timeout=0.5, probes=9, tuned_at="2026-01-01"
+    )
+
+    await async_save_tuning(hass, "entry", result)
+
+    assert await async_load_tuning(hass, "entry") == result
+    assert await async_load_tuning(hass, "other") is None